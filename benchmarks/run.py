@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+
+"""
+Time every stage of the ip/bridge pipeline over synthetic macOS commands output
+
+    python -m benchmarks.run [ -preset { smoke | default | full } ] [ -output FILE ]
+
+Stages:
+    fork        run a command printing the output (cat of the generated text:
+                on Linux there are no macOS tools to fork)
+    parse       parse the output into items
+    link        look up the bond/bridge interface relations
+    filter      select the items as of an ip/bridge selector (see query.Query)
+    render_*    write the items as text, JSON and pretty JSON (to /dev/null)
+
+Wall and CPU times are the best of -repeat runs; memory (peak and retained
+bytes, by tracemalloc) is measured by one more run, not timed.
+"""
+
+import contextlib
+import datetime
+import json
+import os
+import pickle
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import iproute4mac
+import iproute4mac.backend as backend
+import iproute4mac.ifconfig as ifconfig
+import iproute4mac.libc as libc
+import iproute4mac.nud as nud
+import iproute4mac.route as route
+import iproute4mac.utils as utils
+
+from iproute4mac.query import Query
+
+import benchmarks.synthetic as synthetic
+
+
+RESULTS_VERSION = 1
+
+# scales of every scenario
+PRESETS = {
+    "smoke": {"links": [10], "routes": [1000], "neighbours": [1000], "members": [10]},
+    "default": {
+        "links": [10, 1000],
+        "routes": [1000, 100000],
+        "neighbours": [100000],
+        "members": [1000],
+    },
+    "full": {
+        "links": [10, 1000, 10000],
+        "routes": [1000, 100000, 1000000],
+        "neighbours": [100000],
+        "members": [1000],
+    },
+}
+
+# forwarding entries of every bridge member
+_ENTRIES = 10
+
+_RENDERS = (
+    ("render_text", {}),
+    ("render_json", {"json": True}),
+    ("render_pretty", {"json": True, "pretty": True}),
+)
+
+
+def _parse_links(sources):
+    items = ifconfig.IpAddress.__new__(ifconfig.IpAddress)
+    ifconfig.Ifconfig._parse(items, sources["ifconfig"])
+    return items
+
+
+def _parse_routes(sources):
+    items = route.Routes.__new__(route.Routes)
+    entries = (entry.groups() for entry in route.Routes._route.finditer(sources["netstat"]))
+    items.set(list(items._parse(entries, [])))
+    return items
+
+
+def _parse_neighbours(sources):
+    items = nud.Nud.__new__(nud.Nud)
+    items._parse(sources["arp"], sources["ndp"])
+    return items
+
+
+def _parse_fdb(sources):
+    items = ifconfig.FDB.__new__(ifconfig.FDB)
+    items._parse(["bridge0"], [sources["addr"]])
+    return items
+
+
+class Scenario:
+    """
+    Synthetic output of a scale, and the pipeline it goes through
+
+    Input:
+    `sources` dict of the commands output, by name
+    `parse` callable returning the items parsed from `sources`
+    `query` query.Query selecting the items, as of an ip/bridge selector
+    `link` whether the items are linked (see ifconfig.IpAddress._link_interfaces())
+    """
+
+    __slots__ = ("name", "scale", "sources", "parse", "query", "link")
+
+    def __init__(self, name, scale, sources, parse, query, link=False):
+        self.name = name
+        self.scale = scale
+        self.sources = sources
+        self.parse = parse
+        self.query = query
+        self.link = link
+
+
+def scenarios(links=(), routes=(), neighbours=(), members=()):
+    """
+    Yield the scenarios of the given scales
+    """
+    for count in links:
+        # ip link show up
+        yield Scenario(
+            "links",
+            {"links": count},
+            {"ifconfig": synthetic.ifconfig(count)},
+            _parse_links,
+            Query().where(lambda l: "UP" in l.get("flags", [])),
+            link=True,
+        )
+    for count in routes:
+        # ip route show dev en1
+        yield Scenario(
+            "routes",
+            {"routes": count},
+            {"netstat": synthetic.netstat(count)},
+            _parse_routes,
+            Query().where(lambda r: r.get("dev") == "en1"),
+        )
+    for count in neighbours:
+        # ip neigh show dev en1
+        yield Scenario(
+            "neighbours",
+            {"neighbours": count},
+            {"arp": synthetic.arp(count - count // 2), "ndp": synthetic.ndp(count // 2)},
+            _parse_neighbours,
+            Query().where(lambda n: n["dev"] == "en1"),
+        )
+    for count in members:
+        # ip link show master bridge0
+        yield Scenario(
+            "bridge",
+            {"members": count},
+            # lo0, en0, bridge0 and its members
+            {"ifconfig": synthetic.ifconfig(count + 3, members=count)},
+            _parse_links,
+            Query().where(lambda l: l.get("master") == "bridge0"),
+            link=True,
+        )
+        # bridge fdb show vlan 1
+        yield Scenario(
+            "fdb",
+            {"members": count, "entries": _ENTRIES * count},
+            {"addr": synthetic.bridge_addr(count, _ENTRIES * count)},
+            _parse_fdb,
+            Query().where(lambda e: e["vlan"] == 1),
+        )
+
+
+@contextlib.contextmanager
+def _measure(stages, name, memory=False):
+    """
+    Record wall and CPU time (or memory) of the block in stages[name]
+    """
+    if memory:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        yield
+        current, peak = tracemalloc.get_traced_memory()
+        stages[name] = {"peak_bytes": peak - before, "retained_bytes": current - before}
+        return
+    wall, cpu = time.perf_counter(), time.process_time()
+    yield
+    stages[name] = {"wall": time.perf_counter() - wall, "cpu": time.process_time() - cpu}
+
+
+def _pipeline(scenario, paths, memory=False):
+    """
+    Run the stages of `scenario` once
+
+    Output:
+    (stages measures, items count, selected items count)
+    """
+    stages = {}
+    with _measure(stages, "fork", memory):
+        for path in paths:
+            backend.Backend().run(["cat", path])
+    with _measure(stages, "parse", memory):
+        items = scenario.parse(scenario.sources)
+    if scenario.link:
+        with _measure(stages, "link", memory):
+            items._link_interfaces()
+    # every stage starts from the same (unfiltered, unrendered) items
+    parsed = pickle.dumps(items, protocol=pickle.HIGHEST_PROTOCOL)
+    selected = pickle.loads(parsed)
+    with _measure(stages, "filter", memory):
+        selected.query(scenario.query)
+        count = len(selected)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for name, options in _RENDERS:
+            copy = pickle.loads(parsed)
+            with _measure(stages, name, memory):
+                utils.output(copy, iproute4mac.DEFAULTS.replace(**options))
+    return stages, len(items), count
+
+
+def run(scenario, repeat=3, memory=True):
+    """
+    Result of `scenario`: the best wall/CPU time of `repeat` runs of every stage,
+    along with its memory
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for name, text in scenario.sources.items():
+            paths.append(os.path.join(tmp, name))
+            with open(paths[-1], "w") as source:
+                source.write(text)
+        stages = {}
+        for _ in range(repeat):
+            sample, items, selected = _pipeline(scenario, paths)
+            for name, measure in sample.items():
+                best = stages.setdefault(name, measure)
+                for key, value in measure.items():
+                    best[key] = min(best[key], value)
+        if memory:
+            tracemalloc.start()
+            try:
+                sample, _, _ = _pipeline(scenario, paths, memory=True)
+            finally:
+                tracemalloc.stop()
+            for name, measure in sample.items():
+                stages[name].update(measure)
+    return {
+        "scenario": scenario.name,
+        "scale": scenario.scale,
+        "input_bytes": sum(len(text.encode()) for text in scenario.sources.values()),
+        "items": items,
+        "selected": selected,
+        "stages": stages,
+    }
+
+
+def _max_rss():
+    res = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return res if sys.platform == "darwin" else res * 1024
+
+
+def _revision():
+    try:
+        res = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+        )
+    except OSError:
+        return None
+    return res.stdout.strip() if res.returncode == 0 else None
+
+
+def benchmark(scales, repeat=3, memory=True, log=None):
+    """
+    Results of every scenario of `scales` (see scenarios()), as written to JSON
+    """
+    results = []
+    for scenario in scenarios(**scales):
+        results.append(run(scenario, repeat=repeat, memory=memory))
+        if log:
+            log(results[-1])
+    return {
+        "version": RESULTS_VERSION,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "revision": _revision(),
+        "repeat": repeat,
+        "max_rss_bytes": _max_rss(),
+        "results": results,
+    }
+
+
+def _key(result):
+    return (result["scenario"], tuple(sorted(result["scale"].items())))
+
+
+def compare(baseline, results, threshold=0.2, minimum=0.001):
+    """
+    Stages slower than in `baseline` by more than `threshold` (a fraction)
+
+    Stages faster than `minimum` seconds in both are too noisy to tell.
+
+    Output:
+    list of (scenario, scale, stage, baseline wall, wall)
+    """
+    before = {_key(result): result["stages"] for result in baseline["results"]}
+    res = []
+    for result in results["results"]:
+        for stage, measure in result["stages"].items():
+            old = before.get(_key(result), {}).get(stage, {}).get("wall")
+            new = measure["wall"]
+            if old is None or max(old, new) < minimum:
+                continue
+            if new > old * (1 + threshold):
+                res.append((result["scenario"], result["scale"], stage, old, new))
+    return res
+
+
+def _scale(scale):
+    return " ".join(f"{key}={value}" for key, value in scale.items())
+
+
+def _log(result):
+    sys.stderr.write(f"{result['scenario']} {_scale(result['scale'])}: {result['items']} items\n")
+    for stage, measure in result["stages"].items():
+        res = f"  {stage:<14} {measure['wall'] * 1000:10.2f} ms wall"
+        res += f" {measure['cpu'] * 1000:10.2f} ms cpu"
+        if "peak_bytes" in measure:
+            res += f" {measure['peak_bytes'] / 2**20:10.2f} MiB peak"
+        sys.stderr.write(res + "\n")
+
+
+def usage():
+    sys.stderr.write("""\
+Usage: python -m benchmarks.run [ -preset { smoke | default | full } ]
+                                [ -links COUNT[,COUNT...] ] [ -routes COUNT[,COUNT...] ]
+                                [ -neighbours COUNT[,COUNT...] ] [ -members COUNT[,COUNT...] ]
+                                [ -repeat COUNT ] [ -no-memory ] [ -output FILE ]
+                                [ -baseline FILE [ -threshold PERCENT ] ]
+""")
+    exit(libc.EXIT_ERROR)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    preset = "default"
+    scales = {}
+    repeat = 3
+    memory = True
+    output = None
+    baseline = None
+    threshold = 20
+    try:
+        while argv:
+            opt = argv.pop(0)
+            if opt == "-preset":
+                preset = argv.pop(0)
+                if preset not in PRESETS:
+                    usage()
+            elif opt in ("-links", "-routes", "-neighbours", "-members"):
+                scales[opt[1:]] = [int(count) for count in argv.pop(0).split(",")]
+            elif opt == "-repeat":
+                repeat = int(argv.pop(0))
+            elif opt == "-no-memory":
+                memory = False
+            elif opt == "-output":
+                output = argv.pop(0)
+            elif opt == "-baseline":
+                baseline = argv.pop(0)
+            elif opt == "-threshold":
+                threshold = float(argv.pop(0))
+            else:
+                usage()
+    except (IndexError, ValueError):
+        usage()
+    if repeat < 1:
+        usage()
+
+    res = benchmark({**PRESETS[preset], **scales}, repeat=repeat, memory=memory, log=_log)
+    if output:
+        with open(output, "w") as target:
+            json.dump(res, target, indent=2)
+            target.write("\n")
+    if baseline:
+        with open(baseline) as source:
+            regressions = compare(json.load(source), res, threshold=threshold / 100)
+        for scenario, scale, stage, old, new in regressions:
+            sys.stderr.write(
+                f"regression: {scenario} {_scale(scale)} {stage}: "
+                f"{old * 1000:.2f} ms -> {new * 1000:.2f} ms ({(new / old - 1) * 100:+.0f}%)\n"
+            )
+        if regressions:
+            return libc.EXIT_FAILURE
+    return libc.EXIT_SUCCESS
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+
+"""
+Synthetic macOS commands output, at any scale
+
+Every generator is deterministic (same arguments, same text): the output
+mimics the one of macOS (see tests/fixtures/macos.json), with the field
+mix and column layout the parsers meet on real systems.
+
+    python -m benchmarks.synthetic -links 1000 -routes 100000 big.json.gz
+    IPROUTE4MAC_REPLAY=big.json.gz ip -j route show
+"""
+
+import ipaddress
+import json
+import random
+import sys
+
+import iproute4mac.backend as backend
+import iproute4mac.libc as libc
+
+
+# commands, as run by the parsers
+IFCONFIG = ("ifconfig", "-L", "-m", "-v")
+IFCONFIG_NAMES = ("ifconfig", "-l")
+NETSTAT = ("netstat", "-n", "-r")
+ARP = ("arp", "-n", "-l", "-a")
+NDP = ("ndp", "-n", "-l", "-a")
+
+_SEED = 0x1F
+_SNDQ_MAXLEN = "net.link.generic.system.sndq_maxlen"
+
+_TRAILER = (
+    "\ttimestamp: disabled\n"
+    "\tqosmarking enabled: no mode: none\n"
+    "\tlow power mode: disabled\n"
+    "\tmulti layer packet logging (mpklog): disabled\n"
+    "\troutermode4: disabled\n"
+    "\troutermode6: disabled\n"
+)
+
+
+def _mac(index, prefix=0x3C):
+    return ":".join(f"{byte:02x}" for byte in (prefix, 0x22, 0xFB, *index.to_bytes(3, "big")))
+
+
+def _uuid(index):
+    return f"{index:08X}-1111-2222-3333-444455556666"
+
+
+def _loopback():
+    return (
+        "lo0: flags=8049<UP,LOOPBACK,RUNNING,MULTICAST> mtu 16384 index 1\n"
+        "\teflags=12000000<ECN_DISABLE,SENDLIST>\n"
+        "\txflags=4<NOAUTONX>\n"
+        "\toptions=1203<RXCSUM,TXCSUM,TXSTATUS,SW_TIMESTAMP>\n"
+        "\tcapabilities=1203<RXCSUM,TXCSUM,TXSTATUS,SW_TIMESTAMP>\n"
+        "\tinet 127.0.0.1 netmask 0xff000000\n"
+        "\tinet6 ::1 prefixlen 128 \n"
+        "\tinet6 fe80::1%lo0 prefixlen 64 scopeid 0x1 \n"
+        "\tnd6 options=201<PERFORMNUD,DAD>\n"
+        "\tlink quality: 100 (good)\n"
+        "\tstate availability: 0 (true)\n" + _TRAILER
+    )
+
+
+def _ethernet(name, index, up=True, addresses=True):
+    flags = (
+        "8863<UP,BROADCAST,SMART,RUNNING,SIMPLEX,MULTICAST>"
+        if up
+        else "8822<BROADCAST,SMART,SIMPLEX,MULTICAST>"
+    )
+    res = (
+        f"{name}: flags={flags} mtu 1500 index {index}\n"
+        "\teflags=1000080<TXSTART,NOACKPRI>\n"
+        "\txflags=4<NOAUTONX>\n"
+        "\toptions=6460<TSO4,TSO6,CHANNEL_IO,PARTIAL_CSUM,ZEROINVERT_CSUM>\n"
+        "\tcapabilities=6460<TSO4,TSO6,CHANNEL_IO,PARTIAL_CSUM,ZEROINVERT_CSUM>\n"
+        f"\tether {_mac(index)}\n"
+    )
+    if addresses:
+        res += (
+            f"\tinet6 fe80::1c2f:3eaa:{index >> 16:x}:{index & 0xFFFF:x}%{name} prefixlen 64 "
+            f"secured scopeid 0x{index:x} \n"
+            f"\tinet 10.{index >> 8 & 0xFF}.{index & 0xFF}.1 netmask 0xffffff00 "
+            f"broadcast 10.{index >> 8 & 0xFF}.{index & 0xFF}.255\n"
+            f"\tinet6 2001:db8:{index:x}::1 prefixlen 64 autoconf secured pltime 604800 "
+            "vltime 2592000 \n"
+        )
+    res += (
+        f"\tnetif: {_uuid(index)}\n"
+        f"\tflowswitch: {_uuid(index + 1)}\n"
+        "\tnd6 options=201<PERFORMNUD,DAD>\n"
+        "\tmedia: autoselect\n"
+        f"\tstatus: {'active' if up else 'inactive'}\n"
+        "\tsupported media:\n"
+        "\t\tmedia autoselect\n"
+        "\t\tmedia 1000baseT mediaopt full-duplex\n"
+        f"\tgeneration id: {index % 7 + 1}\n"
+        "\ttype: Ethernet\n"
+        f"\tlink quality: {'100 (good)' if up else '-1 (unknown)'}\n"
+        "\tstate availability: 0 (true)\n"
+        "\tscheduler: FQ_CODEL \n"
+        "\tlink rate: 1.00 Gbps\n" + _TRAILER
+    )
+    return res
+
+
+def _vlan(name, index, vid, parent):
+    return (
+        f"{name}: flags=8843<UP,BROADCAST,RUNNING,SIMPLEX,MULTICAST> mtu 1500 index {index}\n"
+        "\teflags=1000000<SENDLIST>\n"
+        "\txflags=4<NOAUTONX>\n"
+        "\toptions=3<RXCSUM,TXCSUM>\n"
+        "\tcapabilities=3<RXCSUM,TXCSUM>\n"
+        f"\tether {_mac(index)}\n"
+        f"\tinet 172.{16 + (index >> 16 & 0xF)}.{index >> 8 & 0xFF}.{index & 0xFF} "
+        "netmask 0xffffff00 broadcast 172.16.0.255\n"
+        f"\tvlan: {vid} parent interface: {parent}\n"
+        "\tmedia: autoselect\n"
+        "\tstatus: active\n"
+        "\tsupported media:\n"
+        "\t\tmedia autoselect\n"
+        "\tgeneration id: 1\n"
+        "\ttype: Ethernet\n"
+        "\tstate availability: 0 (true)\n" + _TRAILER
+    )
+
+
+def _bridge(name, index, members):
+    res = (
+        f"{name}: flags=8863<UP,BROADCAST,SMART,RUNNING,SIMPLEX,MULTICAST> mtu 1500 index {index}\n"
+        "\teflags=1000000<SENDLIST>\n"
+        "\txflags=4<NOAUTONX>\n"
+        "\toptions=63<RXCSUM,TXCSUM,TSO4,TSO6>\n"
+        "\tcapabilities=63<RXCSUM,TXCSUM,TSO4,TSO6>\n"
+        f"\tether {_mac(index, prefix=0x36)}\n"
+        "\tConfiguration:\n"
+        "\t\tid 0:0:0:0:0:0 priority 0 hellotime 0 fwddelay 0\n"
+        "\t\tmaxage 0 holdcnt 0 proto stp maxaddr 100 timeout 1200\n"
+        "\t\troot id 0:0:0:0:0:0 priority 0 ifcost 0 port 0\n"
+        "\t\tipfilter disabled flags 0x0\n"
+    )
+    for member, port in members:
+        res += (
+            f"\tmember: {member} flags=3<LEARNING,DISCOVER>\n"
+            f"\t        ifmaxaddr 0 port {port} priority 0 path cost 0\n"
+            "\t        hostfilter 0 hw: 0:0:0:0:0:0 ip: 0.0.0.0\n"
+        )
+    res += (
+        "\tnd6 options=201<PERFORMNUD,DAD>\n"
+        "\tmedia: <unknown type>\n"
+        "\tstatus: active\n"
+        "\tsupported media:\n"
+        "\t\t<unknown type>\n"
+        "\tgeneration id: 2\n"
+        "\ttype: Ethernet\n"
+        "\tstate availability: 0 (true)\n"
+        "\tscheduler: QFQ \n" + _TRAILER
+    )
+    return res
+
+
+def _feth(name, index, peer):
+    return (
+        f"{name}: flags=8863<UP,BROADCAST,SMART,RUNNING,SIMPLEX,MULTICAST> mtu 1500 index {index}\n"
+        "\toptions=3<RXCSUM,TXCSUM>\n"
+        f"\tether {_mac(index, prefix=0x0E)}\n"
+        f"\tpeer: {peer}\n"
+        f"\tinet6 fe80::c00:ff:fe00:{index & 0xFFFF:x}%{name} prefixlen 64 scopeid 0x{index:x} \n"
+        "\tmedia: autoselect\n"
+        "\tstatus: active\n"
+        "\ttype: Ethernet\n"
+    )
+
+
+def _utun(name, index):
+    return (
+        f"{name}: flags=8051<UP,POINTOPOINT,RUNNING,MULTICAST> mtu 1380 index {index}\n"
+        f"\tinet6 fe80::{index:x}:de05:ab37:d7c2%{name} prefixlen 64 scopeid 0x{index:x} \n"
+        "\tnd6 options=201<PERFORMNUD,DAD>\n"
+        '\tagent domain:NetworkExtension type:VPN flags:0x2 desc:"VPN: synthetic"\n'
+    )
+
+
+def interfaces(count, members=0):
+    """
+    Interfaces (name, ifconfig text) of `count` interfaces: lo0, en0, then
+    mostly ethernet ones, with vlans, feth pairs and utun among them
+
+    With `members`, bridge0 and `members` ethernet interfaces (of the
+    `count` ones) are its members.
+    """
+    res = [("lo0", _loopback()), ("en0", _ethernet("en0", 2))]
+    if members:
+        names = [f"en{1 + member}" for member in range(members)]
+        res.append(
+            ("bridge0", _bridge("bridge0", 3, [(name, 4 + n) for n, name in enumerate(names)]))
+        )
+        res += [(name, _ethernet(name, 4 + n, addresses=False)) for n, name in enumerate(names)]
+    index = len(res)
+    while len(res) < count:
+        index += 1
+        kind = index % 10
+        if kind == 3:
+            name = f"vlan{index}"
+            res.append((name, _vlan(name, index, index % 4094 + 1, "en0")))
+        elif kind == 5 and len(res) + 2 <= count:
+            name, peer = f"feth{index}", f"feth{index + 1}"
+            res.append((name, _feth(name, index, peer)))
+            res.append((peer, _feth(peer, index + 1, name)))
+            index += 1
+        elif kind == 7:
+            name = f"utun{index}"
+            res.append((name, _utun(name, index)))
+        else:
+            name = f"en{index}"
+            res.append((name, _ethernet(name, index, up=kind != 9)))
+    return res[:count]
+
+
+def ifconfig(count, members=0):
+    """
+    ifconfig -L -m -v output of `count` interfaces (see interfaces())
+    """
+    return "".join(text for _, text in interfaces(count, members))
+
+
+def _row(dst, gateway, flags, netif, expire="", width=18):
+    return f"{dst:<{width}} {gateway:<{width}} {flags:<19} {netif:>5} {expire:>6}"
+
+
+def netstat(count, seed=_SEED):
+    """
+    netstat -n -r output of `count` routes: about 3/4 IPv4, 1/4 IPv6 ones
+    """
+    rnd = random.Random(seed)
+    inet = [_row("default", "192.168.1.1", "UGScg", "en0")]
+    inet6 = [_row("default", "fe80::1%en0", "UGcg", "en0", width=39)]
+    for index in range(count - 2):
+        dev = f"en{rnd.randrange(8)}"
+        if index % 4 == 3:
+            prefix = f"2001:db8:{index >> 16:x}:{index & 0xFFFF:x}::"
+            kind = rnd.randrange(3)
+            if kind == 0:
+                inet6.append(_row(f"{prefix}/64", f"link#{index % 64 + 2}", "UCI", dev, width=39))
+            elif kind == 1:
+                inet6.append(_row(f"{prefix}/48", f"fe80::1%{dev}", "UGc", dev, width=39))
+            else:
+                inet6.append(_row(f"{prefix}1", _mac(index), "UHLWI", dev, width=39))
+            continue
+        a, b, c = index >> 16 & 0xFF, index >> 8 & 0xFF, index & 0xFF
+        kind = rnd.randrange(4)
+        if kind == 0:
+            inet.append(_row(f"10.{a}.{b}.{c}/32", "192.168.1.1", "UGHS", dev))
+        elif kind == 1:
+            inet.append(_row(f"10.{a}.{b}/24", f"link#{index % 64 + 2}", "UCS", dev, "!"))
+        elif kind == 2:
+            inet.append(
+                _row(
+                    f"172.{16 + a % 16}.{b}.{c}",
+                    _mac(index),
+                    "UHLWIi",
+                    dev,
+                    str(rnd.randrange(1200)),
+                )
+            )
+        else:
+            inet.append(_row(f"100.{64 + a % 64}.{b}/22", f"10.0.{b}.1", "UGSc", dev))
+    return (
+        "Routing tables\n\nInternet:\n"
+        + _row("Destination", "Gateway", "Flags", "Netif", "Expire")
+        + "\n"
+        + "\n".join(inet)
+        + "\n\nInternet6:\n"
+        + _row("Destination", "Gateway", "Flags", "Netif", "Expire", width=39)
+        + "\n"
+        + "\n".join(inet6)
+        + "\n"
+    )
+
+
+def arp(count, seed=_SEED):
+    """
+    arp -n -l -a output of `count` neighbours
+    """
+    rnd = random.Random(seed)
+    res = ["Neighbor                Linklayer Address Expire(O) Expire(I)    Netif Refs Prbs"]
+    for index in range(count):
+        address = ipaddress.IPv4Address(0x0A000000 + index + 1)
+        dev = f"en{index % 8}"
+        if index % 50 == 49:
+            res.append(f"{address!s:<23} (incomplete)      expired   expired   {dev:>8}    1")
+        elif index % 100 == 0:
+            res.append(f"{address!s:<23} {_mac(index)} (none)    (none)    {dev:>8}")
+        else:
+            expire = f"{rnd.randrange(20)}m{rnd.randrange(60)}s"
+            res.append(f"{address!s:<23} {_mac(index)} {expire:<9} {expire:<9} {dev:>8}    1")
+    return "\n".join(res) + "\n"
+
+
+def ndp(count, seed=_SEED):
+    """
+    ndp -n -l -a output of `count` neighbours
+    """
+    rnd = random.Random(seed)
+    res = [f"{'Neighbor':<39} {'Linklayer Address':<18} Netif Expire    Expire    St Flgs Prbs"]
+    for index in range(count):
+        dev = f"en{index % 8}"
+        if index % 2:
+            address = f"fe80::{index >> 16:x}:{index & 0xFFFF:x}%{dev}"
+        else:
+            address = f"2001:db8::{index >> 16:x}:{index & 0xFFFF:x}"
+        state, flags = rnd.choice((("R", "R"), ("S", ""), ("D", ""), ("I", ""), ("S", "R")))
+        expire = f"{rnd.randrange(24)}h{rnd.randrange(60)}m{rnd.randrange(60)}s"
+        res.append(
+            f"{address:<39} {_mac(index):<18} {dev:>5} {expire:<9} {expire:<9} {state} {flags}"
+        )
+    return "\n".join(res) + "\n"
+
+
+def bridge_addr(members, entries, seed=_SEED):
+    """
+    ifconfig bridge0 addr output of `entries` forwarding entries over `members`
+    member interfaces (en1...)
+    """
+    rnd = random.Random(seed)
+    res = []
+    for index in range(entries):
+        dev = f"en{1 + index % max(members, 1)}"
+        vlan = 1 + index % 4
+        if index % 20 == 0:
+            res.append(f"{_mac(index, prefix=0xAA)} Vlan{vlan} {dev} 0 flags=8<STATIC>")
+        else:
+            res.append(
+                f"{_mac(index, prefix=0xAA)} Vlan{vlan} {dev} {rnd.randrange(1200)} flags=0<>"
+            )
+    return "\n".join(res) + "\n"
+
+
+def archive(links=10, routes=1000, neighbours=1000, members=0, entries=0):
+    """
+    Archive replaying the synthetic outputs (see backend.ReplayBackend)
+    """
+    items = interfaces(links, members)
+    table = netstat(routes)
+    inet, inet6 = table.split("\n\nInternet6:")
+    shell = {
+        IFCONFIG: "".join(text for _, text in items),
+        IFCONFIG_NAMES: " ".join(name for name, _ in items),
+        NETSTAT: table,
+        NETSTAT + ("-f", "inet"): inet + "\n",
+        NETSTAT + ("-f", "inet6"): "Routing tables\n\nInternet6:" + inet6,
+        ARP: arp(neighbours - neighbours // 2),
+        NDP: ndp(neighbours // 2),
+    }
+    if members:
+        shell[("ifconfig", "bridge0", "addr")] = bridge_addr(members, entries)
+    return {
+        "version": backend._ARCHIVE_VERSION,
+        "shell": [
+            {"argv": list(argv), "returncode": 0, "stdout": stdout, "stderr": ""}
+            for argv, stdout in shell.items()
+        ],
+        "sysctl": {_SNDQ_MAXLEN: 128},
+    }
+
+
+def usage():
+    sys.stderr.write("""\
+Usage: python -m benchmarks.synthetic [ -links COUNT ] [ -routes COUNT ]
+                                      [ -neighbours COUNT ]
+                                      [ -members COUNT [ -entries COUNT ] ]
+                                      ARCHIVE
+""")
+    exit(libc.EXIT_ERROR)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    scale = {}
+    path = None
+    while argv:
+        opt = argv.pop(0)
+        key = opt.lstrip("-")
+        if opt.startswith("-") and key in ("links", "routes", "neighbours", "members", "entries"):
+            try:
+                scale[key] = int(argv.pop(0))
+            except (IndexError, ValueError):
+                usage()
+        elif opt.startswith("-") or path:
+            usage()
+        else:
+            path = opt
+    if not path:
+        usage()
+    if scale.get("members") and "entries" not in scale:
+        scale["entries"] = 10 * scale["members"]
+    with backend._open(path, "w") as target:
+        json.dump(archive(**scale), target)
+    return libc.EXIT_SUCCESS
+
+
+if __name__ == "__main__":
+    sys.exit(main())
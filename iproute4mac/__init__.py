@@ -1,28 +1,122 @@
-from pbr.version import VersionInfo
-
-
-version_info = VersionInfo("iproute4mac")
-__version__ = version_info.release_string()
-
-# global options
-OPTION = {
-    "preferred_family": 0,
-    "human_readable": False,
-    "use_iec": False,
-    "show_stats": False,
-    "show_details": False,
-    "oneline": False,
-    "brief": False,
-    "json": False,
-    "pretty": False,
-    "timestamp": False,
-    "timestamp_short": False,
-    "echo_request": False,
-    "force": False,
-    "max_flush_loops": 10,
-    "batch_mode": False,
-    "do_all": False,
-    "uid": -1,
-    "compress_vlans": False,
-    "verbose": 3,
-}
+import contextlib
+import contextvars
+
+from collections.abc import Mapping, MutableMapping
+
+
+def __getattr__(name):
+    """
+    Resolve the version only when asked (e.g. ip -V): pbr reads the package metadata
+    """
+    if name in ("version_info", "__version__"):
+        from pbr.version import VersionInfo
+
+        version_info = VersionInfo("iproute4mac")
+        globals().update(version_info=version_info, __version__=version_info.release_string())
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class Options(Mapping):
+    """
+    Immutable options of a command: replace() returns the changed ones
+    """
+
+    __slots__ = ("_data",)
+
+    def __init__(self, *args, **kwargs):
+        self._data = dict(*args, **kwargs)
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self._data!r})"
+
+    def replace(self, *args, **kwargs):
+        return type(self)({**self._data, **dict(*args, **kwargs)})
+
+
+# options of a new command
+DEFAULTS = Options(
+    {
+        "preferred_family": 0,
+        "human_readable": False,
+        "use_iec": False,
+        "show_stats": False,
+        "show_details": False,
+        "oneline": False,
+        "brief": False,
+        "json": False,
+        "pretty": False,
+        "timestamp": False,
+        "timestamp_short": False,
+        "echo_request": False,
+        "force": False,
+        "max_flush_loops": 10,
+        "batch_mode": False,
+        "do_all": False,
+        "uid": -1,
+        "compress_vlans": False,
+        "verbose": 3,
+        "cache": 0,
+    }
+)
+
+_OPTIONS = contextvars.ContextVar("options", default=DEFAULTS)
+
+
+class _ContextOptions(MutableMapping):
+    """
+    Options of the current context (thread or asyncio task): setting one
+    replaces them in the current context only, other threads (e.g. other
+    queries of ipd) keep their own ones
+    """
+
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        return _OPTIONS.get()[key]
+
+    def __setitem__(self, key, value):
+        _OPTIONS.set(_OPTIONS.get().replace({key: value}))
+
+    def __delitem__(self, key):
+        raise TypeError("options cannot be deleted")
+
+    def __iter__(self):
+        return iter(_OPTIONS.get())
+
+    def __len__(self):
+        return len(_OPTIONS.get())
+
+    def update(self, *args, **kwargs):
+        _OPTIONS.set(_OPTIONS.get().replace(*args, **kwargs))
+
+
+OPTION = _ContextOptions()
+
+
+def options():
+    """
+    Options of the current context, as they are now (see OPTION)
+    """
+    return _OPTIONS.get()
+
+
+@contextlib.contextmanager
+def using(options):
+    """
+    Run with `options` (e.g. options().replace(json=True)) in the current context
+    """
+    token = _OPTIONS.set(options)
+    try:
+        yield options
+    finally:
+        _OPTIONS.reset(token)
@@ -0,0 +1,183 @@
+"""
+asyncio counterpart of iproute4mac.api, not blocking the event loop
+
+    import asyncio
+    import iproute4mac.aio as aio
+
+    links, routes, neighbours = await asyncio.gather(
+        aio.links(), aio.routes(), aio.neighbours()
+    )
+
+The commands read by a call (ifconfig, netstat, arp, ndp...) are run
+concurrently by asyncio subprocesses, along with those of the other calls;
+then their output is parsed and selected by the same call of iproute4mac.api
+on an executor. The routing table dump (sysctl NET_RT_DUMP) and getifaddrs(3),
+not forking any command, are read by the executor too.
+
+Parsing is serialized (see iproute4mac.api): gathered calls cost about as much
+as the slowest command, plus the parsing of every output.
+"""
+
+import asyncio
+import functools
+import sys
+
+import iproute4mac.api as api
+import iproute4mac.backend as backend
+import iproute4mac.ifconfig as ifconfig
+import iproute4mac.nud as nud
+import iproute4mac.route as route
+import iproute4mac.socket as socket
+import iproute4mac.utils as utils
+
+from iproute4mac.prefix import Prefix
+
+
+def _native(source):
+    """
+    Whether `source` ("getifaddrs" or "route_dump") is read without forking any command
+    """
+    if backend.get().offline:
+        return getattr(backend.get(), source)() is not None
+    return sys.platform == "darwin"
+
+
+async def _snapshots(*commands):
+    """
+    Output of the read-only `commands`, run concurrently
+
+    Failed commands are left out: they are run again by the call, reporting the error.
+    """
+    commands = list(dict.fromkeys(utils.flat_tuple(*args) for args in commands if args))
+
+    async def run(args):
+        try:
+            cmd = await backend.get().run_async(args)
+        except OSError:
+            return None
+        return cmd.stdout.rstrip("\n") if cmd.returncode == 0 else None
+
+    res = await asyncio.gather(*map(run, commands))
+    return {args: text for args, text in zip(commands, res) if text is not None}
+
+
+async def _executor(function, *args):
+    return await asyncio.get_running_loop().run_in_executor(None, function, *args)
+
+
+async def _call(function, snapshots, **kwargs):
+    """
+    Call of iproute4mac.api `function`, reading `snapshots` rather than running
+    the same commands again
+    """
+
+    def call():
+        with api.preloaded(snapshots):
+            return function(**kwargs)
+
+    return await _executor(call)
+
+
+async def _ifconfig(dev=None):
+    """
+    Commands output read by ifconfig.IpAddress(dev)
+    """
+    if dev is None:
+        return await _snapshots((ifconfig._IFCONFIG, *ifconfig._IFCONFIG_OPTS))
+    if _native("getifaddrs"):
+        res = {}
+        interfaces = await _executor(ifconfig.names)
+    else:
+        res = await _snapshots((ifconfig._IFCONFIG, "-l"))
+        interfaces = next(iter(res.values()), "").split()
+    if ifconfig._push_down(dev, interfaces):
+        res.update(await _snapshots((ifconfig._IFCONFIG, *ifconfig._IFCONFIG_OPTS, dev)))
+    else:
+        res.update(await _snapshots((ifconfig._IFCONFIG, *ifconfig._IFCONFIG_OPTS)))
+    return res
+
+
+async def _routes(family=None):
+    """
+    Commands output read by route.Routes(family)
+    """
+    commands = []
+    if not _native("getifaddrs"):
+        commands.append((ifconfig._IFCONFIG, *ifconfig._IFCONFIG_OPTS))
+    if not _native("route_dump"):
+        commands.append(route.Routes.netstat(family))
+    return await _snapshots(*commands)
+
+
+def _family(family):
+    return socket._AF_UNSPEC if family is None else socket.read_family(family)
+
+
+async def links(dev=None, up=False, master=None, kind=None):
+    """
+    Same as iproute4mac.api.links()
+    """
+    snapshots = await _ifconfig(dev if master is None else None)
+    return await _call(api.links, snapshots, dev=dev, up=up, master=master, kind=kind)
+
+
+async def addresses(dev=None, family=None, up=False, master=None, kind=None, to=None, scope=None):
+    """
+    Same as iproute4mac.api.addresses()
+    """
+    snapshots = await _ifconfig(dev if master is None else None)
+    return await _call(
+        api.addresses,
+        snapshots,
+        dev=dev,
+        family=family,
+        up=up,
+        master=master,
+        kind=kind,
+        to=to,
+        scope=scope,
+    )
+
+
+async def routes(family=None, **selectors):
+    """
+    Same as iproute4mac.api.routes()
+    """
+    snapshots = {} if selectors.get("to") else await _routes(_family(family))
+    return await _call(api.routes, snapshots, family=family, **selectors)
+
+
+async def neighbours(dev=None, to=None, family=None, **selectors):
+    """
+    Same as iproute4mac.api.neighbours()
+    """
+    try:
+        host = Prefix(to) if to else None
+    except ValueError:
+        # reported by the call
+        host = None
+    commands, _ = nud.Nud.commands(dev=dev, host=host, family=_family(family))
+    snapshots = await _snapshots(*commands)
+    return await _call(api.neighbours, snapshots, dev=dev, to=to, family=family, **selectors)
+
+
+async def fdb(br=None, dev=None, vlan=None):
+    """
+    Same as iproute4mac.api.fdb()
+    """
+    snapshots = await _snapshots((ifconfig._IFCONFIG, "-l"))
+    bridges = [
+        name
+        for name in next(iter(snapshots.values()), "").split()
+        if name.startswith("bridge") and br in (None, name)
+    ]
+    snapshots.update(await _snapshots(*[(ifconfig._IFCONFIG, name, "addr") for name in bridges]))
+    return await _call(api.fdb, snapshots, br=br, dev=dev, vlan=vlan)
+
+
+async def route_get(*destinations, uid=None):
+    """
+    Same as iproute4mac.api.route_get()
+    """
+    snapshots = await _routes()
+    return await _call(functools.partial(api.route_get, *destinations), snapshots, uid=uid)
@@ -0,0 +1,223 @@
+"""
+In-process API of iproute4mac: the objects shown by ip and bridge, without
+printing anything nor exiting
+
+    import iproute4mac.api as api
+
+    for link in api.addresses(dev="en0", family="inet"):
+        print(link.name, [a["local"] for a in link["addr_info"]])
+
+Every function reads the system again, and returns a list of items (see
+data._Item): their dict(details=False) is the JSON output of the CLI, but
+keys fixed by a selector (e.g. "dev") are kept.
+Failures raise an Error (e.g. NotFound). Every call has its own options,
+but calls are serialized: they share the commands output (see utils.snapshot()).
+"""
+
+import contextlib
+import os
+import threading
+
+import iproute4mac
+import iproute4mac.brfdb as brfdb
+import iproute4mac.ipaddress as ipaddress
+import iproute4mac.iplink as iplink
+import iproute4mac.ipneigh as ipneigh
+import iproute4mac.iproute as iproute
+import iproute4mac.libc as libc
+import iproute4mac.route as route
+import iproute4mac.socket as socket
+import iproute4mac.utils as utils
+
+
+class Error(Exception):
+    """
+    Failure of an iproute4mac call, `code` being the exit code of the CLI
+    """
+
+    def __init__(self, message, code=libc.EXIT_ERROR):
+        super().__init__(message)
+        self.code = code
+
+
+class InvalidArgument(Error, ValueError):
+    pass
+
+
+class NotFound(Error, LookupError):
+    pass
+
+
+class Unsupported(Error, NotImplementedError):
+    pass
+
+
+class CommandError(Error):
+    """
+    Failure of a system command (e.g. ifconfig), `command` being its argv
+    """
+
+    def __init__(self, message, code=libc.EXIT_FAILURE, command=None):
+        super().__init__(message, code)
+        self.command = command
+
+
+_ERRORS = {
+    "invalid": InvalidArgument,
+    "not_found": NotFound,
+    "unsupported": Unsupported,
+}
+
+_LOCK = threading.RLock()
+# commands output already read by the caller (see preloaded())
+_PRELOADED = {}
+
+
+def _error(e):
+    message = e.message or f"exit status {e.code}"
+    if e.kind == "command":
+        return CommandError(message, e.code, command=list(e.command))
+    return _ERRORS.get(e.kind, Error)(message, e.code)
+
+
+def _call(function, *args, family=None):
+    """
+    Run function(*args) as a new ip process would (quietly), returning the
+    list of the items it returns
+    """
+    options = iproute4mac.DEFAULTS.replace(uid=os.getuid(), verbose=-1)
+    if family is not None:
+        if (preferred_family := socket.read_family(family)) == socket._AF_UNSPEC:
+            raise InvalidArgument(f'invalid protocol family "{family}"')
+        options = options.replace(preferred_family=preferred_family)
+    with _LOCK, iproute4mac.using(options):
+        utils.invalidate()
+        utils.preload(_PRELOADED)
+        try:
+            # lazy items are looked up here
+            return list(function(*args))
+        except utils.Exit as e:
+            raise _error(e) from None
+        except SystemExit as e:
+            raise Error(f"exit status {e.code}", e.code) from None
+
+
+@contextlib.contextmanager
+def preloaded(snapshots):
+    """
+    Calls of this thread reading `snapshots` (argv: output) rather than running
+    the same commands again, e.g. as run asynchronously by iproute4mac.aio
+    """
+    with _LOCK:
+        _PRELOADED.update(snapshots)
+        try:
+            yield
+        finally:
+            _PRELOADED.clear()
+
+
+def _argv(*selectors):
+    """
+    Selectors argv (as of the CLI) from (keyword, value) pairs: a False or
+    None value is left out, a True one is a flag, a list is repeated
+    """
+    res = []
+    for keyword, value in selectors:
+        if value is None or value is False:
+            continue
+        if value is True:
+            res.append(keyword)
+        elif isinstance(value, list | tuple | set):
+            for item in value:
+                res += [keyword, str(item)]
+        else:
+            res += [keyword, str(value)]
+    return res
+
+
+def links(dev=None, up=False, master=None, kind=None):
+    """
+    Links, as of ip link show [ dev DEV ] [ up ] [ master DEV ] [ type KIND ]
+    """
+    argv = _argv(("dev", dev), ("up", up), ("master", master), ("type", kind))
+    return _call(iplink.get_iplinks, argv, family="link")
+
+
+def addresses(dev=None, family=None, up=False, master=None, kind=None, to=None, scope=None):
+    """
+    Links with their addresses, as of ip [ -f FAMILY ] address show [ dev DEV ]
+    [ up ] [ master DEV ] [ type KIND ] [ to PREFIX ] [ scope SCOPE ]
+    """
+    argv = _argv(
+        ("dev", dev),
+        ("up", up),
+        ("master", master),
+        ("type", kind),
+        ("to", to),
+        ("scope", scope),
+    )
+    return _call(ipaddress.get_addresses, argv, family=family)
+
+
+def routes(
+    family=None,
+    to=None,
+    root=None,
+    match=None,
+    dev=None,
+    via=None,
+    src=None,
+    protocol=None,
+    scope=None,
+    kind=None,
+):
+    """
+    Routes, as of ip [ -f FAMILY ] route show [ exact TO ] [ root PREFIX ]
+    [ match PREFIX ] [ dev DEV ] [ via ADDRESS ] [ src ADDRESS ]
+    [ protocol PROTO ] [ scope SCOPE ] [ type KIND ]: both IPv4 and IPv6
+    routes without a family
+    """
+    argv = _argv(
+        ("exact", to),
+        ("root", root),
+        ("match", match),
+        ("dev", dev),
+        ("via", via),
+        ("src", src),
+        ("protocol", protocol),
+        ("scope", scope),
+        ("type", kind),
+    )
+    if family is None:
+        argv += ["table", "all"]
+    return _call(lambda: iproute.get_routes(argv, display=False), family=family)
+
+
+def neighbours(dev=None, to=None, family=None, nud=None, proxy=False, unused=False):
+    """
+    Neighbours, as of ip [ -f FAMILY ] neigh show [ dev DEV ] [ to ADDRESS ]
+    [ nud STATE ... ] [ proxy ] [ unused ]
+    """
+    argv = _argv(("dev", dev), ("to", to), ("nud", nud), ("proxy", proxy), ("unused", unused))
+    return _call(lambda: ipneigh.get_neighbours(argv, display=False), family=family)
+
+
+def fdb(br=None, dev=None, vlan=None):
+    """
+    Bridge forwarding entries, as of bridge fdb show [ br BRIDGE ] [ dev DEV ] [ vlan VID ]
+    """
+    argv = _argv(("br", br), ("dev", dev), ("vlan", vlan))
+    return _call(lambda: brfdb.get_fdb(argv, display=False))
+
+
+def route_get(*destinations, uid=None):
+    """
+    Route to every destination, as of ip route get: all of them from the
+    same routing table, unreachable destinations being left out
+    """
+
+    def get():
+        hosts = [iproute._get_host(to, socket._AF_UNSPEC) for to in destinations]
+        return route.RouteGets(hosts, uid=os.getuid() if uid is None else uid)
+
+    return _call(get)
@@ -0,0 +1,336 @@
+import atexit
+import base64
+import gzip
+import json
+import os
+import socket
+import subprocess
+import threading
+
+import iproute4mac.ifaddrs as ifaddrs
+import iproute4mac.libc as libc
+import iproute4mac.rtsock as rtsock
+
+
+# select the command backend from the environment (e.g. to profile on Linux)
+ENV_RECORD = "IPROUTE4MAC_RECORD"
+ENV_REPLAY = "IPROUTE4MAC_REPLAY"
+ENV_SIMULATE = "IPROUTE4MAC_SIMULATE"
+
+_ARCHIVE_VERSION = 1
+_NOT_RECORDED = 127  # same as "command not found"
+
+# macOS <netinet/in.h>: sockets scoped to an interface
+_IP_BOUND_IF = 25
+_IPV6_BOUND_IF = 125
+
+
+def _source_key(address, dev):
+    """
+    Key of a source address in the archive
+    """
+    return address if dev is None else f"{address} dev {dev}"
+
+
+def _open(path, mode):
+    if str(path).endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class Backend:
+    """
+    Run system commands on the live system
+    """
+
+    __slots__ = ()
+
+    @property
+    def offline(self):
+        return False
+
+    def run(self, args):
+        return subprocess.run(
+            args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, encoding="utf-8"
+        )
+
+    async def run_async(self, args):
+        """
+        Same as run(), without blocking the event loop while the command runs
+        """
+        import asyncio
+
+        proc = await asyncio.create_subprocess_exec(
+            *args, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        stdout, stderr = await proc.communicate()
+        return subprocess.CompletedProcess(
+            args, proc.returncode, stdout.decode("utf-8"), stderr.decode("utf-8")
+        )
+
+    def sysctl(self, name):
+        return libc.sysctl(name)
+
+    def getifaddrs(self):
+        return ifaddrs.getifaddrs()
+
+    def route_dump(self):
+        return rtsock.dump()
+
+    def route_socket(self):
+        return rtsock.routing_socket()
+
+    def source_address(self, address, dev=None):
+        """
+        Source address selected by the kernel to reach `address` (through
+        interface `dev`, if given), None if unreachable
+        """
+        family = socket.AF_INET6 if ":" in address else socket.AF_INET
+        try:
+            with socket.socket(family, socket.SOCK_DGRAM) as sock:
+                if dev is not None:
+                    if family == socket.AF_INET6:
+                        sock.setsockopt(
+                            socket.IPPROTO_IPV6, _IPV6_BOUND_IF, socket.if_nametoindex(dev)
+                        )
+                    else:
+                        sock.setsockopt(socket.IPPROTO_IP, _IP_BOUND_IF, socket.if_nametoindex(dev))
+                # no packet is sent: connecting a UDP socket only selects the route
+                sock.connect((address, 7))
+                return sock.getsockname()[0]
+        except OSError:
+            return None
+
+
+class RecordBackend(Backend):
+    """
+    Run system commands on the live system and save their output into an archive
+    """
+
+    __slots__ = (
+        "_archive",
+        "_getifaddrs",
+        "_lock",
+        "_route_dump",
+        "_shell",
+        "_source_address",
+        "_sysctl",
+    )
+
+    def __init__(self, archive):
+        self._archive = archive
+        self._lock = threading.Lock()
+        self._shell = []
+        self._sysctl = {}
+        self._source_address = {}
+        self._getifaddrs = None
+        self._route_dump = None
+        atexit.register(self.save)
+
+    def _record(self, cmd):
+        with self._lock:
+            self._shell.append(
+                {
+                    "argv": list(cmd.args),
+                    "returncode": cmd.returncode,
+                    "stdout": cmd.stdout,
+                    "stderr": cmd.stderr,
+                }
+            )
+        return cmd
+
+    def run(self, args):
+        return self._record(super().run(args))
+
+    async def run_async(self, args):
+        return self._record(await super().run_async(args))
+
+    def sysctl(self, name):
+        value = super().sysctl(name)
+        with self._lock:
+            self._sysctl[name] = value
+        return value
+
+    def getifaddrs(self):
+        value = super().getifaddrs()
+        with self._lock:
+            self._getifaddrs = value
+        return value
+
+    def route_dump(self):
+        value = super().route_dump()
+        with self._lock:
+            self._route_dump = value
+        return value
+
+    def source_address(self, address, dev=None):
+        value = super().source_address(address, dev=dev)
+        with self._lock:
+            self._source_address[_source_key(address, dev)] = value
+        return value
+
+    def save(self):
+        with self._lock:
+            data = {"version": _ARCHIVE_VERSION, "shell": self._shell, "sysctl": self._sysctl}
+            if self._source_address:
+                data["source_address"] = self._source_address
+            if self._getifaddrs is not None:
+                data["getifaddrs"] = self._getifaddrs
+            if self._route_dump is not None:
+                data["route_dump"] = base64.b64encode(self._route_dump).decode()
+        with _open(self._archive, "w") as archive:
+            json.dump(data, archive, indent=1)
+
+
+class ReplayBackend(Backend):
+    """
+    Serve system commands output from an archive saved by RecordBackend
+
+    The same command recorded more than once is replayed in the recorded order,
+    then the last output is repeated.
+    """
+
+    __slots__ = ("_getifaddrs", "_lock", "_route_dump", "_shell", "_source_address", "_sysctl")
+
+    def __init__(self, archive):
+        if isinstance(archive, dict):
+            data = archive
+        else:
+            with _open(archive, "r") as source:
+                data = json.load(source)
+        if data.get("version") != _ARCHIVE_VERSION:
+            raise ValueError(f'unsupported archive version "{data.get("version")}"')
+        self._lock = threading.Lock()
+        self._shell = {}
+        for record in data.get("shell", []):
+            self._shell.setdefault(tuple(record["argv"]), []).append(record)
+        self._sysctl = data.get("sysctl", {})
+        self._getifaddrs = data.get("getifaddrs")
+        self._route_dump = base64.b64decode(data["route_dump"]) if "route_dump" in data else None
+        self._source_address = data.get("source_address", {})
+
+    @property
+    def offline(self):
+        return True
+
+    def run(self, args):
+        args = tuple(args)
+        with self._lock:
+            records = self._shell.get(args)
+            if not records:
+                return subprocess.CompletedProcess(
+                    args, _NOT_RECORDED, "", f'{args[0]}: no output recorded for "{" ".join(args)}"'
+                )
+            record = records.pop(0) if len(records) > 1 else records[0]
+        return subprocess.CompletedProcess(
+            args, record["returncode"], record["stdout"], record["stderr"]
+        )
+
+    async def run_async(self, args):
+        # nothing to wait for
+        return self.run(args)
+
+    def sysctl(self, name):
+        return self._sysctl.get(name)
+
+    def getifaddrs(self):
+        return self._getifaddrs
+
+    def route_dump(self):
+        return self._route_dump
+
+    def route_socket(self):
+        # routing messages are not recorded: fall back to the route command
+        return None
+
+    def source_address(self, address, dev=None):
+        return self._source_address.get(_source_key(address, dev))
+
+
+class SimulatedBackend(Backend):
+    """
+    Run system commands on a simulated network (see simulator.Network)
+
+    Input:
+    `network` path of the JSON file the network is saved into, shared with the
+    other processes simulating it, or a simulator.Network
+    """
+
+    __slots__ = ("_lock", "_store")
+
+    def __init__(self, network):
+        import iproute4mac.simulator as simulator
+
+        self._lock = threading.Lock()
+        self._store = simulator.Store(network)
+
+    @property
+    def offline(self):
+        return True
+
+    def run(self, args):
+        with self._lock, self._store.network() as network:
+            return network.run(args)
+
+    async def run_async(self, args):
+        # nothing to wait for
+        return self.run(args)
+
+    def sysctl(self, name):
+        with self._lock, self._store.network() as network:
+            return network.sysctl.get(name)
+
+    def getifaddrs(self):
+        with self._lock, self._store.network() as network:
+            return network.getifaddrs()
+
+    def route_dump(self):
+        # no routing sysctl: fall back to netstat
+        return None
+
+    def route_socket(self):
+        return None
+
+    def source_address(self, address, dev=None):
+        with self._lock, self._store.network() as network:
+            return network.source_address(address, dev=dev)
+
+
+_backend = None
+
+
+def get():
+    global _backend
+    if _backend is None:
+        if archive := os.environ.get(ENV_REPLAY):
+            _backend = ReplayBackend(archive)
+        elif archive := os.environ.get(ENV_RECORD):
+            _backend = RecordBackend(archive)
+        elif network := os.environ.get(ENV_SIMULATE):
+            _backend = SimulatedBackend(network)
+        else:
+            _backend = Backend()
+    return _backend
+
+
+def set(backend):
+    global _backend
+    if backend is not None and not isinstance(backend, Backend):
+        raise ValueError(f"backend must be of {Backend}")
+    _backend = backend
+
+
+def record(archive):
+    set(RecordBackend(archive))
+
+
+def replay(archive):
+    set(ReplayBackend(archive))
+
+
+def simulate(network):
+    set(SimulatedBackend(network))
+
+
+def live():
+    set(Backend())
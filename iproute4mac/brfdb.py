@@ -1,9 +1,9 @@
-import iproute4mac.data as data
 import iproute4mac.ifconfig as ifconfig
 import iproute4mac.libc as libc
 import iproute4mac.utils as utils
 
 from iproute4mac import OPTION
+from iproute4mac.query import Query
 from iproute4mac.utils import matches, strcmp, next_arg
 
 
@@ -91,17 +91,17 @@ def brfdb_modify(argv):
     return libc.EXIT_SUCCESS
 
 
-def brfdb_list(argv):
-    entries = ifconfig.FDB()
+def get_fdb(argv, display=True):
+    query = Query(display=display)
     while argv:
         opt = argv.pop(0)
         if strcmp(opt, "brport", "dev"):
             dev = next_arg(argv)
-            entries.set([e for e in entries if e["ifname"] == dev])
-            data.delete_keys(entries, "ifname")
+            query.where(lambda e, dev=dev: e["ifname"] == dev)
+            query.delete_keys("ifname")
         elif strcmp(opt, "br"):
             dev = next_arg(argv)
-            entries.set([e for e in entries if e.bridge == dev])
+            query.where(lambda e, dev=dev: e.bridge == dev).hint("br", dev)
         elif strcmp(opt, "vlan"):
             vlan_id = next_arg(argv)
             try:
@@ -109,13 +109,18 @@ def brfdb_list(argv):
                 assert 0 <= vlan_id < 2**12
             except (ValueError, AssertionError):
                 utils.invarg(f'Invalid "{opt}" value', vlan_id)
-            entries.set([e for e in entries if e["vlan"] == vlan_id])
+            query.where(lambda e, vlan_id=vlan_id: e["vlan"] == vlan_id)
         else:
             if matches(opt, "help"):
                 usage()
 
-    utils.output(entries)
+    entries = ifconfig.FDB(bridge=query.hinted("br"))
+    entries.query(query)
+    return entries
+
 
+def brfdb_list(argv):
+    utils.output(get_fdb(argv))
     return libc.EXIT_SUCCESS
 
 
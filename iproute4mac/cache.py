@@ -0,0 +1,160 @@
+import fcntl
+import glob
+import hashlib
+import os
+import pickle
+import tempfile
+import time
+
+
+# on-disk cache location (default: $XDG_CACHE_HOME/iproute4mac)
+ENV_CACHE_DIR = "IPROUTE4MAC_CACHE_DIR"
+
+
+def directory():
+    if path := os.environ.get(ENV_CACHE_DIR):
+        return path
+    home = os.path.expanduser("~")
+    try:
+        # e.g. root by sudo, keeping the HOME of the user
+        foreign = os.stat(home).st_uid != os.geteuid()
+    except OSError:
+        foreign = True
+    if foreign:
+        return os.path.join(tempfile.gettempdir(), f"iproute4mac-{os.geteuid()}")
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(home, ".cache")
+    return os.path.join(base, "iproute4mac")
+
+
+def trusted(stat):
+    """
+    Whether a file (or directory) of `stat` can only be written by the effective user
+    """
+    return stat.st_uid == os.geteuid() and not stat.st_mode & 0o077
+
+
+def digest(key):
+    res = hashlib.sha1()
+    for value in key:
+        if isinstance(value, str):
+            value = value.encode()
+        elif not isinstance(value, bytes):
+            value = repr(value).encode()
+        res.update(value)
+        res.update(b"\0")
+    return res.hexdigest()
+
+
+class DiskCache:
+    """
+    Cross-process cache of commands output and parsed objects
+
+    Every entry is a pickled dictionary with the "timestamp" of its creation,
+    the cached "value", and the "tag" it is valid for (e.g. the digest of the
+    output it was parsed from). Entries are replaced atomically, so they are
+    read without locking; an expired entry is refreshed by the first process
+    locking it, while the others wait for and reuse its result.
+
+    Nothing is read from (nor written to) a directory, or file, another user
+    could have written: the cache is bypassed instead.
+    """
+
+    __slots__ = ("_path", "_ttl")
+
+    def __init__(self, ttl, path=None):
+        self._ttl = ttl
+        self._path = path or directory()
+
+    def _file(self, kind, key):
+        return os.path.join(self._path, f"{kind}-{digest(key)}")
+
+    def _load(self, file, tag):
+        try:
+            with open(file + ".pickle", "rb") as source:
+                if not trusted(os.fstat(source.fileno())):
+                    return None
+                entry = pickle.load(source)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if not isinstance(entry, dict) or time.time() - entry.get("timestamp", 0) >= self._ttl:
+            return None
+        if entry.get("tag") != tag:
+            return None
+        return entry
+
+    def _directory(self):
+        """
+        Create the cache directory if needed, return whether it can be used
+        """
+        try:
+            os.makedirs(self._path, mode=0o700, exist_ok=True)
+            return trusted(os.lstat(self._path))
+        except OSError:
+            return False
+
+    def _save(self, file, entry):
+        fd, tmp = tempfile.mkstemp(dir=self._path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as target:
+                pickle.dump(entry, target, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, file + ".pickle")
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def get(self, kind, key, refresh, tag=None):
+        """
+        Return the cached value of (`kind`, `key`), calling `refresh()` if expired
+
+        Input:
+        `kind` entry kind (e.g. command name or parsed class name)
+        `key` iterable of str identifying the entry (e.g. argv): a refreshed
+        entry replaces the previous one of the same key
+        `refresh` callable returning the new value (not cached if not str, list or dict)
+        `tag` (optional) str the entry is valid for: an entry of another tag is expired
+        """
+        if not self._directory():
+            return refresh()
+        file = self._file(kind, key)
+        if entry := self._load(file, tag):
+            return entry["value"]
+        with os.fdopen(os.open(file + ".lock", os.O_WRONLY | os.O_CREAT, 0o600), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                # someone else may have refreshed the entry while waiting
+                if entry := self._load(file, tag):
+                    return entry["value"]
+                value = refresh()
+                if isinstance(value, str | list | dict):
+                    self._save(file, {"timestamp": time.time(), "value": value, "tag": tag})
+                return value
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def invalidate(self, *kinds):
+        """
+        Remove the entries (and their lock) of `kinds` (all entries if none is given)
+
+        A process still holding a removed lock may refresh the entry along with
+        another one: both results are valid, the last one is kept.
+        """
+        for kind in kinds or ("*",):
+            for suffix in (".pickle", ".lock"):
+                pattern = os.path.join(glob.escape(self._path), f"{kind}-*{suffix}")
+                for file in glob.glob(pattern):
+                    try:
+                        os.unlink(file)
+                    except FileNotFoundError:
+                        pass
+
+
+def invalidate(*kinds):
+    """
+    Remove the on-disk entries of `kinds`, whether the cache is enabled or not
+    """
+    try:
+        stat = os.lstat(path := directory())
+    except OSError:
+        return
+    if trusted(stat):
+        DiskCache(0, path).invalidate(*kinds)
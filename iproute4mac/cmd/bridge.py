@@ -4,17 +4,14 @@ import iproute4mac
 import os
 import sys
 
-import iproute4mac.brlink as brlink
-import iproute4mac.brfdb as brfdb
+import iproute4mac.backend as backend
+import iproute4mac.ipd as ipd
 import iproute4mac.libc as libc
+import iproute4mac.profiler as profiler
 import iproute4mac.socket as socket
 import iproute4mac.utils as utils
 
-from iproute4mac import __version__, OPTION
-from iproute4mac.utils import matches, strcmp, matches_color
-
-
-OPTION["uid"] = os.getuid()
+from iproute4mac.utils import lazy, matches, strcmp, matches_color
 
 
 def do_help(argv=[]):
@@ -28,14 +25,15 @@ Usage: bridge [ OPTIONS ] OBJECT { COMMAND | help }
 where  OBJECT := { link | fdb | mdb | vlan | vni | monitor }
        OPTIONS := { -V[ersion] | -s[tatistics] | -d[etails] |
                     -o[neline] | -t[imestamp] | -n[etns] name |
-                    -com[pressvlans] -c[olor] -p[retty] -j[son] }""")
+                    -com[pressvlans] -c[olor] -p[retty] -j[son] |
+                    -ca[che] TTL | -pro[file][=FILE] }""")
     exit(libc.EXIT_ERROR)
 
 
-# Implemented objects
+# Implemented objects (imported when run)
 OBJS = [
-    ("link", brlink.do_brlink),
-    ("fdb", brfdb.do_brfdb),
+    ("link", lazy("brlink", "do_brlink")),
+    ("fdb", lazy("brfdb", "do_brfdb")),
     ("mdb", utils.do_notimplemented),
     ("vlan", utils.do_notimplemented),
     ("vni", utils.do_notimplemented),
@@ -55,11 +53,13 @@ def do_obj(argv):
 
 
 def main():
-    if sys.platform != "darwin":
+    if sys.platform != "darwin" and not backend.get().offline:
         utils.stderr("Unupported OS.")
         exit(libc.EXIT_ERROR)
 
+    options = iproute4mac.DEFAULTS.replace(uid=os.getuid())
     batch_file = None
+    profile = False
     argv = sys.argv[1:]
     while argv:
         if argv[0] == "--":
@@ -75,16 +75,16 @@ def main():
         if matches(opt, "-help"):
             usage()
         elif matches(opt, "-Version"):
-            print(f"bridge wrapper, iproute4mac-{__version__}")
+            print(f"bridge wrapper, iproute4mac-{iproute4mac.__version__}")
             exit(libc.EXIT_SUCCESS)
         elif matches(opt, "-stats".startswith(opt) or "-statistics"):
-            OPTION["show_stats"] = True
+            options = options.replace(show_stats=True)
         elif matches(opt, "-details"):
-            OPTION["show_details"] = True
+            options = options.replace(show_details=True)
         elif matches(opt, "-oneline"):
-            OPTION["oneline"] = True
+            options = options.replace(oneline=True)
         elif matches(opt, "-timestamp"):
-            OPTION["timestamp"] = True
+            options = options.replace(timestamp=True)
         elif matches(opt, "-family"):
             try:
                 opt = argv.pop(0)
@@ -92,52 +92,69 @@ def main():
                 utils.missarg("family type")
             if strcmp(opt, "help"):
                 usage()
-            OPTION["preferred_family"] = socket.read_family(opt)
-            if OPTION["preferred_family"] == socket._AF_UNSPEC:
+            options = options.replace(preferred_family=socket.read_family(opt))
+            if options["preferred_family"] == socket._AF_UNSPEC:
                 utils.invarg("invalid protocol family", opt)
         elif strcmp(opt, "-4"):
-            OPTION["preferred_family"] = socket._AF_INET
+            options = options.replace(preferred_family=socket._AF_INET)
         elif strcmp(opt, "-6"):
-            OPTION["preferred_family"] = socket._AF_INET6
+            options = options.replace(preferred_family=socket._AF_INET6)
         elif matches(opt, "-netns"):
             utils.do_notimplemented()
         elif matches_color(opt):
             # silently ignore not implemented color option
             pass
+        elif matches(opt, "-cache"):
+            try:
+                options = options.replace(cache=float(argv.pop(0)))
+            except IndexError:
+                utils.missarg("cache TTL")
+            except ValueError:
+                utils.error("cache TTL not a number")
+            if options["cache"] < 0:
+                utils.error("cache TTL must be positive")
+        elif matches(opt.partition("=")[0], "-profile"):
+            # -profile=FILE dumps the cProfile stats into FILE, besides the summary
+            profile = opt.partition("=")[2] or True
         elif matches(opt, "-compressvlans"):
-            OPTION["compress_vlans"] = True
+            options = options.replace(compress_vlans=True)
         elif matches(opt, "-force"):
-            OPTION["force"] = True
+            options = options.replace(force=True)
         elif matches(opt, "-json"):
-            OPTION["json"] = True
+            options = options.replace(json=True)
         elif matches(opt, "-pretty"):
-            OPTION["pretty"] = True
+            options = options.replace(pretty=True)
         elif matches(opt, "-batch"):
             try:
                 batch_file = argv.pop(0)
             except IndexError:
                 utils.missarg("batch file")
         elif matches(opt, "-verbose", "-vvv"):
-            while opt[1] == "v" and OPTION["verbose"] < utils.LOG_DEBUG:
-                OPTION["verbose"] += 1
+            while opt[1] == "v" and options["verbose"] < utils.LOG_DEBUG:
+                options = options.replace(verbose=options["verbose"] + 1)
                 if len(opt) <= 2:
                     break
                 opt = opt[1:]
         elif matches(opt, "-silent"):
-            OPTION["verbose"] = utils.LOG_STDERR
+            options = options.replace(verbose=utils.LOG_STDERR)
         elif matches(opt, "-quiet"):
-            OPTION["verbose"] = -1
+            options = options.replace(verbose=-1)
         elif matches(opt, "-debug"):
             pass
         else:
             utils.stderr(f'Option "{opt}" is unknown, try "bridge help".')
             exit(libc.EXIT_ERROR)
 
-    if batch_file:
-        utils.do_notimplemented()
+    # as a new process, even if run by another command (e.g. in-process by tests)
+    utils.invalidate()
+    with iproute4mac.using(options), profiler.profiling(profile):
+        if batch_file:
+            return utils.batch(batch_file, do_obj)
 
-    if argv:
-        return do_obj(argv)
+        if argv:
+            if (res := ipd.forward("bridge", argv)) is not None:
+                return res
+            return do_obj(argv)
 
     usage()
 
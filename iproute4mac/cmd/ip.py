@@ -4,20 +4,14 @@ import iproute4mac
 import os
 import sys
 
-import iproute4mac.debug as debug
-import iproute4mac.ipaddress as ipaddress
-import iproute4mac.iplink as iplink
-import iproute4mac.ipneigh as ipneigh
-import iproute4mac.iproute as iproute
+import iproute4mac.backend as backend
+import iproute4mac.ipd as ipd
 import iproute4mac.libc as libc
+import iproute4mac.profiler as profiler
 import iproute4mac.socket as socket
 import iproute4mac.utils as utils
 
-from iproute4mac import __version__, OPTION
-from iproute4mac.utils import matches, strcmp, matches_color
-
-
-OPTION["uid"] = os.getuid()
+from iproute4mac.utils import lazy, matches, strcmp, matches_color
 
 
 def do_help(argv=[]):
@@ -40,22 +34,22 @@ where  OBJECT := { address | addrlabel | fou | help | ila | ioam | l2tp | link |
                     -l[oops] { maximum-addr-flush-attempts } | -echo | -br[ief] |
                     -o[neline] | -t[imestamp] | -ts[hort] | -b[atch] [filename] |
                     -rc[vbuf] [size] | -n[etns] name | -N[umeric] | -a[ll] |
-                    -c[olor]}""")
+                    -c[olor] | -ca[che] TTL | -pro[file][=FILE] }""")
     exit(libc.EXIT_ERROR)
 
 
-# Implemented objects
+# Implemented objects (imported when run)
 OBJS = [
-    ("address", ipaddress.do_ipaddr),
+    ("address", lazy("ipaddress", "do_ipaddr")),
     ("addrlabel", utils.do_notimplemented),
     ("maddress", utils.do_notimplemented),
-    ("route", iproute.do_iproute),
+    ("route", lazy("iproute", "do_iproute")),
     ("rule", utils.do_notimplemented),
-    ("neighbor", ipneigh.do_ipneigh),
-    ("neighbour", ipneigh.do_ipneigh),
+    ("neighbor", lazy("ipneigh", "do_ipneigh")),
+    ("neighbour", lazy("ipneigh", "do_ipneigh")),
     ("ntable", utils.do_notimplemented),
     ("ntbl", utils.do_notimplemented),
-    ("link", iplink.do_iplink),
+    ("link", lazy("iplink", "do_iplink")),
     ("l2tp", utils.do_notimplemented),
     ("fou", utils.do_notimplemented),
     ("ila", utils.do_notimplemented),
@@ -67,7 +61,7 @@ OBJS = [
     ("token", utils.do_notimplemented),
     ("tcpmetrics", utils.do_notimplemented),
     ("tcp_metrics", utils.do_notimplemented),
-    ("monitor", utils.do_notimplemented),
+    ("monitor", lazy("ipmonitor", "do_ipmonitor")),
     ("xfrm", utils.do_notimplemented),
     ("mroute", utils.do_notimplemented),
     ("mrule", utils.do_notimplemented),
@@ -80,7 +74,7 @@ OBJS = [
     ("ioam", utils.do_notimplemented),
     ("help", do_help),
     ("stats", utils.do_notimplemented),
-    ("debug", debug.do_debug),
+    ("debug", lazy("debug", "do_debug")),
 ]
 
 
@@ -95,11 +89,13 @@ def do_obj(argv):
 
 
 def main():
-    if sys.platform != "darwin":
+    if sys.platform != "darwin" and not backend.get().offline:
         utils.stderr("Unupported OS.")
         exit(libc.EXIT_ERROR)
 
+    options = iproute4mac.DEFAULTS.replace(uid=os.getuid())
     batch_file = None
+    profile = False
     argv = sys.argv[1:]
     while argv:
         if argv[0] == "--":
@@ -114,7 +110,7 @@ def main():
 
         if matches(opt, "-loops"):
             try:
-                OPTION["max_flush_loops"] = int(argv.pop(0))
+                options = options.replace(max_flush_loops=int(argv.pop(0)))
             except IndexError:
                 utils.missarg("loop count")
             except ValueError:
@@ -126,55 +122,54 @@ def main():
                 utils.missarg("family type")
             if strcmp(opt, "help"):
                 usage()
-            OPTION["preferred_family"] = socket.read_family(opt)
-            if OPTION["preferred_family"] == socket._AF_UNSPEC:
+            options = options.replace(preferred_family=socket.read_family(opt))
+            if options["preferred_family"] == socket._AF_UNSPEC:
                 utils.invarg("invalid protocol family", opt)
         elif strcmp(opt, "-4"):
-            OPTION["preferred_family"] = socket._AF_INET
+            options = options.replace(preferred_family=socket._AF_INET)
         elif strcmp(opt, "-6"):
-            OPTION["preferred_family"] = socket._AF_INET6
+            options = options.replace(preferred_family=socket._AF_INET6)
         elif strcmp(opt, "-0"):
-            OPTION["preferred_family"] = socket._AF_PACKET
+            options = options.replace(preferred_family=socket._AF_PACKET)
         elif strcmp(opt, "-M"):
-            OPTION["preferred_family"] = socket._AF_MPLS
+            options = options.replace(preferred_family=socket._AF_MPLS)
         elif strcmp(opt, "-B"):
-            OPTION["preferred_family"] = socket._AF_BRIDGE
+            options = options.replace(preferred_family=socket._AF_BRIDGE)
         elif matches(opt, "-human-readable"):
-            OPTION["human_readable"] = True
+            options = options.replace(human_readable=True)
         elif matches(opt, "-iec"):
-            OPTION["use_iec"] = True
+            options = options.replace(use_iec=True)
         elif matches(opt, "-stats", "-statistics"):
-            OPTION["show_stats"] = True
+            options = options.replace(show_stats=True)
         elif matches(opt, "-details"):
-            OPTION["show_details"] = True
+            options = options.replace(show_details=True)
         elif matches(opt, "-resolve"):
-            OPTION["resolve_hosts"] = True
+            options = options.replace(resolve_hosts=True)
         elif matches(opt, "-oneline"):
-            OPTION["oneline"] = True
+            options = options.replace(oneline=True)
         elif matches(opt, "-timestamp"):
-            OPTION["timestamp"] = True
+            options = options.replace(timestamp=True)
         elif matches(opt, "-tshort"):
-            OPTION["timestamp"] = True
-            OPTION["timestamp_short"] = True
+            options = options.replace(timestamp=True, timestamp_short=True)
         elif matches(opt, "-Version"):
-            print(f"ip wrapper, iproute4mac-{__version__}")
+            print(f"ip wrapper, iproute4mac-{iproute4mac.__version__}")
             exit(libc.EXIT_SUCCESS)
         elif matches(opt, "-force"):
-            OPTION["force"] = True
+            options = options.replace(force=True)
         elif matches(opt, "-batch"):
             try:
                 batch_file = argv.pop(0)
             except IndexError:
                 utils.missarg("batch file")
         elif matches(opt, "-brief"):
-            OPTION["brief"] = True
+            options = options.replace(brief=True)
         elif matches(opt, "-json"):
-            OPTION["json"] = True
+            options = options.replace(json=True)
         elif matches(opt, "-pretty"):
-            OPTION["pretty"] = True
+            options = options.replace(pretty=True)
         elif matches(opt, "-rcvbuf"):
             try:
-                OPTION["rcvbuf"] = int(argv.pop(0))
+                options = options.replace(rcvbuf=int(argv.pop(0)))
             except IndexError:
                 utils.missarg("rcvbuf size")
             except ValueError:
@@ -182,37 +177,56 @@ def main():
         elif matches_color(opt):
             # silently ignore not implemented color option
             pass
+        elif matches(opt, "-cache"):
+            try:
+                options = options.replace(cache=float(argv.pop(0)))
+            except IndexError:
+                utils.missarg("cache TTL")
+            except ValueError:
+                utils.error("cache TTL not a number")
+            if options["cache"] < 0:
+                utils.error("cache TTL must be positive")
+        elif matches(opt.partition("=")[0], "-profile"):
+            # -profile=FILE dumps the cProfile stats into FILE, besides the summary
+            profile = opt.partition("=")[2] or True
         elif matches(opt, "-help"):
             usage()
         elif matches(opt, "-netns"):
             utils.do_notimplemented()
         elif matches(opt, "-Numeric"):
-            OPTION["numeric"] = True
+            options = options.replace(numeric=True)
         elif matches(opt, "-all"):
-            OPTION["do_all"] = True
+            options = options.replace(do_all=True)
         elif strcmp(opt, "-echo"):
-            OPTION["echo_request"] = True
+            options = options.replace(echo_request=True)
         elif matches(opt, "-verbose", "-vvv"):
-            while opt[1] == "v" and OPTION["verbose"] < utils.LOG_DEBUG:
-                OPTION["verbose"] += 1
+            while opt[1] == "v" and options["verbose"] < utils.LOG_DEBUG:
+                options = options.replace(verbose=options["verbose"] + 1)
                 if len(opt) <= 2:
                     break
                 opt = opt[1:]
         elif matches(opt, "-silent"):
-            OPTION["verbose"] = utils.LOG_STDERR
+            options = options.replace(verbose=utils.LOG_STDERR)
         elif matches(opt, "-quiet"):
-            OPTION["verbose"] = -1
+            options = options.replace(verbose=-1)
         elif matches(opt, "-debug"):
-            debug.all()
+            lazy("debug", "all")()
         else:
             utils.stderr(f'Option "{opt}" is unknown, try "ip -help".')
             exit(libc.EXIT_ERROR)
 
-    if batch_file:
-        utils.do_notimplemented()
-
-    if argv:
-        return do_obj(argv)
+    # as a new process, even if run by another command (e.g. in-process by tests)
+    utils.invalidate()
+    with iproute4mac.using(options), profiler.profiling(profile):
+        if batch_file:
+            return utils.batch(batch_file, do_obj)
+
+        if argv:
+            # monitor streams its output from this process
+            obj = next((o for o, f in OBJS if o.startswith(argv[0])), None)
+            if obj != "monitor" and (res := ipd.forward("ip", argv)) is not None:
+                return res
+            return do_obj(argv)
 
     usage()
 
@@ -1,3 +1,8 @@
+import iproute4mac.profiler as profiler
+
+from iproute4mac.prefix import Prefix
+
+
 def isnumber(value):
     return isinstance(value, int | float | complex)
 
@@ -218,12 +223,80 @@ class _Item:
         raise NotImplementedError
 
 
+def _index_keys(value):
+    """
+    Hashable keys of `value`, equal values sharing at least one ([] if unhashable)
+    """
+    if isinstance(value, Prefix):
+        # Prefix objects are equal by prefix, or else by name (e.g. "default")
+        keys = [("name", str(value))]
+        if value._initialized:
+            keys.append(("prefix", value.prefix))
+        return keys
+    try:
+        hash(value)
+    except TypeError:
+        return []
+    return [value]
+
+
+class _Index:
+    """
+    Items by value of `key`, with their position
+
+    Items of unhashable values are kept apart, and always looked up.
+    """
+
+    __slots__ = ("_table", "_unhashable", "_prefix", "_str")
+
+    def __init__(self, items, key):
+        self._table = {}
+        self._unhashable = []
+        self._prefix = False
+        self._str = False
+        for position, item in enumerate(items):
+            if (value := item.get(key)) is None:
+                continue
+            self._prefix |= isinstance(value, Prefix)
+            self._str |= isinstance(value, str)
+            if keys := _index_keys(value):
+                for index_key in keys:
+                    self._table.setdefault(index_key, []).append((position, item))
+            else:
+                self._unhashable.append((position, item))
+
+    def candidates(self, value):
+        """
+        Items possibly equal to `value`, in their order, None if not to be told by the index
+        """
+        keys = _index_keys(value)
+        if isinstance(value, Prefix) and self._str:
+            # str values equal to a Prefix are not indexed as Prefix objects
+            return None
+        if isinstance(value, str) and self._prefix:
+            try:
+                keys += _index_keys(Prefix(value))
+            except ValueError:
+                pass
+        entries = {position: item for key in keys for position, item in self._table.get(key, [])}
+        entries.update(self._unhashable)
+        return [entries[position] for position in sorted(entries)]
+
+
 class _Items:
     """
     Iterable list of dictionaries
+
+    Items may be parsed lazily: filter() and delete_keys() keep them lazy, so
+    that iterdict() and iterstr() can render each item as soon as it is parsed,
+    while any other access turns them into a list.
+
+    lookup() builds an index by key on first use, dropped as soon as the
+    items change: values changed in place (item[key] = value) are still
+    checked against, but found only once the items change (e.g. set()).
     """
 
-    __slots__ = ("_data",)
+    __slots__ = ("_data", "_indexes")
 
     def __init__(self):
         raise NotImplementedError
@@ -242,13 +315,15 @@ class _Items:
         return self.data[index]
 
     def pop(self, index=-1):
+        self._indexes = None
         return self.data.pop(index)
 
     def append(self, item):
         if not isinstance(item, _Item):
             raise ValueError("item is not of {_Item}")
+        self._indexes = None
         if hasattr(self, "_data"):
-            self._data.append(item)
+            self.data.append(item)
         else:
             self._data = [item]
 
@@ -256,14 +331,79 @@ class _Items:
         # all(instance(...)) also accept empty list ([]) as valid
         if not isinstance(data, list) or not all(isinstance(item, _Item) for item in data):
             raise ValueError("data is not list() of {_Item}")
+        self._indexes = None
         self._data = data
 
+    def _index(self, key):
+        """
+        Index of the items by `key`, built on first use
+        """
+        data = self.data
+        # dropped along with the items (e.g. self._data = ..., self.data.append())
+        indexes = getattr(self, "_indexes", None)
+        if indexes is None or indexes[0] is not data or indexes[1] != len(data):
+            self._indexes = indexes = (data, len(data), {})
+        indexes = indexes[2]
+        if key not in indexes:
+            indexes[key] = _Index(data, key)
+        return indexes[key]
+
     def lookup(self, key, value):
-        return next((item for item in self.data if item.present(key, value)), None)
+        """
+        First item with `key` equal to `value`, None if none
+        """
+        if value is None or (items := self._index(key).candidates(value)) is None:
+            items = self.data
+        return next((item for item in items if item.present(key, value)), None)
+
+    def _iter(self):
+        return iter(self._data) if hasattr(self, "_data") else iter(())
+
+    def filter(self, function):
+        """
+        Keep only the items `function` returns True for
+        """
+        self._data = profiler.iterate("filter", filter(function, self._iter()))
+
+    def query(self, query):
+        """
+        Keep only the items selected by `query` (see query.Query), in a single pass
+        """
+        self._data = profiler.iterate("filter", query.filter(self._iter()))
+
+    def delete_keys(self, *keys):
+        """
+        Delete `keys` from every item
+        """
+
+        def delete(item):
+            for key in keys:
+                item.data.pop(key, None)
+            return item
+
+        self._data = map(delete, self._iter())
 
     @property
     def data(self):
-        return self._data if hasattr(self, "_data") else []
+        if not hasattr(self, "_data"):
+            return []
+        if not isinstance(self._data, list):
+            self._data = list(self._data)
+        return self._data
+
+    def iterdict(self, details=None):
+        """
+        Yield the dictionary of every item, as soon as it is parsed
+        """
+        for item in self._iter():
+            yield item.dict(details=details)
+
+    def iterstr(self, details=None):
+        """
+        Yield the standard output of every item, as soon as it is parsed
+        """
+        for item in self._iter():
+            yield item.str(details=details)
 
     def dict(self, details=None):
         return [item.dict(details=details) for item in self.data]
@@ -19,9 +19,8 @@ Usage: ip debug { address | neigh | route }""")
 def debug_address(argv=[]):
     utils.stdout('Testing "address":... ')
 
-    old_options = utils.options_override({"show_details": True, "json": True, "pretty": True})
-    interfaces = ifconfig.Ifconfig()
-    utils.options_restore(old_options)
+    with utils.options_overridden(show_details=True, json=True, pretty=True):
+        interfaces = ifconfig.Ifconfig()
     ip_ifconfig = str(interfaces)
     os_ifconfig = ifconfig.run()
 
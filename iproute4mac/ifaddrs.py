@@ -0,0 +1,209 @@
+import fcntl
+import ipaddress
+import socket
+import struct
+import sys
+
+import iproute4mac.libc as libc
+
+
+# https://opensource.apple.com/source/network_cmds/network_cmds-606.40.2/ifconfig.tproj/ifconfig.c.auto.html
+
+# <sys/socket.h>
+_AF_LINK = 18  # BSD
+_AF_PACKET = 17  # Linux
+
+# <net/if.h> flag names, as printed by ifconfig
+_IFF_DARWIN = (
+    "UP",
+    "BROADCAST",
+    "DEBUG",
+    "LOOPBACK",
+    "POINTOPOINT",
+    "SMART",
+    "RUNNING",
+    "NOARP",
+    "PROMISC",
+    "ALLMULTI",
+    "OACTIVE",
+    "SIMPLEX",
+    "LINK0",
+    "LINK1",
+    "LINK2",
+    "MULTICAST",
+)
+_IFF_LINUX = (
+    "UP",
+    "BROADCAST",
+    "DEBUG",
+    "LOOPBACK",
+    "POINTOPOINT",
+    "NOTRAILERS",
+    "RUNNING",
+    "NOARP",
+    "PROMISC",
+    "ALLMULTI",
+    "MASTER",
+    "SLAVE",
+    "MULTICAST",
+    "PORTSEL",
+    "AUTOMEDIA",
+    "DYNAMIC",
+    "LOWER_UP",
+    "DORMANT",
+    "ECHO",
+)
+_IFF = _IFF_DARWIN if sys.platform == "darwin" else _IFF_LINUX
+_IFF_BROADCAST = 0x2
+_IFF_LOOPBACK = 0x8
+_IFF_POINTOPOINT = 0x10
+
+# <sys/sockio.h> (BSD) and <linux/sockios.h>
+_SIOCGIFMTU = 0xC0206933 if sys.platform == "darwin" else 0x8921
+
+# the same keys of ifconfig inet/inet6 lines (see ifconfig._Ifconfig._address)
+_ADDRESS_FIELDS = (
+    "family",
+    "address",
+    "net",
+    "peer",
+    "prefixlen",
+    "netmask",
+    "broadcast",
+    "autoconf",
+    "secured",
+    "pltime",
+    "vltime",
+    "scopeid",
+)
+
+
+def _family(sockaddr):
+    if sockaddr is None or len(sockaddr) < 2:
+        return None
+    if sys.platform == "darwin":
+        # sa_len, sa_family
+        return sockaddr[1]
+    return struct.unpack_from("=H", sockaddr)[0]
+
+
+def _pad(sockaddr, size):
+    # BSD trims the trailing zeros of netmasks
+    return (sockaddr or b"").ljust(size, b"\0")
+
+
+def _inet(sockaddr):
+    return socket.inet_ntop(socket.AF_INET, _pad(sockaddr, 16)[4:8])
+
+
+def _inet6(sockaddr):
+    addr = bytearray(_pad(sockaddr, 28)[8:24])
+    if sys.platform == "darwin" and (addr[0] == 0xFE and addr[1] & 0xC0 == 0x80 or addr[0] == 0xFF):
+        # clear the KAME embedded scope id
+        addr[2:4] = b"\0\0"
+    return socket.inet_ntop(socket.AF_INET6, bytes(addr))
+
+
+def _scopeid(sockaddr):
+    return struct.unpack_from("=I", _pad(sockaddr, 28), 24)[0]
+
+
+def _lladdr(sockaddr):
+    """
+    Return the interface index and the link-layer address
+    """
+    if sys.platform == "darwin":
+        # sockaddr_dl: sdl_len, sdl_family, sdl_index, sdl_type, sdl_nlen, sdl_alen, sdl_slen
+        _, _, index, _, nlen, alen, _ = struct.unpack_from("=BBHBBBB", sockaddr)
+        lladdr = sockaddr[8 + nlen : 8 + nlen + alen]
+    else:
+        # sockaddr_ll: sll_family, sll_protocol, sll_ifindex, sll_hatype, sll_pkttype, sll_halen
+        _, _, index, _, _, alen = struct.unpack_from("=HHiHBB", sockaddr)
+        lladdr = sockaddr[12 : 12 + alen]
+    return index, ":".join(f"{byte:02x}" for byte in lladdr) if len(lladdr) == 6 else None
+
+
+def _mtu(name, data):
+    if data is not None:
+        # struct if_data: 8 x u_char, then ifi_mtu
+        return struct.unpack_from("=I", data, 8)[0]
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        ifreq = struct.pack("16si12x", name.encode(), 0)
+        try:
+            return struct.unpack_from("16si", fcntl.ioctl(sock, _SIOCGIFMTU, ifreq))[1]
+        except OSError:
+            return None
+
+
+def _prefixlen(netmask):
+    return bin(int.from_bytes(netmask, "big")).count("1")
+
+
+def flag_names(flags):
+    """
+    Interface flags, as printed by ifconfig
+    """
+    return [flag for bit, flag in enumerate(_IFF) if flags & (1 << bit)]
+
+
+def getifaddrs():
+    """
+    Interfaces from getifaddrs(3), with the ifconfig fields it can provide:
+    interface, flag, flags, mtu, index, ether and address (inet/inet6)
+
+    Values are str, as parsed from the ifconfig output.
+    """
+    entries = libc.getifaddrs()
+    if entries is None:
+        return None
+    links = {}
+    for entry in entries:
+        name, flags = entry["name"], entry["flags"]
+        link = links.setdefault(
+            name,
+            {
+                "interface": name,
+                "flag": f"{flags:x}",
+                "flags": flag_names(flags),
+                "mtu": None,
+                "index": None,
+                "ether": None,
+                "address": [],
+            },
+        )
+        family = _family(entry["addr"])
+        if family in (_AF_LINK, _AF_PACKET):
+            index, lladdr = _lladdr(entry["addr"])
+            link["index"] = str(index)
+            if lladdr and not flags & _IFF_LOOPBACK:
+                link["ether"] = lladdr
+            if (mtu := _mtu(name, entry["data"])) is not None:
+                link["mtu"] = str(mtu)
+        elif family == socket.AF_INET:
+            address = dict.fromkeys(_ADDRESS_FIELDS)
+            address["family"] = "inet"
+            address["address"] = _inet(entry["addr"])
+            address["netmask"] = _pad(entry["netmask"], 16)[4:8].hex()
+            if entry["dstaddr"] and flags & _IFF_POINTOPOINT:
+                address["peer"] = _inet(entry["dstaddr"])
+            elif entry["dstaddr"] and flags & _IFF_BROADCAST:
+                address["broadcast"] = _inet(entry["dstaddr"])
+            link["address"].append(address)
+        elif family == socket.AF_INET6:
+            address = dict.fromkeys(_ADDRESS_FIELDS)
+            address["family"] = "inet6"
+            address["address"] = _inet6(entry["addr"])
+            address["prefixlen"] = str(_prefixlen(_pad(entry["netmask"], 28)[8:24]))
+            if entry["dstaddr"] and flags & _IFF_POINTOPOINT:
+                address["peer"] = _inet6(entry["dstaddr"])
+            if ipaddress.IPv6Address(address["address"]).is_link_local:
+                address["net"] = name
+                address["scopeid"] = f"0x{_scopeid(entry['addr']) or int(link['index'] or 0):x}"
+            link["address"].append(address)
+    # Linux has no link entry (hence no index and MTU) for interfaces without lladdr
+    for link in links.values():
+        if link["index"] is None:
+            link["index"] = str(socket.if_nametoindex(link["interface"]))
+        if link["mtu"] is None and (mtu := _mtu(link["interface"], None)) is not None:
+            link["mtu"] = str(mtu)
+    return list(links.values())
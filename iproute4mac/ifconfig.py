@@ -1,9 +1,10 @@
 import re
 
 import iproute4mac.libc as libc
+import iproute4mac.profiler as profiler
 import iproute4mac.utils as utils
 
-from iproute4mac.data import _Item, _Items, dict_format, find_item
+from iproute4mac.data import _dict, _Item, _Items, dict_format, find_item
 from iproute4mac.prefix import Prefix
 
 
@@ -12,7 +13,7 @@ _IFCONFIG_OPTS = ["-L", "-m", "-v"]
 
 _SYSCTL_RXQLEN = "net.link.generic.system.rcvq_maxlen"
 _SYSCTL_TXQLEN = "net.link.generic.system.sndq_maxlen"
-_TXQLEN = libc.sysctl(_SYSCTL_TXQLEN)
+_TXQLEN = None
 
 # nu <netinet6/nd6.h>
 _ND6_INFINITE_LIFETIME = 0xFFFFFFFF
@@ -49,6 +50,9 @@ IPV6ADDR = f"(?:{IPV6ADDR})"
 # ifconfig
 IFNAME = r"(?:\w+\d+)"
 NETIF = "[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"
+_KEYWORD = re.compile(r"\t?([^\s:=]+)")
+# lines parsed along with the ones of another keyword
+_KEYWORD_ALIASES = {"inet6": "inet", "member": "Configuration"}
 
 
 # https://opensource.apple.com/source/network_cmds/network_cmds-606.40.2/ifconfig.tproj/ifconfig.c.auto.html
@@ -56,10 +60,59 @@ NETIF = "[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]
 
 def run(*argv, fatal=True):
     if not argv:
-        argv = _IFCONFIG_OPTS
+        return utils.snapshot(_IFCONFIG, *_IFCONFIG_OPTS, fatal=fatal)
     return utils.shell(_IFCONFIG, *argv, fatal=fatal)
 
 
+def names():
+    """
+    Interface names, without forking ifconfig if getifaddrs(3) is available
+    """
+    if (ifaddrs := utils.getifaddrs()) is not None:
+        return [data["interface"] for data in ifaddrs]
+    return utils.snapshot(_IFCONFIG, "-l").split()
+
+
+def _txqlen():
+    """
+    Send queue length of the interfaces, read on first use rather than on import
+    """
+    global _TXQLEN
+    if _TXQLEN is None:
+        _TXQLEN = utils.sysctl(_SYSCTL_TXQLEN)
+    return _TXQLEN
+
+
+def _push_down(dev, interfaces=None):
+    """
+    Whether ifconfig <dev> is enough to show `dev`, rather than every interface:
+    only if `dev` exists and there is no bond nor bridge (`dev` may be the master,
+    or a member, of one: both are needed to link them)
+    """
+    if dev is None:
+        return False
+    if interfaces is None:
+        interfaces = names()
+    return dev in interfaces and not any(name.startswith(("bond", "bridge")) for name in interfaces)
+
+
+def tokenize(text):
+    """
+    Split the lines of an interface by their leading keyword (e.g. "ether" or
+    "media"), along with their continuation lines (e.g. "\t\tmedia autoselect")
+
+    Output: dict(keyword: str)
+    """
+    res = {}
+    keyword = None
+    for line in text.splitlines(keepends=True):
+        if keyword is None or not line.startswith(("\t\t", "\t ")):
+            keyword = match.group(1) if (match := _KEYWORD.match(line)) else ""
+            keyword = _KEYWORD_ALIASES.get(keyword, keyword)
+        res.setdefault(keyword, []).append(line)
+    return {keyword: "".join(lines) for keyword, lines in res.items()}
+
+
 def netmask_to_length(mask):
     return utils.bit_count(int(mask, 16))
 
@@ -177,6 +230,12 @@ class _reBond(_reList):
             self._data = _reList(self._list, text).data
 
 
+class _Unparsed:
+    """
+    Placeholder of a field parsed on first access (see _IfconfigBase._field())
+    """
+
+
 class _IfconfigBase(_Item):
     _name = None
     _link = None
@@ -196,6 +255,70 @@ class _IfconfigBase(_Item):
         "gso_max_segs": None,
     }
 
+    def __contains__(self, item):
+        self._field(item)
+        return item in self._data
+
+    def __getitem__(self, key):
+        return self._field(key)
+
+    def __setitem__(self, key, value):
+        self._data[key] = value
+
+    def __delitem__(self, key):
+        self._data.pop(key, None)
+
+    def get(self, key, default=None, recurse=False):
+        if recurse:
+            return super().get(key, default=default, recurse=recurse)
+        return self._field(key, default)
+
+    def pop(self, key, default=None):
+        self._field(key)
+        return super().pop(key, default)
+
+    def present(self, key, value=None, recurse=False, strict=False):
+        if recurse:
+            return super().present(key, value=value, recurse=recurse, strict=strict)
+        self._field(key)
+        return find_item(self._data, key, value=value, recurse=False, strict=strict)
+
+    @property
+    def data(self):
+        for key in [key for key, value in self._data.items() if value is _Unparsed]:
+            self._field(key)
+        return self._data
+
+    def dict(self, details=True):
+        # optional fields left out are not parsed at all
+        return _dict(
+            {
+                key: self._field(key)
+                for key in list(self._data)
+                if details
+                or key not in self._OPTIONAL_FIELDS
+                or (
+                    self._OPTIONAL_FIELDS[key] is not None
+                    and self._OPTIONAL_FIELDS[key] != self._field(key)
+                )
+            }
+        )
+
+    def _parse_field(self, key):
+        """
+        Parse the _Unparsed field `key`, return the fields to set ({} if none)
+        """
+        raise NotImplementedError
+
+    def _field(self, key, default=None):
+        if self._data.get(key) is _Unparsed:
+            res = self._parse_field(key)
+            if key in res:
+                self._data[key] = res[key]
+            else:
+                del self._data[key]
+        return self._data.get(key, default)
+
     @property
     def name(self):
         return self._name
@@ -212,6 +335,7 @@ class _IfconfigBase(_Item):
 
 
 class _Ifconfig(_IfconfigBase):
+    __slots__ = ("_tokens",)
     _name_data = re.compile(r"(?P<interface>\w+): (?P<data>(?:.*)(?:\n\t.*)+)")
     _interface = re.compile(
         r"flags=(?P<flag>\w+)<(?P<flags>.*)> mtu (?P<mtu>\d+)?(?: rtref (?P<rtref>\d+))? index (?P<index>\d+)"
@@ -272,52 +396,110 @@ class _Ifconfig(_IfconfigBase):
     _routermode4 = re.compile(r"\troutermode4: (?P<routermode4>\w+)")
     _routermode6 = re.compile(r"\troutermode6: (?P<routermode6>\w+)")
 
+    # fields: leading keyword of their lines (see tokenize()), parser, and if its groups
+    # are fields themselves; all but the interface line, ether and tunnel are parsed on
+    # first access
+    _FIELDS = {
+        "interface": ("flags", _reDict, True),
+        "ether": ("ether", _reDict, True),
+        "tunnel": ("tunnel", _reDict, False),
+        "eflags": ("eflags", _reDict, False),
+        "xflags": ("xflags", _reDict, False),
+        "options": ("options", _reDict, False),
+        "capabilities": ("capabilities", _reDict, False),
+        "hwassist": ("hwassist", _reDict, False),
+        "bridge": ("Configuration", _reBridge, False),
+        "peer": ("peer", _reDict, True),
+        "address": ("inet", _reList, False),
+        "vlan": ("vlan", _reDict, False),
+        "netif": ("netif", _reDict, True),
+        "flowswitch": ("flowswitch", _reDict, True),
+        "nd6_options": ("nd6", _reDict, False),
+        "media": ("media", _reDict, True),
+        "status": ("status", _reDict, True),
+        "supported_media": ("supported", _reMedia, False),
+        "bond": ("bond", _reBond, False),
+        "generation_id": ("generation", _reDict, True),
+        "type": ("type", _reDict, True),
+        "agent": ("agent", _reList, False),
+        "link_quality": ("link", _reDict, False),
+        "state_availability": ("state", _reDict, False),
+        "scheduler": ("scheduler", _reDict, False),
+        "effective_interface": ("effective", _reDict, True),
+        "link_rate": ("link", _reDict, False),
+        "uplink_rate": ("uplink", _reDict, False),
+        "downlink_rate": ("downlink", _reDict, False),
+        "timestamp": ("timestamp", _reDict, True),
+        "desc": ("desc", _reDict, True),
+        "unaligned_pkts": ("unaligned", _reDict, True),
+        "qosmarking": ("qosmarking", _reDict, False),
+        "low_power_mode": ("low", _reDict, True),
+        "mpklog": ("multi", _reDict, True),
+        "routermode4": ("routermode4", _reDict, True),
+        "routermode6": ("routermode6", _reDict, True),
+    }
+
     def __init__(self, text):
         (self._name, text) = _reDict(self._name_data, text).groups()
+        self._tokens = tokenize(text)
 
         self._data = {
             "interface": self._name,
-            **_reDict(self._interface, text).data,
-            "eflags": _reDict(self._eflags, text).data,
-            "xflags": _reDict(self._xflags, text).data,
-            "options": _reDict(self._options, text).data,
-            "capabilities": _reDict(self._capabilities, text).data,
-            "hwassist": _reDict(self._hwassist, text).data,
-            **_reDict(self._ether, text).data,
+            **self._parse_field("interface"),
+            **dict.fromkeys(("eflags", "xflags", "options", "capabilities", "hwassist"), _Unparsed),
+            **self._parse_field("ether"),
             "broadcast": None,
-            "bridge": _reBridge(self._bridge, text).data,
-            **_reDict(self._peer, text).data,
-            "tunnel": _reDict(self._tunnel, text).data,
-            "address": _reList(self._address, text).data,
-            "vlan": _reDict(self._vlan, text).data,
-            **_reDict(self._netif, text).data,
-            **_reDict(self._flowswitch, text).data,
-            "nd6_options": _reDict(self._nd6_options, text).data,
-            **_reDict(self._media, text).data,
-            **_reDict(self._status, text).data,
-            "supported_media": _reMedia(self._supported_media, text).data,
-            "bond": _reBond(self._bond, text).data,
-            **_reDict(self._generation_id, text).data,
-            **_reDict(self._type, text).data,
+            **dict.fromkeys(("bridge", "peer"), _Unparsed),
+            **self._parse_field("tunnel"),
+            **dict.fromkeys(
+                (
+                    "address",
+                    "vlan",
+                    "netif",
+                    "flowswitch",
+                    "nd6_options",
+                    "media",
+                    "status",
+                    "supported_media",
+                    "bond",
+                    "generation_id",
+                    "type",
+                ),
+                _Unparsed,
+            ),
             "link_type": "unknown",
-            "agent": _reList(self._agent, text).data,
-            "link_quality": _reDict(self._link_quality, text).data,
-            "state_availability": _reDict(self._state_availability, text).data,
-            "scheduler": _reDict(self._scheduler, text).data,
-            **_reDict(self._effective_interface, text).data,
-            "link_rate": _reDict(self._link_rate, text).data,
-            "uplink_rate": _reDict(self._uplink_rate, text).data,
-            "downlink_rate": _reDict(self._downlink_rate, text).data,
-            **_reDict(self._timestamp, text).data,
-            **_reDict(self._desc, text).data,
-            **_reDict(self._unaligned_pkts, text).data,
-            "qosmarking": _reDict(self._qosmarking, text).data,
-            **_reDict(self._low_power_mode, text).data,
-            **_reDict(self._mpklog, text).data,
-            **_reDict(self._routermode4, text).data,
-            **_reDict(self._routermode6, text).data,
+            **dict.fromkeys(
+                (
+                    "agent",
+                    "link_quality",
+                    "state_availability",
+                    "scheduler",
+                    "effective_interface",
+                    "link_rate",
+                    "uplink_rate",
+                    "downlink_rate",
+                    "timestamp",
+                    "desc",
+                    "unaligned_pkts",
+                    "qosmarking",
+                    "low_power_mode",
+                    "mpklog",
+                    "routermode4",
+                    "routermode6",
+                ),
+                _Unparsed,
+            ),
         }
+        self._set_link_type()
+
+    def _parse_field(self, key):
+        keyword, parser, groups = self._FIELDS[key]
+        if groups and keyword not in self._tokens:
+            return {}
+        res = parser(getattr(self, f"_{key}"), self._tokens.get(keyword, "")).data
+        return res if groups else {key: res}
 
+    def _set_link_type(self):
         if self._data.get("ether"):
             self._data["link_type"] = "ether"
             self._data["broadcast"] = "ff:ff:ff:ff:ff:ff"
@@ -330,6 +512,10 @@ class _Ifconfig(_IfconfigBase):
         else:
             self._data["link_type"] = "none"
 
+    @property
+    def generation_id(self):
+        return self.get("generation_id")
+
     def str(self, details=True):
         data = self.data
         res = f"{self._name}: flags={data['flag']}<{','.join(data['flags'])}>"
@@ -448,28 +634,37 @@ class _Ifconfig(_IfconfigBase):
         return res.rstrip()
 
 
+class _NativeIfconfig(_Ifconfig):
+    """
+    Interface from getifaddrs(3), with only the fields it provides
+    (see ifaddrs.getifaddrs())
+    """
+
+    def __init__(self, data):
+        self._name = data["interface"]
+        self._data = {**data, "broadcast": None}
+        self._set_link_type()
+
+
 class _IpAddress(_IfconfigBase):
     __slots__ = ("_ifconfig",)
+    _source = _Ifconfig
 
     def __init__(self, text):
-        self._ifconfig = _Ifconfig(text)
+        self._ifconfig = self._source(text)
         self._name = self._ifconfig._name
         self._data = {
             "ifindex": self._ifconfig["index"],
             "link": self._get_link(),
             "ifname": self._name,
             "flags": self._ifconfig["flags"],
-            "eflags": self._ifconfig.get("eflags", {}).get("flags"),
-            "xflags": self._ifconfig.get("xflags", {}).get("flags"),
-            "options": self._ifconfig.get("options", {}).get("flags"),
-            "capabilities": self._ifconfig.get("capabilities", {}).get("flags"),
-            "hwassist": self._ifconfig.get("hwassist", {}).get("flags"),
+            **dict.fromkeys(("eflags", "xflags", "options", "capabilities", "hwassist"), _Unparsed),
             "mtu": self._ifconfig["mtu"],
             # "qdisc": "noqueue",
             "master": None,  # async __update__ with self._get_master()
             "operstate": OPER_STATES[self._ifconfig.get("status", "none")],
             "group": "default",
-            "txqlen": _TXQLEN,
+            "txqlen": _txqlen(),
             "link_type": self._ifconfig.get("link_type"),
             "address": self._ifconfig.get("ether"),
             "link_pointtopoint": True if "POINTOPOINT" in self._ifconfig["flags"] else None,
@@ -478,25 +673,31 @@ class _IpAddress(_IfconfigBase):
             # "promiscuity": 0,
             # "min_mtu": 0,
             # "max_mtu": 0,
-            "linkinfo": None,  # async __update__ with self._get_linkinfo()
+            "linkinfo": _Unparsed,  # self._get_linkinfo(), once linked by __update__
             # TODO:
             # "num_tx_queues": 1,
             # "num_rx_queues": 1,
             # "gso_max_size": 65536,
             # "gso_max_segs": 65535,
-            "addr_info": self._get_addr_info(),
+            "addr_info": _Unparsed,
         }
         if self._ifconfig.get("tunnel"):
             self._data["address"] = self._ifconfig["tunnel"]["src"]
             self._data["broadcast"] = self._ifconfig["tunnel"]["dst"]
 
+    @property
+    def generation_id(self):
+        return self._ifconfig.generation_id
+
     def __update__(self):
-        self._data.update(
-            {
-                "master": self._get_master(),
-                "linkinfo": self._get_linkinfo(),
-            }
-        )
+        self._data["master"] = self._get_master()
+
+    def _parse_field(self, key):
+        if key == "linkinfo":
+            return {key: self._get_linkinfo()}
+        if key == "addr_info":
+            return {key: self._get_addr_info()}
+        return {key: self._ifconfig.get(key, {}).get("flags")}
 
     def _get_link(self):
         if self._ifconfig.get("peer"):
@@ -582,7 +783,7 @@ class _IpAddress(_IfconfigBase):
                 # FIXME: where to find original hardawre lladdr?
                 return {"perm_hwaddr": self._ifconfig["ether"]}
             if self.link.name.startswith("bridge"):
-                bridge = self.link._ifconfig._data["bridge"]
+                bridge = self.link._ifconfig["bridge"]
                 if member := next(
                     (member for member in bridge["member"] if member["interface"] == self._name),
                     None,
@@ -729,6 +930,10 @@ class _IpAddress(_IfconfigBase):
         return res.rstrip()
 
 
+class _NativeIpAddress(_IpAddress):
+    _source = _NativeIfconfig
+
+
 class _Bridge(_IpAddress):
     _OPTIONAL_FIELDS = {
         "hairpin": None,
@@ -760,7 +965,7 @@ class _Bridge(_IpAddress):
         if self.link == self:
             self._data["master"] = self._name
         else:
-            bridge = self.link._ifconfig._data["bridge"]
+            bridge = self.link._ifconfig["bridge"]
             member = next(
                 member for member in bridge["member"] if member["interface"] == self._name
             )
@@ -798,23 +1003,38 @@ class _Bridge(_IpAddress):
 
 class Ifconfig(_Items):
     _kind = _Ifconfig
+    # key of the interface name
+    _name_key = "interface"
 
-    def __init__(self):
-        res = utils.shell(_IFCONFIG, *_IFCONFIG_OPTS)
+    def __init__(self, dev=None):
+        """
+        Input:
+        `dev` (optional) interface the items are to be selected by: if
+        possible, only ifconfig <dev> is run (see _push_down())
+        """
+        args = utils.flat_tuple(_IFCONFIG, *_IFCONFIG_OPTS, dev if _push_down(dev) else None)
+        res = utils.snapshot(args)
+        self._data = utils.parsed(type(self).__name__, args, [res], lambda: self._parse(res))
+
+    def _parse(self, res):
         for text in re.findall(r"(^\w+:.*$\n(?:^\t.*$\n*)*)", res, flags=re.MULTILINE):
             # for every single interface:
             self.append(self._kind(text=text))
+        return self.data
 
     def exist(self, interface):
-        return any(item.name == interface for item in self._data)
+        return self.lookup(self._name_key, interface) is not None
 
 
 class IpAddress(Ifconfig):
     _kind = _IpAddress
+    _name_key = "ifname"
 
-    def __init__(self):
-        super().__init__()
-        self._link_interfaces()
+    def _parse(self, res):
+        super()._parse(res)
+        with profiler.phase("link"):
+            self._link_interfaces()
+        return self.data
 
     def _link_interfaces(self):
         """
@@ -832,12 +1052,36 @@ class IpAddress(Ifconfig):
             item.__update__()
 
 
+class NativeIpAddress(IpAddress):
+    """
+    Interfaces and addresses from getifaddrs(3), without forking ifconfig
+
+    The extended ifconfig fields (bridge, bond, vlan, media, agents...), hence
+    master, link and operstate, are not available.
+    """
+
+    _kind = _NativeIpAddress
+
+    def __init__(self):
+        if (ifaddrs := utils.getifaddrs()) is None:
+            # no getifaddrs(3), e.g. replaying an archive recorded without it
+            self._data = IpAddress().data
+            return
+        for data in ifaddrs:
+            self.append(self._kind(data))
+        with profiler.phase("link"):
+            self._link_interfaces()
+
+
 class Bridge(Ifconfig):
     _kind = _Bridge
+    _name_key = "ifname"
 
-    def __init__(self):
-        super().__init__()
-        self._link_interfaces()
+    def _parse(self, res):
+        super()._parse(res)
+        with profiler.phase("link"):
+            self._link_interfaces()
+        return self.data
 
     def _link_interfaces(self):
         """
@@ -887,10 +1131,22 @@ class _BridgeForward(_Item):
 
 
 class FDB(_Items):
-    def __init__(self):
-        res = utils.shell(_IFCONFIG, "-l").split()
-        for interface in res:
-            if interface.startswith("bridge"):
-                text = utils.shell(_IFCONFIG, interface, "addr")
-                for entry in text.splitlines():
-                    self.append(_BridgeForward(interface, entry))
+    def __init__(self, bridge=None):
+        """
+        Input:
+        `bridge` (optional) bridge the entries are to be selected by: only its
+        entries are read (ifconfig <bridge> addr)
+        """
+        bridges = [i for i in utils.snapshot(_IFCONFIG, "-l").split() if i.startswith("bridge")]
+        if bridge is not None:
+            bridges = [i for i in bridges if i == bridge]
+        res = utils.snapshots(*[(_IFCONFIG, bridge, "addr") for bridge in bridges])
+        self._data = utils.parsed(
+            "FDB", [str(bridge)], bridges + res, lambda: self._parse(bridges, res)
+        )
+
+    def _parse(self, bridges, res):
+        for bridge, text in zip(bridges, res):
+            for entry in text.splitlines():
+                self.append(_BridgeForward(bridge, entry))
+        return self.data
@@ -6,6 +6,7 @@ import iproute4mac.utils as utils
 
 from iproute4mac import OPTION
 from iproute4mac.prefix import Prefix
+from iproute4mac.query import Query
 from iproute4mac.utils import matches, strcmp, next_arg, get_addr, get_prefix
 
 
@@ -179,60 +180,68 @@ def ipaddr_modify(cmd, argv):
     return libc.EXIT_SUCCESS
 
 
-def get_ifconfig_links():
-    return ifconfig.IpAddress()
+def get_ifconfig_links(dev=None):
+    return ifconfig.IpAddress(dev=dev)
+
+
+def _no_device(name):
+    utils.stderr(f'Device "{name}" does not exist.')
+    raise utils.Exit(libc.EXIT_ERROR, f'Device "{name}" does not exist.', kind="not_found")
+
+
+def _select_addresses(link, predicate):
+    link["addr_info"] = [a for a in link.get("addr_info", []) if predicate(a)]
+    return link
 
 
 def get_links(argv, usage=usage):
-    links = get_ifconfig_links()
+    query = Query()
     dev = None
+    vrf = None
+    # devices checked once the links are known: (name, error(name))
+    devices = []
     while argv:
         opt = argv.pop(0)
         if strcmp(opt, "to"):
             to = get_prefix(next_arg(argv), OPTION["preferred_family"])
             if to.family != socket._AF_UNSPEC:
                 OPTION["preferred_family"] = to.family
-            for link in links:
-                link["addr_info"] = [a for a in link.get("addr_info", []) if a["local"] in to]
-            links.set([l for l in links if l["addr_info"]])
+            query.map(lambda l, to=to: _select_addresses(l, lambda a: a["local"] in to))
+            query.where(lambda l: l["addr_info"])
         elif strcmp(opt, "scope"):
             scope = next_arg(argv)
             if scope not in ("link", "host", "global", "all") and not scope.isdigit():
                 utils.invarg('invalid "scope"', scope)
             if scope == "all":
                 continue
-            for link in links:
-                link["addr_info"] = [a for a in link.get("addr_info", []) if a["scope"] == scope]
-            links.set([l for l in links if l["addr_info"]])
+            query.map(lambda l, scope=scope: _select_addresses(l, lambda a: a["scope"] == scope))
+            query.where(lambda l: l["addr_info"])
         elif strcmp(opt, "up"):
-            links.set([l for l in links if "UP" in l.get("flags", [])])
+            query.where(lambda l: "UP" in l.get("flags", []))
         elif strcmp(opt, "label"):
             utils.do_notimplemented(opt)
         elif strcmp(opt, "group"):
             utils.do_notimplemented(opt)
         elif strcmp(opt, "master"):
             master = next_arg(argv)
-            if not links.exist(master):
-                utils.invarg("Device does not exist", master)
-            links.set([l for l in links if l.get("master") == master])
+            devices.append((master, lambda name: utils.invarg("Device does not exist", name)))
+            query.where(lambda l, master=master: l.get("master") == master)
         elif strcmp(opt, "vrf"):
             vrf = next_arg(argv)
-            if not links.exist(vrf):
-                utils.invarg("Not a valid VRF name", vrf)
             # if not is_vrf(vrf):
             #     utils.invarg("Not a valid VRF name", vrf)
             # links = [l for l in links if l.get("master") == vrf]
             # FIXME: https://wiki.netunix.net/freebsd/network/vrf/
-            utils.do_notimplemented(opt)
+            devices.append((vrf, lambda name: utils.invarg("Not a valid VRF name", name)))
         elif strcmp(opt, "nomaster"):
-            links.set([l for l in links if l.present("master")])
+            query.where(lambda l: l.present("master"))
         elif strcmp(opt, "type"):
             kind = next_arg(argv)
             if kind.endswith("_slave"):
                 kind = kind.replace("_slave", "")
-                links.set([l for l in links if l.present("info_slave_kind", kind, recurse=True)])
+                query.where(lambda l, kind=kind: l.present("info_slave_kind", kind, recurse=True))
             else:
-                links.set([l for l in links if l.present("info_kind", kind, recurse=True)])
+                query.where(lambda l, kind=kind: l.present("info_kind", kind, recurse=True))
         else:
             if strcmp(opt, "dev"):
                 opt = next_arg(argv)
@@ -240,24 +249,25 @@ def get_links(argv, usage=usage):
                 usage()
             if dev:
                 utils.duparg2("dev", opt)
-            if not links.exist(opt):
-                utils.stderr(f'Device "{opt}" does not exist.')
-                exit(libc.EXIT_ERROR)
             dev = opt
-            links.set([i for i in links if i.name == dev])
+            devices.append((dev, _no_device))
+            query.where(lambda l, dev=dev: l.name == dev).hint("dev", dev)
 
+    # a master (or vrf) is among the other links: ifconfig <dev> is not enough
+    links = get_ifconfig_links(dev=query.hinted("dev") if len(devices) == 1 else None)
+    for name, error in devices:
+        if not links.exist(name):
+            error(name)
+    if vrf:
+        utils.do_notimplemented("vrf")
+    links.query(query)
     return links
 
 
-def ipaddr_list_or_flush(argv, flush=False):
-    if flush:
-        if not argv:
-            utils.stderr("Flush requires arguments.")
-            exit(libc.EXIT_ERROR)
-        if OPTION["preferred_family"] == socket._AF_PACKET:
-            utils.stderr("Cannot flush link addresses.")
-            exit(libc.EXIT_ERROR)
-
+def get_addresses(argv):
+    """
+    Links of the selected addresses (see get_links()), of the preferred family only
+    """
     links = get_links(argv)
     if OPTION["preferred_family"] in (
         socket._AF_INET,
@@ -266,12 +276,23 @@ def ipaddr_list_or_flush(argv, flush=False):
         socket._AF_BRIDGE,
     ):
         family = socket.family_name(OPTION["preferred_family"])
-        for interface in links:
-            interface["addr_info"] = [
-                addr for addr in interface["addr_info"] if addr["family"] == family
-            ]
-        links.set([i for i in links if i.present("addr_info", strict=True)])
+        query = Query()
+        query.map(lambda l: _select_addresses(l, lambda a: a["family"] == family))
+        query.where(lambda l: l.present("addr_info", strict=True))
+        links.query(query)
+    return links
+
+
+def ipaddr_list_or_flush(argv, flush=False):
+    if flush:
+        if not argv:
+            utils.stderr("Flush requires arguments.")
+            exit(libc.EXIT_ERROR)
+        if OPTION["preferred_family"] == socket._AF_PACKET:
+            utils.stderr("Cannot flush link addresses.")
+            exit(libc.EXIT_ERROR)
 
+    links = get_addresses(argv)
     if flush:
         for interface in links.list():
             for addr in interface["addr_info"]:
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+
+import contextlib
+import importlib
+import io
+import json
+import os
+import selectors
+import socket
+import sys
+import traceback
+
+import iproute4mac
+import iproute4mac.backend as backend
+import iproute4mac.cache as cache
+import iproute4mac.libc as libc
+import iproute4mac.profiler as profiler
+import iproute4mac.rtsock as rtsock
+import iproute4mac.utils as utils
+
+from iproute4mac import OPTION
+from iproute4mac.utils import matches
+
+
+# Unix socket of the daemon (default: ipd.sock in the cache directory)
+ENV_SOCKET = "IPROUTE4MAC_SOCKET"
+
+_COMMANDS = ("ip", "bridge")
+_BUFSIZE = 65536
+# seconds for a client to send its request
+_TIMEOUT = 10
+
+# snapshots made stale by a routing message (any snapshot for messages not listed here)
+_STALE = {
+    rtsock.RTM_ADD: ("netstat", "route"),
+    rtsock.RTM_DELETE: ("netstat", "route"),
+    rtsock.RTM_CHANGE: ("netstat", "route"),
+    rtsock.RTM_REDIRECT: ("netstat", "route"),
+    rtsock.RTM_RESOLVE: ("netstat", "route"),
+    rtsock.RTM_NEWADDR: ("ifconfig",),
+    rtsock.RTM_DELADDR: ("ifconfig",),
+    rtsock.RTM_IFINFO: ("ifconfig",),
+    # no change of the routing table
+    rtsock.RTM_GET: (),
+    rtsock.RTM_LOSING: (),
+    rtsock.RTM_MISS: (),
+    rtsock.RTM_LOCK: (),
+    rtsock.RTM_NEWMADDR: (),
+    rtsock.RTM_DELMADDR: (),
+}
+# neighbours are host routes with link-layer information
+_ROUTE_MSG = (
+    rtsock.RTM_ADD,
+    rtsock.RTM_DELETE,
+    rtsock.RTM_CHANGE,
+    rtsock.RTM_REDIRECT,
+    rtsock.RTM_RESOLVE,
+)
+_STALE_LLINFO = ("arp", "ndp")
+
+
+def usage():
+    utils.stderr("""\
+Usage: ipd [ -s[ocket] PATH ]""")
+    exit(libc.EXIT_ERROR)
+
+
+def path():
+    if res := os.environ.get(ENV_SOCKET):
+        return res
+    return os.path.join(cache.directory(), "ipd.sock")
+
+
+def _recv(sock):
+    res = b""
+    while data := sock.recv(_BUFSIZE):
+        res += data
+    return res
+
+
+def forward(cmd, argv, sock_path=None):
+    """
+    Run `cmd` `argv` (options already parsed into OPTION) by the daemon, if running
+
+    Output:
+    the command exit code, None if not forwarded (the caller runs it)
+    """
+    # replayed (recorded or simulated) commands are not those of the daemon
+    if any(
+        os.environ.get(env)
+        for env in (backend.ENV_REPLAY, backend.ENV_RECORD, backend.ENV_SIMULATE)
+    ):
+        return None
+    # profiled commands run in this process
+    if profiler.active():
+        return None
+    # standard input is not forwarded
+    if "-" in argv:
+        return None
+    sock_path = sock_path or path()
+    # a daemon of another user (e.g. whose HOME sudo kept) does not run our commands
+    try:
+        if os.stat(sock_path).st_uid != os.geteuid():
+            return None
+    except OSError:
+        return None
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    with client:
+        try:
+            client.connect(sock_path)
+        except OSError:
+            return None
+        request = {"cmd": cmd, "argv": argv, "options": dict(OPTION), "cwd": os.getcwd()}
+        try:
+            client.sendall(json.dumps(request).encode())
+            client.shutdown(socket.SHUT_WR)
+            reply = json.loads(_recv(client))
+        except (OSError, ValueError) as e:
+            # the command may have been run: do not run it again
+            utils.stderr(f"ipd: {e}")
+            return libc.EXIT_FAILURE
+    sys.stdout.write(reply["stdout"])
+    sys.stderr.write(reply["stderr"])
+    return reply["returncode"]
+
+
+def stale(msg):
+    """
+    Commands whose snapshots are made stale by routing message `msg` (None for all)
+    """
+    if msg["type"] not in _STALE:
+        return None
+    res = _STALE[msg["type"]]
+    if msg["type"] in _ROUTE_MSG and msg.get("flags", 0) & rtsock.RTF_LLINFO:
+        res += _STALE_LLINFO
+    return res
+
+
+def _unwatched(args):
+    """
+    Whether a snapshot may change without any routing message (ifconfig BRIDGE addr)
+    """
+    return os.path.basename(args[0]) == "ifconfig" and args[-1] == "addr"
+
+
+class Daemon:
+    """
+    Run ip and bridge commands in a resident process, sharing the commands
+    output and parsed objects (see utils.batch()) until a routing message
+    from `events` (e.g. a routing socket) makes them stale
+
+    Without `events`, every request reads the system again. The bridge
+    forwarding tables, changing without any routing message, are read by
+    every request anyway.
+    """
+
+    __slots__ = ("_server", "_events", "_buf", "_selector", "_wakeup", "_running")
+
+    def __init__(self, server, events=None):
+        self._server = server
+        self._events = events
+        self._buf = b""
+        self._selector = selectors.DefaultSelector()
+        self._wakeup = socket.socketpair()
+        # cleared by stop(), even if called before serve()
+        self._running = True
+
+    def stop(self):
+        self._running = False
+        self._wakeup[1].send(b"\0")
+
+    def serve(self):
+        self._selector.register(self._wakeup[0], selectors.EVENT_READ)
+        self._selector.register(self._server, selectors.EVENT_READ)
+        if self._events is not None:
+            self._selector.register(self._events, selectors.EVENT_READ)
+        try:
+            while self._running:
+                ready = {key.fileobj for key, _ in self._selector.select()}
+                if self._wakeup[0] in ready:
+                    self._wakeup[0].recv(_BUFSIZE)
+                    continue
+                # routing messages first: a request must see the changes before it
+                if self._events in ready:
+                    self._update()
+                if self._server in ready:
+                    conn, _ = self._server.accept()
+                    with conn:
+                        self._serve(conn)
+        finally:
+            self._selector.close()
+            for sock in self._wakeup:
+                sock.close()
+
+    def _update(self):
+        data = self._events.recv(_BUFSIZE)
+        if not data:
+            # no more events: read the system by every request
+            self._selector.unregister(self._events)
+            self._events = None
+            return
+        self._buf += data
+        end = rtsock.complete(self._buf)
+        for msg in rtsock.messages(self._buf[:end]):
+            commands = stale(msg)
+            if commands is None:
+                utils.invalidate()
+            elif commands:
+                utils.invalidate(*commands)
+        self._buf = self._buf[end:]
+
+    def _serve(self, conn):
+        conn.settimeout(_TIMEOUT)
+        try:
+            request = json.loads(_recv(conn))
+        except (OSError, ValueError) as e:
+            utils.stderr(f"ipd: invalid request: {e}")
+            return
+        reply = self.run(request)
+        with contextlib.suppress(OSError):
+            conn.sendall(json.dumps(reply).encode())
+
+    def run(self, request):
+        """
+        Run a request of forward(), returning its "returncode", "stdout" and "stderr"
+        """
+        if self._events is None:
+            utils.invalidate()
+        else:
+            utils.invalidate_if(_unwatched)
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        try:
+            # share snapshots and parsed objects as in batch mode
+            options = iproute4mac.options().replace(request.get("options", {}), batch_mode=True)
+            with (
+                contextlib.redirect_stdout(stdout),
+                contextlib.redirect_stderr(stderr),
+                iproute4mac.using(options),
+            ):
+                if request.get("cmd") not in _COMMANDS:
+                    raise ValueError(f'unknown command "{request.get("cmd")}"')
+                # relative file names (e.g. ip route get file FILENAME)
+                with contextlib.suppress(OSError):
+                    os.chdir(request.get("cwd", "/"))
+                do_obj = importlib.import_module(f"iproute4mac.cmd.{request['cmd']}").do_obj
+                try:
+                    res = do_obj(list(request["argv"]))
+                except SystemExit as e:
+                    res = e.code
+                if isinstance(res, str):
+                    utils.stderr(res)
+                    res = libc.EXIT_FAILURE
+        except Exception:
+            stderr.write(traceback.format_exc())
+            res = libc.EXIT_FAILURE
+        return {
+            "returncode": res or libc.EXIT_SUCCESS,
+            "stdout": stdout.getvalue(),
+            "stderr": stderr.getvalue(),
+        }
+
+
+def listen(sock_path):
+    """
+    Unix socket listening at `sock_path`, reachable by the current user only
+    """
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    with probe:
+        try:
+            probe.connect(sock_path)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            # left by a daemon not running anymore
+            os.unlink(sock_path)
+        else:
+            utils.error(f'ipd already running on "{sock_path}"')
+    os.makedirs(os.path.dirname(sock_path) or ".", mode=0o700, exist_ok=True)
+    old_umask = os.umask(0o177)
+    try:
+        server.bind(sock_path)
+    finally:
+        os.umask(old_umask)
+    server.listen()
+    return server
+
+
+def main():
+    if sys.platform != "darwin" and not backend.get().offline:
+        utils.stderr("Unupported OS.")
+        exit(libc.EXIT_ERROR)
+
+    sock_path = path()
+    argv = sys.argv[1:]
+    while argv:
+        opt = argv.pop(0)
+        if matches(opt, "-socket"):
+            try:
+                sock_path = argv.pop(0)
+            except IndexError:
+                utils.missarg("socket path")
+        elif matches(opt, "-help"):
+            usage()
+        else:
+            utils.stderr(f'Option "{opt}" is unknown, try "ipd -help".')
+            exit(libc.EXIT_ERROR)
+
+    OPTION["uid"] = os.getuid()
+    server = listen(sock_path)
+    try:
+        daemon = Daemon(server, events=utils.route_socket())
+        daemon.serve()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        os.unlink(sock_path)
+    return libc.EXIT_SUCCESS
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,7 @@
+import importlib
 import re
-import sys
 
 import iproute4mac.ifconfig as ifconfig
-import iproute4mac.iplink_bond as bond
-import iproute4mac.iplink_bridge as bridge
-import iproute4mac.iplink_feth as feth
-import iproute4mac.iplink_veth as veth
-import iproute4mac.iplink_vlan as vlan
 import iproute4mac.libc as libc
 import iproute4mac.socket as socket
 import iproute4mac.utils as utils
@@ -14,6 +9,7 @@ import iproute4mac.utils as utils
 from iproute4mac import OPTION
 from iproute4mac.ifconfig import LLADDR, IFNAME
 from iproute4mac.ipaddress import get_links
+from iproute4mac.query import Query
 from iproute4mac.utils import matches, strcmp, next_arg
 
 
@@ -98,9 +94,15 @@ class LinkType:
 
     def __init__(self, kind):
         self._modulename = f"iproute4mac.iplink_{kind}"
-        if self._modulename not in sys.modules:
-            raise NotImplementedError(f'link type "{kind}" is not implemented')
-        self._module = sys.modules[self._modulename]
+        # link types are imported only when used
+        try:
+            if not kind.isidentifier():
+                raise ModuleNotFoundError(name=self._modulename)
+            self._module = importlib.import_module(self._modulename)
+        except ModuleNotFoundError as e:
+            if e.name != self._modulename:
+                raise
+            raise NotImplementedError(f'link type "{kind}" is not implemented') from None
         self._name = kind
 
     @property
@@ -134,7 +136,7 @@ def iplink_add(dev, link_type, args, links):
 
 
 def iplink_del(dev, link_type, args, links):
-    if not (link := next((l for l in links if l["ifname"] == dev), None)):
+    if not (link := links.lookup("ifname", dev)):
         utils.stderr(f'Cannot find device "{dev}"')
         exit(libc.EXIT_FAILURE)
 
@@ -148,7 +150,7 @@ def iplink_del(dev, link_type, args, links):
 
 
 def iplink_set(dev, link_type, args, links):
-    if not (link := next((l for l in links if l["ifname"] == dev), None)):
+    if not (link := links.lookup("ifname", dev)):
         utils.stderr(f'Cannot find device "{dev}"')
         exit(libc.EXIT_FAILURE)
 
@@ -163,14 +165,14 @@ def iplink_set(dev, link_type, args, links):
         elif strcmp(opt, "address"):
             res += ifconfig.run(dev, "lladdr", value)
         elif strcmp(opt, "master"):
-            if master := next((l for l in links if l["ifname"] == value), None):
+            if master := links.lookup("ifname", value):
                 if not link_type:
                     if not (kind := master.get("linkinfo", {}).get("info_kind")):
                         continue
                     link_type = LinkType(kind)
                 link_type.link(link, master)
         elif strcmp(opt, "nomaster"):
-            if master := next((l for l in links if l["ifname"] == link.get("master")), None):
+            if link.get("master") and (master := links.lookup("ifname", link["master"])):
                 if not link_type:
                     if not (kind := link.get("linkinfo", {}).get("info_slave_kind")):
                         continue
@@ -186,9 +188,8 @@ def iplink_set(dev, link_type, args, links):
 
 def iplink_modify(cmd, argv):
     # hide unrequested (but needed) system command from logs
-    old_options = utils.options_override({"show_details": True, "verbose": -1})
-    links = get_iplinks()
-    utils.options_restore(old_options)
+    with utils.options_overridden(show_details=True, verbose=-1):
+        links = get_iplinks()
 
     dev = None
     link_type = None
@@ -461,8 +462,7 @@ def iplink_modify(cmd, argv):
 
 def get_iplinks(argv=[]):
     links = get_links(argv, usage)
-    for link in links:
-        del link["addr_info"]
+    links.query(Query().delete_keys("addr_info"))
     return links
 
 
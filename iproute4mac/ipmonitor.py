@@ -0,0 +1,211 @@
+import ipaddress
+import sys
+import time
+
+import iproute4mac.ifaddrs as ifaddrs
+import iproute4mac.libc as libc
+import iproute4mac.nud as nud
+import iproute4mac.route as route
+import iproute4mac.rtsock as rtsock
+import iproute4mac.socket as socket
+import iproute4mac.utils as utils
+
+from iproute4mac import OPTION
+from iproute4mac.data import _Item, dict_format
+from iproute4mac.prefix import Prefix
+from iproute4mac.utils import matches, strcmp
+
+
+_GROUPS = ("link", "address", "route", "neigh")
+
+# monitored routing messages, and if they are deletions
+_ROUTE_MSG = {
+    rtsock.RTM_ADD: False,
+    rtsock.RTM_CHANGE: False,
+    rtsock.RTM_REDIRECT: False,
+    rtsock.RTM_RESOLVE: False,
+    rtsock.RTM_DELETE: True,
+}
+_ADDRESS_MSG = {
+    rtsock.RTM_NEWADDR: False,
+    rtsock.RTM_DELADDR: True,
+}
+
+
+def usage():
+    utils.stderr("""\
+Usage: ip monitor [ all | OBJECTS ] [ FILE ] [ label ] [ all-nsid ]
+                  [ dev DEVICE ]
+OBJECTS :=  address | link | mroute | neigh | netconf |
+            nexthop | nsid | prefix | route | rule | stats
+FILE := file FILENAME""")
+    exit(libc.EXIT_ERROR)
+
+
+class _Link(_Item):
+    def __init__(self, msg, name):
+        flags = ifaddrs.flag_names(msg["flags"])
+        self._data = {
+            "ifindex": msg["index"],
+            "ifname": name,
+            "flags": flags,
+            "mtu": msg["mtu"],
+            "operstate": "UP" if "UP" in flags and "RUNNING" in flags else "DOWN",
+        }
+
+    def str(self, details=True):
+        res = f"{self['ifindex']}: {self['ifname']}: <{','.join(self['flags'])}>"
+        res += f" mtu {self['mtu']} state {self['operstate']}"
+        return res
+
+
+class _Address(_Item):
+    def __init__(self, msg, name):
+        sockaddrs = msg["sockaddrs"]
+        family = rtsock.sockaddr_family(sockaddrs[rtsock.RTA_IFA])
+        local = ipaddress.ip_address(rtsock.sockaddr_str(sockaddrs[rtsock.RTA_IFA]))
+        if local.is_loopback:
+            scope = "host"
+        elif local.is_link_local:
+            scope = "link"
+        else:
+            scope = "global"
+        info = {
+            "family": "inet" if local.version == 4 else "inet6",
+            "local": Prefix(str(local)),
+            "prefixlen": rtsock.netmask_prefixlen(sockaddrs.get(rtsock.RTA_NETMASK, b""), family),
+            "broadcast": None,
+            "scope": scope,
+            "label": name if local.version == 4 else None,
+        }
+        if local.version == 4 and rtsock.RTA_BRD in sockaddrs:
+            info["broadcast"] = Prefix(rtsock.sockaddr_str(sockaddrs[rtsock.RTA_BRD]))
+        self._data = {"ifindex": msg["index"], "ifname": name, "addr_info": [info]}
+
+    @property
+    def family(self):
+        return self["addr_info"][0]["local"].family
+
+    def str(self, details=True):
+        info = self["addr_info"][0]
+        res = f"{self['ifindex']}: {self['ifname']}    "
+        res += f"{info['family']} {info['local']}/{info['prefixlen']}"
+        res += dict_format(info, " brd {}", "broadcast")
+        res += f" scope {info['scope']}"
+        res += dict_format(info, " {}", "label")
+        return res
+
+
+def _ifname(index, names):
+    if index not in names:
+        try:
+            names[index] = socket.if_indextoname(index)
+        except OSError:
+            names[index] = f"if{index}"
+    return names[index]
+
+
+def _timestamp(now):
+    if OPTION["json"]:
+        return ""
+    usec = int(now * 1000000) % 1000000
+    if OPTION["timestamp_short"]:
+        return time.strftime("[%Y-%m-%dT%H:%M:%S", time.localtime(now)) + f".{usec:06d}] "
+    return f"Timestamp: {time.ctime(now)} {usec} usec\n"
+
+
+def _event(msg, names):
+    """
+    Decode a routing message into (group, deleted, item), None if not monitored
+    """
+    if msg["type"] == rtsock.RTM_IFINFO and "mtu" in msg:
+        return "link", False, _Link(msg, _ifname(msg["index"], names))
+    if msg["type"] in _ADDRESS_MSG:
+        ifa = msg.get("sockaddrs", {}).get(rtsock.RTA_IFA, b"")
+        if rtsock.sockaddr_family(ifa) not in (rtsock._AF_INET, rtsock._AF_INET6):
+            return None
+        item = _Address(msg, _ifname(msg["index"], names))
+        return "address", _ADDRESS_MSG[msg["type"]], item
+    if msg["type"] not in _ROUTE_MSG:
+        return None
+    entry = rtsock.route(msg, {msg["index"]: _ifname(msg["index"], names)})
+    if not entry:
+        return None
+    deleted = _ROUTE_MSG[msg["type"]]
+    if msg["flags"] & rtsock.RTF_LLINFO:
+        dst, prefix, gateway, flags, dev, expire = entry
+        lladdr = gateway if gateway and ":" in gateway else "(incomplete)"
+        expire = expire if expire else "(none)"
+        return "neigh", deleted, nud._Nud(dst, lladdr, dev, expire, expire)
+    if item := route.from_entry(entry):
+        return "route", deleted, item
+    return None
+
+
+def ipmonitor_print(msg, groups, names, banner=False, now=None):
+    """
+    Print a routing message of the monitored `groups` (iproute2 text, or a JSON line)
+    """
+    if not (event := _event(msg, names)):
+        return
+    group, deleted, item = event
+    if group not in groups:
+        return
+    family = OPTION["preferred_family"]
+    if family != socket._AF_UNSPEC and group != "link":
+        if (item.family if group == "address" else item["dst"].family) != family:
+            return
+    now = time.time() if now is None else now
+    if OPTION["json"]:
+        res = {"deleted": True} if deleted else {}
+        if OPTION["timestamp"]:
+            res["timestamp"] = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(now))
+            res["timestamp"] += f".{int(now * 1000000) % 1000000:06d}"
+        res.update(item.dict(details=OPTION["show_details"]))
+        res = utils.json_dumps(res)
+    else:
+        res = _timestamp(now) if OPTION["timestamp"] else ""
+        if banner:
+            res += f"[{group.upper() if group != 'address' else 'ADDR'}]"
+        res += "Deleted " if deleted else ""
+        res += item.str(details=OPTION["show_details"])
+    utils.stdout(res, end="\n")
+    sys.stdout.flush()
+
+
+def do_ipmonitor(argv):
+    groups = set()
+    banner = False
+    while argv:
+        opt = argv.pop(0)
+        if matches(opt, "link"):
+            groups.add("link")
+        elif matches(opt, "address"):
+            groups.add("address")
+        elif matches(opt, "route"):
+            groups.add("route")
+        elif matches(opt, "neigh"):
+            groups.add("neigh")
+        elif strcmp(opt, "all"):
+            banner = True
+        elif matches(opt, "help"):
+            usage()
+        else:
+            utils.stderr(f'Argument "{opt}" is unknown, try "ip monitor help".')
+            exit(libc.EXIT_ERROR)
+    if not groups:
+        groups = set(_GROUPS)
+
+    if (sock := utils.route_socket()) is None:
+        utils.do_notsupported("monitor")
+    names = {}
+    with sock:
+        if OPTION.get("rcvbuf"):
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, OPTION["rcvbuf"])
+        try:
+            for msg in rtsock.stream(sock):
+                ipmonitor_print(msg, groups, names, banner=banner)
+        except KeyboardInterrupt:
+            pass
+
+    return libc.EXIT_SUCCESS
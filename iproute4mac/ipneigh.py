@@ -5,6 +5,7 @@ import iproute4mac.socket as socket
 import iproute4mac.utils as utils
 
 from iproute4mac import OPTION
+from iproute4mac.query import Query
 from iproute4mac.utils import matches, strcmp, next_arg, get_addr, get_prefix
 
 
@@ -142,13 +143,10 @@ def ipneigh_get(argv):
     return libc.EXIT_SUCCESS
 
 
-def ipneigh_list_or_flush(argv, flush=False):
-    if flush and not argv:
-        utils.stderr("Flush requires arguments.")
-        exit(libc.EXIT_ERROR)
-
-    entries = nud.Nud()
+def get_neighbours(argv, display=True):
+    query = Query(display=display)
     dev = None
+    host = None
     states = []
     while argv:
         opt = argv.pop(0)
@@ -157,16 +155,15 @@ def ipneigh_list_or_flush(argv, flush=False):
             if dev:
                 utils.duparg("dev", opt)
             dev = opt
-            entries.set([e for e in entries if e["dev"] == dev])
-            if not flush:
-                utils.delete_keys(entries, "dev")
+            query.where(lambda e, dev=dev: e["dev"] == dev)
+            query.delete_keys("dev")
         elif strcmp(opt, "master"):
             opt = next_arg(argv)
             utils.warn("Kernel does not support filtering by master device")
         elif strcmp(opt, "vrf"):
             utils.do_notimplemented(opt)
         elif strcmp(opt, "unused"):
-            entries.set([e for e in entries if e.unused])
+            query.where(lambda e: e.unused)
         elif strcmp(opt, "nud"):
             state = next_arg(argv)
             if strcmp(state, "all"):
@@ -178,7 +175,7 @@ def ipneigh_list_or_flush(argv, flush=False):
                 utils.invarg("nud state is bad", state)
             states.append(nud.to_state(state))
         elif strcmp(opt, "proxy"):
-            entries.set([e for e in entries if "proxy" in e["state"]])
+            query.where(lambda e: "proxy" in e["state"])
         elif matches(opt, "protocol"):
             utils.do_notimplemented(opt)
         else:
@@ -190,14 +187,27 @@ def ipneigh_list_or_flush(argv, flush=False):
                 to = get_addr(opt, OPTION["preferred_family"])
             except ValueError:
                 utils.invarg("to value is invalid", opt)
-            entries.set([e for e in entries if e["dst"] in to])
+            query.where(lambda e, to=to: e["dst"] in to)
+            host = to
 
-    if OPTION["preferred_family"] != socket._AF_UNSPEC:
-        entries.set([e for e in entries if e["dst"].family == OPTION["preferred_family"]])
+    if (family := OPTION["preferred_family"]) != socket._AF_UNSPEC:
+        query.where(lambda e, family=family: e["dst"].family == family)
 
     if states:
-        entries.set([e for e in entries if set(e["state"]) <= set(states)])
+        query.where(lambda e, states=set(states): set(e["state"]) <= states)
+
+    entries = nud.Nud(dev=dev, host=host, family=family)
+    entries.query(query)
+    return entries
+
+
+def ipneigh_list_or_flush(argv, flush=False):
+    if flush and not argv:
+        utils.stderr("Flush requires arguments.")
+        exit(libc.EXIT_ERROR)
 
+    # flushed entries need their "dev"
+    entries = get_neighbours(argv, display=not flush)
     if flush:
         for entry in entries:
             nud.delete(entry["dst"], dev=entry["dev"])
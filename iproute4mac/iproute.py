@@ -1,12 +1,19 @@
-import iproute4mac.data as data
+import errno
+import os
+import sys
+import time
+
+import iproute4mac.ifconfig as ifconfig
 import iproute4mac.libc as libc
 import iproute4mac.prefix as prefix
 import iproute4mac.route as route
+import iproute4mac.rtsock as rtsock
 import iproute4mac.socket as socket
 import iproute4mac.utils as utils
 
 from iproute4mac import OPTION
 from iproute4mac.prefix import Prefix
+from iproute4mac.query import Query
 from iproute4mac.utils import matches, strcmp, next_arg, get_addr, get_prefix
 
 
@@ -16,7 +23,8 @@ Usage: ip route { list | flush } SELECTOR
        ip route save SELECTOR
        ip route restore
        ip route showdump
-       ip route get [ ROUTE_GET_FLAGS ] [ to ] ADDRESS
+       ip route get [ ROUTE_GET_FLAGS ] [ to ] ADDRESS [ [ to ] ADDRESS ]...
+                            [ file FILENAME ]
                             [ from ADDRESS iif STRING ]
                             [ oif STRING ] [ tos TOS ]
                             [ mark NUMBER ] [ vrf NAME ]
@@ -74,27 +82,150 @@ ROUTE_GET_FLAG := [ connected | fibmatch | notify ]""")
     exit(libc.EXIT_ERROR)
 
 
-def iproute_add(argv):
-    res = route.run("add", argv)
-    if res.find("File exists") > -1:
-        utils.stderr("RTNETLINK answers: File exists")
-        exit(2)
+def _ifindex(dev):
+    try:
+        return socket.if_nametoindex(dev)
+    except OSError:
+        utils.stderr(f'Cannot find device "{dev}"')
+        exit(libc.EXIT_FAILURE)
+
+
+def _route_msg(rtm_type, entry, metrics, locks):
+    """
+    Routing message of the same route(8) command line of _route_argv()
+    """
+    dst = entry["dst"]
+    if dst.family == socket._AF_UNSPEC:
+        dst = Prefix(str(dst), family=socket._AF_INET)
+    flags = rtsock.RTF_UP | rtsock.RTF_STATIC
+    index = _ifindex(entry["dev"]) if "dev" in entry else 0
+    sockaddrs = {rtsock.RTA_DST: rtsock.sockaddr_inet(dst.address, index)}
+    if dst.prefixlen == dst.address.max_prefixlen:
+        flags |= rtsock.RTF_HOST
+    else:
+        sockaddrs[rtsock.RTA_NETMASK] = rtsock.sockaddr_netmask(dst.prefixlen, dst.version)
+    gateway = entry.get("gateway")
+    if entry.get("rtn") == route._RTN_BLACKHOLE:
+        gateway = Prefix("localhost", family=dst.family)
+        flags |= rtsock.RTF_BLACKHOLE
+    if gateway:
+        sockaddrs[rtsock.RTA_GATEWAY] = rtsock.sockaddr_inet(gateway.address, index)
+        flags |= rtsock.RTF_GATEWAY
+        if index:
+            flags |= rtsock.RTF_IFSCOPE
+    elif index:
+        # -interface
+        sockaddrs[rtsock.RTA_GATEWAY] = rtsock.sockaddr_dl(index, entry["dev"])
+        index = 0
+    if rtm_type == rtsock.RTM_DELETE:
+        metrics = {}
+        locks = ()
+    elif "expire" in metrics:
+        # rmx_expire is absolute
+        metrics = {**metrics, "expire": int(time.time()) + metrics["expire"]}
+    return rtsock.message(
+        rtm_type, sockaddrs, index=index, flags=flags, metrics=metrics, locks=locks
+    )
+
+
+def _route_argv(entry, metrics, locks):
+    """
+    route(8) command line of a route entry
+    """
+    argv = []
+    for metric, value in metrics.items():
+        if metric in locks:
+            argv.append("-lock")
+        argv += [f"-{metric}", str(value)]
 
+    if "dev" in entry:
+        if "gateway" in entry:
+            argv += f"-ifscope {entry['dev']} {entry['dst']} {entry['gateway']}".split()
+        else:
+            argv += f"{entry['dst']} -interface {entry['dev']}".split()
+    else:
+        if "gateway" in entry:
+            argv += f"{entry['dst']} {entry['gateway']}".split()
+        else:
+            argv += f"{entry['dst']}".split()
 
-def iproute_del(argv):
-    res = route.run("delete", argv)
+    if "rtn" in entry:
+        if entry["rtn"] == route._RTN_BLACKHOLE:
+            if entry["dst"].family == socket._AF_INET:
+                gw = "127.0.0.1"
+            else:
+                gw = "::1"
+            argv += f"{gw} -blackhole".split()
+
+    return argv
+
+
+def _route_request(rtm_type, entry, metrics, locks):
+    """
+    Output:
+    the errno of the request (0 on success), None if there is no routing socket
+    """
+    return utils.route_request(lambda: _route_msg(rtm_type, entry, metrics, locks))
+
+
+def _route_run(cmd, entry, metrics, locks):
+    """
+    Fallback of _route_request() on the route command
+    """
+    res = route.run(cmd, _route_argv(entry, metrics, locks))
+    if res.find("File exists") > -1:
+        return errno.EEXIST
     if res.find("not in table") > -1:
-        utils.stderr("RTNETLINK answers: No such process")
-        exit(2)
+        return errno.ESRCH
+    return 0
+
+
+def _rtnetlink_error(err):
+    utils.stderr(f"RTNETLINK answers: {os.strerror(err)}")
+    exit(2)
+
+
+def iproute_add(entry, metrics, locks):
+    err = _route_request(rtsock.RTM_ADD, entry, metrics, locks)
+    if err is None:
+        err = _route_run("add", entry, metrics, locks)
+    if err:
+        _rtnetlink_error(err)
 
 
-def iproute_change(argv):
-    route.run("change", argv)
+def iproute_del(entry, metrics, locks):
+    err = _route_request(rtsock.RTM_DELETE, entry, metrics, locks)
+    if err is None:
+        err = _route_run("delete", entry, metrics, locks)
+    if err:
+        _rtnetlink_error(err)
+
+
+def iproute_change(entry, metrics, locks):
+    err = _route_request(rtsock.RTM_CHANGE, entry, metrics, locks)
+    if err is None:
+        err = _route_run("change", entry, metrics, locks)
+    if err:
+        _rtnetlink_error(err)
+
+
+def iproute_replace(entry, metrics, locks):
+    err = _route_request(rtsock.RTM_CHANGE, entry, metrics, locks)
+    if err is None:
+        # the route command has no (atomic) replace
+        iproute_del(entry, metrics, locks)
+        iproute_add(entry, metrics, locks)
+        return
+    if err == errno.ESRCH:
+        err = _route_request(rtsock.RTM_ADD, entry, metrics, locks)
+    if err:
+        _rtnetlink_error(err)
 
 
 def iproute_modify(cmd, argv):
     entry = {}
-    modifiers = {}
+    metrics = {}
+    locks = set()
     while argv:
         opt = argv.pop(0)
         if strcmp(opt, "src"):
@@ -129,7 +260,7 @@ def iproute_modify(cmd, argv):
                 assert 0 <= expires < 2**32
             except (ValueError, AssertionError):
                 utils.invarg('"expires" value is invalid', expires)
-            modifiers["expire"] = f"-expire {expires}"
+            metrics["expire"] = expires
         elif matches(opt, "metric", "priority") or strcmp(opt, "preference"):
             metric = next_arg(argv)
             try:
@@ -144,27 +275,25 @@ def iproute_modify(cmd, argv):
         elif strcmp(opt, "mtu"):
             mtu = next_arg(argv)
             if strcmp(mtu, "lock"):
-                modifiers["mtu"] = "-lock -mtu "
+                locks.add("mtu")
                 mtu = next_arg(argv)
-            else:
-                modifiers["mtu"] = "-mtu "
             try:
-                assert 0 <= int(mtu) < 2**32
+                mtu = int(mtu)
+                assert 0 <= mtu < 2**32
             except (ValueError, AssertionError):
                 utils.invarg('"mtu" value is invalid', mtu)
-            modifiers["mtu"] += mtu
+            metrics["mtu"] = mtu
         elif strcmp(opt, "hoplimit"):
             hoplimit = next_arg(argv)
             if strcmp(hoplimit, "lock"):
-                modifiers["hoplimit"] = "-lock -hopcount "
+                locks.add("hopcount")
                 hoplimit = next_arg(argv)
-            else:
-                modifiers["hoplimit"] = "-hopcount "
             try:
-                assert 0 <= int(hoplimit) < 2**8
+                hoplimit = int(hoplimit)
+                assert 0 <= hoplimit < 2**8
             except (ValueError, AssertionError):
                 utils.invarg('"hoplimit" value is invalid', hoplimit)
-            modifiers["hoplimit"] += hoplimit
+            metrics["hopcount"] = hoplimit
         elif strcmp(opt, "advmss"):
             mss = next_arg(argv)
             if strcmp(mss, "lock"):
@@ -188,15 +317,14 @@ def iproute_modify(cmd, argv):
         elif strcmp(opt, "rtt"):
             rtt = next_arg(argv)
             if strcmp(rtt, "lock"):
-                modifiers["rtt"] = "-lock -rtt "
+                locks.add("rtt")
                 rtt = next_arg(argv)
-            else:
-                modifiers["rtt"] = "-rtt "
             try:
-                assert 0 <= int(rtt) < 2**32
+                rtt = int(rtt)
+                assert 0 <= rtt < 2**32
             except (ValueError, AssertionError):
                 utils.invarg('"rtt" value is invalid', rtt)
-            modifiers["rtt"] += rtt
+            metrics["rtt"] = rtt
         elif strcmp(opt, "rto_min"):
             rto_min = next_arg(argv)
             try:
@@ -233,28 +361,26 @@ def iproute_modify(cmd, argv):
             utils.do_notimplemented(rta)
         elif matches(opt, "rttvar"):
             win = next_arg(argv)
-            if strcmp(rtt, "lock"):
-                modifiers["rttvar"] = "-lock -rttvar "
+            if strcmp(win, "lock"):
+                locks.add("rttvar")
                 win = next_arg(argv)
-            else:
-                modifiers["rttvar"] = "-rttvar "
             try:
-                assert 0 <= int(win) < 2**32
+                win = int(win)
+                assert 0 <= win < 2**32
             except (ValueError, AssertionError):
                 utils.invarg('"rttvar" value is invalid', win)
-            modifiers["rttvar"] += win
+            metrics["rttvar"] = win
         elif matches(opt, "ssthresh"):
             win = next_arg(argv)
-            if strcmp(rtt, "lock"):
-                modifiers["ssthresh"] = "-lock -ssthresh "
+            if strcmp(win, "lock"):
+                locks.add("ssthresh")
                 win = next_arg(argv)
-            else:
-                modifiers["ssthresh"] = "-ssthresh "
             try:
-                assert 0 <= int(win) < 2**32
+                win = int(win)
+                assert 0 <= win < 2**32
             except (ValueError, AssertionError):
                 utils.invarg('"ssthresh" value is invalid', win)
-            modifiers["ssthresh"] += win
+            metrics["ssthresh"] = win
         elif matches(opt, "realms"):
             realm = next_arg(argv)
             utils.do_notimplemented(realm)
@@ -337,37 +463,14 @@ def iproute_modify(cmd, argv):
     if "gateway" in entry and entry["dst"].family == socket._AF_UNSPEC:
         entry["dst"].family = entry["gateway"].family
 
-    for mod in modifiers:
-        argv += modifiers[mod].split()
-
-    if "dev" in entry:
-        if "gateway" in entry:
-            argv += f"-ifscope {entry['dev']} {entry['dst']} {entry['gateway']}".split()
-        else:
-            argv += f"{entry['dst']} -interface {entry['dev']}".split()
-    else:
-        if "gateway" in entry:
-            argv += f"{entry['dst']} {entry['gateway']}".split()
-        else:
-            argv += f"{entry['dst']}".split()
-
-    if "rtn" in entry:
-        if entry["rtn"] == route._RTN_BLACKHOLE:
-            if entry["dst"].family == socket._AF_INET:
-                gw = "127.0.0.1"
-            else:
-                gw = "::1"
-            argv += f"{gw} -blackhole".split()
-
     if matches(cmd, "add"):
-        iproute_add(argv)
+        iproute_add(entry, metrics, locks)
     elif matches(cmd, "delete"):
-        iproute_del(argv)
+        iproute_del(entry, metrics, locks)
     elif matches(cmd, "change"):
-        iproute_change(argv)
+        iproute_change(entry, metrics, locks)
     elif matches(cmd, "replace"):
-        iproute_del(argv)
-        iproute_add(argv)
+        iproute_replace(entry, metrics, locks)
     # elif matches(cmd, "prepend"):
     # elif matches(cmd, "append"):
     else:
@@ -376,8 +479,37 @@ def iproute_modify(cmd, argv):
     return libc.EXIT_SUCCESS
 
 
+def _get_host(name, family):
+    to = get_prefix(name, family)
+    if "/" in str(to) and not to.is_host:
+        utils.stderr(
+            "Warning: "
+            f"/{to.prefixlen} as prefix is invalid, "
+            f"only /{to.max_prefixlen} (or none) is supported."
+        )
+        to = Prefix(to.address)
+    return to
+
+
+def _read_hosts(name, family):
+    """
+    Hosts of file `name` (stdin if "-"), separated by blanks, "#" starting a comment
+    """
+    try:
+        source = sys.stdin if name == "-" else open(name, encoding="utf-8")
+    except OSError as e:
+        utils.error(f'Cannot open file "{name}" for reading: {e.strerror}')
+    with source:
+        return [
+            _get_host(host, family) for line in source for host in line.split("#", 1)[0].split()
+        ]
+
+
 def iproute_get(argv):
-    to = None
+    to = []
+    batch = False
+    odev = None
+    family = OPTION["preferred_family"]
 
     while argv:
         opt = argv.pop(0)
@@ -395,12 +527,11 @@ def iproute_get(argv):
         elif matches(opt, "mark"):
             mark = next_arg(argv)
             utils.do_notimplemented(mark)
-        elif matches(opt, "oif"):
+        elif matches(opt, "oif") or strcmp(opt, "dev"):
             odev = next_arg(argv)
-            utils.do_notimplemented(odev)
-        elif matches(opt, "oif"):
-            odev = next_arg(argv)
-            utils.do_notimplemented(odev)
+            if not ifconfig.NativeIpAddress().lookup("ifname", odev):
+                utils.stderr(f'Cannot find device "{odev}"')
+                return libc.EXIT_FAILURE
         elif matches(opt, "notify"):
             utils.do_notimplemented()
         elif matches(opt, "connected"):
@@ -418,6 +549,9 @@ def iproute_get(argv):
             OPTION["uid"] = uid
         elif matches(opt, "fibmatch"):
             utils.do_notimplemented()
+        elif strcmp(opt, "file"):
+            to.extend(_read_hosts(next_arg(argv), family))
+            batch = True
         elif strcmp(opt, "as"):
             addr = next_arg(argv)
             if strcmp(addr, "to"):
@@ -450,30 +584,42 @@ def iproute_get(argv):
                 opt = next_arg(argv)
             if matches(opt, "help"):
                 usage()
-            to = get_prefix(opt, OPTION["preferred_family"])
-            if "/" in str(to) and not to.is_host:
-                utils.stderr(
-                    "Warning: "
-                    f"/{to.prefixlen} as prefix is invalid, "
-                    f"only /{to.max_prefixlen} (or none) is supported."
-                )
-                to = Prefix(to.address)
-            OPTION["preferred_family"] = to.family
+            to.append(_get_host(opt, family))
+            OPTION["preferred_family"] = to[-1].family
 
     if not to:
+        if batch:
+            return libc.EXIT_SUCCESS
         utils.stderr("need at least a destination address")
         return libc.EXIT_FAILURE
 
-    utils.output(route.RouteGet(to, uid=OPTION["uid"]))
+    if batch or len(to) > 1 or odev is not None:
+        # all the hosts from the same routing table snapshot
+        routes = route.RouteGets(to, dev=odev, uid=OPTION["uid"])
+        utils.output(routes)
+        if routes.unreachable:
+            return libc.EXIT_FAILURE
+    else:
+        utils.output(route.RouteGet(to[0], uid=OPTION["uid"]))
 
     return libc.EXIT_SUCCESS
 
 
-def iproute_list(argv):
+def _select(entries, selected):
+    """
+    Keep only the `selected` entries, in their order
+    """
+    selected = set(map(id, selected))
+    entries.filter(lambda e: id(e) in selected)
+
+
+def get_routes(argv, display=True):
     if OPTION["preferred_family"] == socket._AF_UNSPEC:
         OPTION["preferred_family"] = socket._AF_INET
 
-    entries = route.Routes()
+    query = Query(display=display)
+    # radix trie selectors: (method, prefix)
+    selectors = []
     while argv:
         opt = argv.pop(0)
         if matches(opt, "table"):
@@ -499,8 +645,8 @@ def iproute_list(argv):
                 utils.invarg('invalid "protocol"', protocol)
             if protocol == "all":
                 continue
-            entries.set([e for e in entries if e.get("protocol") == protocol])
-            utils.delete_keys(entries, "protocol")
+            query.where(lambda e, protocol=protocol: e.get("protocol") == protocol)
+            query.delete_keys("protocol")
         elif matches(opt, "scope"):
             scope = next_arg(argv)
             if scope not in ("link", "host", "global", "all") and not scope.isdigit():
@@ -508,23 +654,19 @@ def iproute_list(argv):
             if scope == "all":
                 continue
             # FIXME: numeric scope?
-            entries.set([e for e in entries if e.get("scope") == scope])
-            utils.delete_keys(entries, "scope")
+            query.where(lambda e, scope=scope: e.get("scope") == scope)
+            query.delete_keys("scope")
         elif matches(opt, "type"):
             rt = next_arg(argv)
             if not route.is_rtn(rt):
                 utils.invarg("node type value is invalid", rt)
-            entries.set(
-                [
-                    e
-                    for e in entries
-                    if (e.get("type") == rt or ("type" not in e and rt == "unicast"))
-                ]
+            query.where(
+                lambda e, rt=rt: e.get("type") == rt or ("type" not in e and rt == "unicast")
             )
         elif strcmp(opt, "dev", "oif", "iif"):
             dev = next_arg(argv)
-            entries.set([e for e in entries if e.get("dev") == dev])
-            data.delete_keys(entries, "dev")
+            query.where(lambda e, dev=dev: e.get("dev") == dev)
+            query.delete_keys("dev")
         elif strcmp(opt, "mark"):
             mark = next_arg(argv)
             utils.do_notimplemented(mark)
@@ -543,14 +685,14 @@ def iproute_list(argv):
             else:
                 via = next_arg(argv)
             via = get_prefix(via, family)
-            entries.set([e for e in entries if e.present("gateway") and via in e["gateway"]])
-            data.delete_keys(entries, "gateway")
+            query.where(lambda e, via=via: e.present("gateway") and via in e["gateway"])
+            query.delete_keys("gateway")
         elif strcmp(opt, "src"):
             src = get_prefix(next_arg(argv), OPTION["preferred_family"])
             if not src._is_default:
-                entries.set([e for e in entries if e.source_from(src)])
+                query.where(lambda e, src=src: e.source_from(src))
                 if src.is_host:
-                    data.delete_keys(entries, "prefsrc")
+                    query.delete_keys("prefsrc")
         elif matches(opt, "realms"):
             realm = next_arg(argv)
             utils.do_notimplemented(realm)
@@ -575,22 +717,31 @@ def iproute_list(argv):
             if matches(opt, "root"):
                 opt = next_arg(argv)
                 to = get_prefix(opt, OPTION["preferred_family"])
-                entries.set([e for e in entries if e.present("dst") and e["dst"] in to])
+                selectors.append(("subnets", to))
             elif matches(opt, "match"):
                 opt = next_arg(argv)
                 to = get_prefix(opt, OPTION["preferred_family"])
-                entries.set([e for e in entries if e.present("dst") and to in e["dst"]])
+                selectors.append(("supernets", to))
             else:
                 if matches(opt, "exact"):
                     opt = next_arg(argv)
                 to = get_prefix(opt, OPTION["preferred_family"])
-                entries.set([e for e in entries if e.present("dst") and to == e["dst"]])
+                selectors.append(("exact", to))
 
-    if OPTION["preferred_family"] != socket._AF_UNSPEC:
-        entries.set([e for e in entries if e["dst"].family == OPTION["preferred_family"]])
+    if (family := OPTION["preferred_family"]) != socket._AF_UNSPEC:
+        query.where(lambda e, family=family: e["dst"].family == family)
 
-    utils.output(entries)
+    # a single exact prefix is pushed down to route -n get
+    exact = selectors[0][1] if [method for method, to in selectors] == ["exact"] else None
+    entries = route.Routes(family=family, exact=exact)
+    for method, to in selectors:
+        _select(entries, getattr(entries.table(), method)(to))
+    entries.query(query)
+    return entries
 
+
+def iproute_list(argv):
+    utils.output(get_routes(argv))
     return libc.EXIT_SUCCESS
 
 
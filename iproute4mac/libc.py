@@ -1,21 +1,122 @@
 import ctypes
 import ctypes.util
+import functools
+import sys
 
 
-_LIBC = ctypes.CDLL(ctypes.util.find_library("c"))
-
 EXIT_FAILURE = 1
 EXIT_SUCCESS = 0
 EXIT_ERROR = 255
 
+_SYSCTL_RETRIES = 5
+
+
+@functools.cache
+def _libc():
+    """
+    The C library, loaded on first use (find_library() may run ldconfig)
+    """
+    return ctypes.CDLL(ctypes.util.find_library("c"))
+
 
 def sysctl(name):
+    lib = _libc()
+    if not hasattr(lib, "sysctlbyname"):
+        # not a BSD system (e.g. replaying captured output on Linux)
+        return None
     size = ctypes.c_uint(0)
-    _LIBC.sysctlbyname(name.encode(), None, ctypes.byref(size), None, 0)
+    lib.sysctlbyname(name.encode(), None, ctypes.byref(size), None, 0)
     buf = ctypes.create_string_buffer(size.value)
-    _LIBC.sysctlbyname(name.encode(), buf, ctypes.byref(size), None, 0)
+    lib.sysctlbyname(name.encode(), buf, ctypes.byref(size), None, 0)
     try:
         return buf.value.decode()
     except UnicodeError:
         # FIXME: catch struct output
         return int.from_bytes(buf.raw, "little")
+
+
+def sysctl_mib(*mib):
+    """
+    Raw sysctl(3) output of a numeric MIB (e.g. CTL_NET, PF_ROUTE, ...)
+    """
+    lib = _libc()
+    if not hasattr(lib, "sysctlbyname"):
+        return None
+    name = (ctypes.c_int * len(mib))(*mib)
+    size = ctypes.c_size_t(0)
+    # the output may grow between the size estimate and the actual read
+    for _ in range(_SYSCTL_RETRIES):
+        if lib.sysctl(name, len(mib), None, ctypes.byref(size), None, 0) != 0:
+            break
+        buf = ctypes.create_string_buffer(size.value)
+        if lib.sysctl(name, len(mib), buf, ctypes.byref(size), None, 0) == 0:
+            return buf.raw[: size.value]
+    raise OSError(f"sysctl({'.'.join(map(str, mib))}) failed")
+
+
+class _ifaddrs(ctypes.Structure):
+    pass
+
+
+# <ifaddrs.h> (same layout on Linux, where ifa_dstaddr is the ifa_ifu union)
+_ifaddrs._fields_ = [
+    ("ifa_next", ctypes.POINTER(_ifaddrs)),
+    ("ifa_name", ctypes.c_char_p),
+    ("ifa_flags", ctypes.c_uint),
+    ("ifa_addr", ctypes.c_void_p),
+    ("ifa_netmask", ctypes.c_void_p),
+    ("ifa_dstaddr", ctypes.c_void_p),
+    ("ifa_data", ctypes.c_void_p),
+]
+
+# sizeof(struct sockaddr_*) by family, where sockaddr has no sa_len (i.e. Linux)
+_SOCKADDR_SIZE = {2: 16, 10: 28, 17: 20}
+_SOCKADDR_MAXSIZE = 128
+
+# sizeof(struct if_data) head up to ifi_mtu (BSD)
+_IF_DATA_MTU_SIZE = 12
+
+
+def _sockaddr(ptr):
+    if not ptr:
+        return None
+    if sys.platform == "darwin":
+        # sa_len, possibly trimmed (e.g. netmasks)
+        size = ctypes.c_ubyte.from_address(ptr).value
+    else:
+        size = _SOCKADDR_SIZE.get(ctypes.c_ushort.from_address(ptr).value, 16)
+    return ctypes.string_at(ptr, min(size, _SOCKADDR_MAXSIZE))
+
+
+def getifaddrs():
+    """
+    Raw getifaddrs(3) entries: name, flags, and the addr, netmask, dstaddr
+    sockaddr bytes; data holds the head of the BSD struct if_data (if any)
+    """
+    lib = _libc()
+    if not hasattr(lib, "getifaddrs"):
+        return None
+    ifap = ctypes.POINTER(_ifaddrs)()
+    if lib.getifaddrs(ctypes.byref(ifap)) != 0:
+        raise OSError("getifaddrs() failed")
+    res = []
+    try:
+        ifa = ifap
+        while ifa:
+            entry = ifa.contents
+            res.append(
+                {
+                    "name": entry.ifa_name.decode(),
+                    "flags": entry.ifa_flags,
+                    "addr": _sockaddr(entry.ifa_addr),
+                    "netmask": _sockaddr(entry.ifa_netmask),
+                    "dstaddr": _sockaddr(entry.ifa_dstaddr),
+                    "data": ctypes.string_at(entry.ifa_data, _IF_DATA_MTU_SIZE)
+                    if entry.ifa_data and sys.platform == "darwin"
+                    else None,
+                }
+            )
+            ifa = entry.ifa_next
+    finally:
+        lib.freeifaddrs(ifap)
+    return res
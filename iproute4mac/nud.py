@@ -1,5 +1,6 @@
 import re
 
+import iproute4mac.profiler as profiler
 import iproute4mac.socket as socket
 import iproute4mac.utils as utils
 
@@ -157,8 +158,8 @@ class Nud:
         r"\s+(?P<exp_o>\S+)"
         r"\s+(?P<exp_i>\S+)"
         rf"\s+(?P<dev>{IFNAME})"
-        r"(?:\s+(?P<refs>\d+)?)?"
-        r"(?:\s+(?P<probes>\d+)?)?",
+        r"(?:[ \t]+(?P<refs>\d+)?)?"
+        r"(?:[ \t]+(?P<probes>\d+)?)?",
         re.MULTILINE,
     )
     _ndp = re.compile(
@@ -168,21 +169,59 @@ class Nud:
         r"\s+(?P<exp_o>\S+)"
         r"\s+(?P<exp_i>\S+)"
         r"\s+(?P<state>\w)"
-        r"(?:\s+(?P<flag>\w)?)?"
-        r"(?:\s+(?P<probes>\d+)?)?",
+        r"(?:[ \t]+(?P<flag>\w)?)?"
+        r"(?:[ \t]+(?P<probes>\d+)?)?",
         re.MULTILINE,
     )
 
-    def __init__(self):
+    def __init__(self, dev=None, host=None, family=None):
+        """
+        Input:
+        `dev` (optional) interface the entries are to be selected by (arp -i)
+        `host` (optional) address the entries are to be selected by (ndp <host>)
+        `family` (optional) address family the entries are to be selected by
+
+        The entries are still to be selected by them: only the commands run
+        (and the entries parsed) are fewer.
+        """
+        (arp, ndp), fatal = self.commands(dev=dev, host=host, family=family)
+        commands = [args for args in (arp, ndp) if args]
+        res = dict(zip(commands, utils.snapshots(*commands, fatal=fatal)))
+        arp, ndp = (res.get(args) for args in (arp, ndp))
+        arp, ndp = (text if isinstance(text, str) else "" for text in (arp, ndp))
+        key = [" ".join(utils.flat_tuple(args)) for args in commands]
+        self._nuds = utils.parsed("Nud", key, [arp, ndp], lambda: self._parse(arp, ndp))
+
+    @staticmethod
+    def commands(dev=None, host=None, family=None):
+        """
+        Commands read by Nud(dev, host, family)
+
+        Output:
+        ((arp argv, ndp argv), whether a failure is fatal): None for a command not run
+        """
+        arp = (_ARP, "-n", "-l", "-a", ("-i", dev) if dev else None)
+        ndp = (_NDP, "-n", "-l", "-a")
+        fatal = True
+        if host and host.version == 6 and host.is_host and not host.is_link:
+            ndp = (_NDP, "-n", "-l", repr(host))
+            # no entry of the host is no error
+            fatal = False
+        if family == socket._AF_INET6:
+            arp = None
+        elif family == socket._AF_INET:
+            ndp = None
+        return (arp, ndp), fatal
+
+    def _parse(self, arp, ndp):
         self._nuds = []
-        res = utils.shell(_ARP, "-n", "-l", "-a")
-        for nud in self._arp.finditer(res):
+        for nud in self._arp.finditer(arp):
             dst, lladdr, exp_o, exp_i, dev, refs, probes = nud.groups()
             self._nuds.append(_Nud(dst, lladdr, dev, exp_o, exp_i))
-        res = utils.shell(_NDP, "-n", "-l", "-a")
-        for nud in self._ndp.finditer(res):
+        for nud in self._ndp.finditer(ndp):
             dst, lladdr, dev, exp_o, exp_i, state, flag, probes = nud.groups()
             self._nuds.append(_Nud(dst, lladdr, dev, exp_o, exp_i, state, flag))
+        return self._nuds
 
     def __iter__(self):
         for nud in self._nuds:
@@ -205,6 +244,13 @@ class Nud:
             raise ValueError("argument is not list() of <class 'nud._Nud'>")
         self._nuds = nuds
 
+    def query(self, query):
+        """
+        Keep only the entries selected by `query` (see query.Query), in a single pass
+        """
+        with profiler.phase("filter"):
+            self._nuds = list(query.filter(self._nuds))
+
     def dict(self, details=None):
         """
         List nud dictiornaries
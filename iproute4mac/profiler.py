@@ -0,0 +1,180 @@
+import contextlib
+import cProfile
+import sys
+import threading
+import time
+
+
+# phases of a command, in summary order
+PHASES = ("shell", "parse", "link", "filter", "render", "write")
+
+_NOT_PROFILED = contextlib.nullcontext()
+
+# profile of the running command, None if not profiled
+_profile = None
+
+
+class Profile:
+    """
+    Wall and CPU time of every phase of a command
+
+    A phase entered by another one (e.g. parsing the items a filter reads) is
+    accounted to itself only: every thread keeps the stack of its phases, the
+    running one being paused while another one runs. Every command (see
+    utils.shell()) is also accounted by its argv.
+    """
+
+    __slots__ = ("_cpu", "_local", "_lock", "_wall", "commands", "phases")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # phase: [wall, cpu, calls]
+        self.phases = {phase: [0.0, 0.0, 0] for phase in PHASES}
+        # argv: [wall, cpu, calls], in the order they were run
+        self.commands = {}
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+
+    def _stack(self):
+        if (stack := getattr(self._local, "stack", None)) is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _account(self, entry, wall, cpu):
+        name, detail, start_wall, start_cpu = entry
+        with self._lock:
+            for measure in (self.phases[name], self.commands.get(detail)):
+                if measure is not None:
+                    measure[0] += wall - start_wall
+                    measure[1] += cpu - start_cpu
+
+    def enter(self, name, detail=None, count=True):
+        wall, cpu = time.perf_counter(), time.thread_time()
+        stack = self._stack()
+        if stack:
+            # the running phase is paused
+            self._account(stack[-1], wall, cpu)
+        if count:
+            with self._lock:
+                self.phases[name][2] += 1
+                if detail is not None:
+                    self.commands.setdefault(detail, [0.0, 0.0, 0])[2] += 1
+        stack.append([name, detail, wall, cpu])
+
+    def leave(self):
+        wall, cpu = time.perf_counter(), time.thread_time()
+        stack = self._stack()
+        self._account(stack.pop(), wall, cpu)
+        if stack:
+            # the paused phase resumes
+            stack[-1][2:] = [wall, cpu]
+
+    @contextlib.contextmanager
+    def phase(self, name, detail=None):
+        self.enter(name, detail)
+        try:
+            yield
+        finally:
+            self.leave()
+
+    def iterate(self, name, iterable, count=True):
+        """
+        Yield the items of `iterable`, accounting their production (not their use) to `name`
+        """
+        iterator = iter(iterable)
+        if count:
+            with self._lock:
+                self.phases[name][2] += 1
+        while True:
+            self.enter(name, count=False)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.leave()
+            yield item
+
+    def summary(self):
+        """
+        Summary of the phases and commands, as written to stderr
+        """
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        res = f"profile: {wall * 1000:.2f} ms wall, {cpu * 1000:.2f} ms cpu\n"
+        res += f"{'wall ms':>10} {'cpu ms':>10} {'calls':>6}  phase\n"
+        accounted = 0.0
+        for name, (phase_wall, phase_cpu, calls) in self.phases.items():
+            if not calls:
+                continue
+            if name == "shell":
+                # commands run concurrently (see utils.snapshots()) overlap
+                accounted += min(phase_wall, wall)
+            else:
+                accounted += phase_wall
+            res += _row(name, phase_wall, phase_cpu, calls)
+            if name == "shell":
+                for argv, (cmd_wall, cmd_cpu, cmd_calls) in self.commands.items():
+                    res += _row(f"  {argv}", cmd_wall, cmd_cpu, cmd_calls)
+        # imports, options and arguments parsing, and anything else
+        res += _row("other", max(wall - accounted, 0.0), None, None)
+        return res
+
+
+def _row(label, wall, cpu, calls):
+    cpu = f"{cpu * 1000:10.2f}" if cpu is not None else ""
+    calls = calls if calls is not None else ""
+    return f"{wall * 1000:10.2f} {cpu:>10} {calls:>6}  {label}\n"
+
+
+def active():
+    return _profile is not None
+
+
+def phase(name, detail=None):
+    """
+    Context manager accounting its block to phase `name` (and command `detail`),
+    doing nothing if the command is not profiled
+    """
+    if _profile is None:
+        return _NOT_PROFILED
+    return _profile.phase(name, detail)
+
+
+def iterate(name, iterable, count=True):
+    """
+    `iterable`, its items being accounted to phase `name` as they are produced
+    (e.g. by lazy filters) if the command is profiled; `count` whether as a new call
+    """
+    if _profile is None:
+        return iterable
+    return _profile.iterate(name, iterable, count=count)
+
+
+@contextlib.contextmanager
+def profiling(profile):
+    """
+    Profile the block, writing the summary to stderr on exit
+
+    Input:
+    `profile` False not to profile, True to profile, or the path of a cProfile
+    (pstats) dump of the calls of the block, besides
+    """
+    global _profile
+    if not profile:
+        yield
+        return
+    _profile = Profile()
+    profiler = cProfile.Profile() if isinstance(profile, str) else None
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+        res, _profile = _profile, None
+        sys.stderr.write(res.summary())
+        if profiler:
+            profiler.dump_stats(profile)
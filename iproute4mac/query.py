@@ -0,0 +1,89 @@
+class Query:
+    """
+    Selectors of items (e.g. ip address show up dev en0), compiled into a
+    single function evaluated in one pass over the items
+
+    Selectors the OS tools can apply themselves (e.g. ifconfig <dev>) are
+    also recorded as hints, for the data source to push them down: the
+    items are still selected as if it did not.
+    """
+
+    __slots__ = ("_steps", "_hints", "_display")
+
+    def __init__(self, display=True):
+        self._steps = []
+        self._hints = {}
+        self._display = display
+
+    def __bool__(self):
+        return bool(self._steps)
+
+    def where(self, predicate):
+        """
+        Keep only the items `predicate` returns True for
+        """
+        self._steps.append((True, predicate))
+        return self
+
+    def map(self, function):
+        """
+        Replace every item with function(item) (e.g. with some addresses dropped)
+        """
+        self._steps.append((False, function))
+        return self
+
+    def delete_keys(self, *keys):
+        """
+        Delete `keys` from every item, only if displayed (e.g. the "dev" of
+        ip route show dev DEV): selected items are complete otherwise (see api)
+        """
+        if not self._display:
+            return self
+
+        def delete(item):
+            for key in keys:
+                # not parsed just to be deleted (see ifconfig._IfconfigBase)
+                del item[key]
+            return item
+
+        return self.map(delete)
+
+    def hint(self, key, value):
+        """
+        Record a selector the data source may push down (e.g. "dev", "family")
+        """
+        self._hints[key] = value
+        return self
+
+    def hinted(self, key, default=None):
+        return self._hints.get(key, default)
+
+    def compile(self):
+        """
+        Single function of all the selectors, returning the (mapped) item,
+        or None if not selected
+        """
+        steps = tuple(self._steps)
+
+        def run(item):
+            for predicate, function in steps:
+                if predicate:
+                    if not function(item):
+                        return None
+                else:
+                    item = function(item)
+            return item
+
+        return run
+
+    def filter(self, items):
+        """
+        Yield the selected `items`, as they are iterated
+        """
+        if not self._steps:
+            yield from items
+            return
+        run = self.compile()
+        for item in items:
+            if (item := run(item)) is not None:
+                yield item
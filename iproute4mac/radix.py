@@ -0,0 +1,192 @@
+from iproute4mac.prefix import Prefix
+
+
+class _Node:
+    __slots__ = ("children", "values", "first")
+
+    def __init__(self):
+        self.children = [None, None]
+        self.values = []
+        # first value inserted in the subtree
+        self.first = None
+
+
+class RadixTrie:
+    """
+    Binary radix trie of integer prefixes, `bits` long (32 for IPv4, 128 for IPv6)
+
+    Every operation walks at most `prefixlen` nodes (but subnets(), walking the
+    whole subtree).
+    """
+
+    __slots__ = ("_root", "_bits")
+
+    def __init__(self, bits):
+        self._root = _Node()
+        self._bits = bits
+
+    def _path(self, network, prefixlen):
+        """
+        Yield the nodes from the root down to `network`/`prefixlen`, as long as they exist
+        """
+        node = self._root
+        yield node
+        for shift in range(self._bits - 1, self._bits - 1 - prefixlen, -1):
+            if not (node := node.children[(network >> shift) & 1]):
+                return
+            yield node
+
+    def insert(self, network, prefixlen, value):
+        node = self._root
+        if node.first is None:
+            node.first = value
+        for shift in range(self._bits - 1, self._bits - 1 - prefixlen, -1):
+            bit = (network >> shift) & 1
+            if not node.children[bit]:
+                node.children[bit] = _Node()
+            node = node.children[bit]
+            if node.first is None:
+                node.first = value
+        node.values.append(value)
+
+    def _find(self, network, prefixlen):
+        depth = -1
+        for depth, node in enumerate(self._path(network, prefixlen)):
+            pass
+        return node if depth == prefixlen else None
+
+    def exact(self, network, prefixlen):
+        """
+        Values of `network`/`prefixlen`
+        """
+        node = self._find(network, prefixlen)
+        return list(node.values) if node else []
+
+    def longest(self, address):
+        """
+        Values of the longest prefix containing `address` (longest prefix match)
+        """
+        res = []
+        for node in self._path(address, self._bits):
+            res = node.values or res
+        return list(res)
+
+    def supernets(self, network, prefixlen):
+        """
+        Values of the prefixes containing `network`/`prefixlen` (itself included)
+        """
+        return [value for node in self._path(network, prefixlen) for value in node.values]
+
+    def subnets(self, network, prefixlen):
+        """
+        Values of the prefixes within `network`/`prefixlen` (itself included)
+        """
+        res = []
+        nodes = [node] if (node := self._find(network, prefixlen)) else []
+        while nodes:
+            node = nodes.pop()
+            res.extend(node.values)
+            nodes.extend(child for child in node.children if child)
+        return res
+
+    def first(self, network, prefixlen):
+        """
+        First value inserted within `network`/`prefixlen`, None if none
+        """
+        node = self._find(network, prefixlen)
+        return node.first if node else None
+
+
+def prefix_key(prefix):
+    """
+    Input: Prefix
+    Output: (IP version, integer network, prefix length), None if of no IP version (e.g. "default")
+    """
+    if not prefix._initialized:
+        return None
+    if prefix._network:
+        return (prefix.version, int(prefix._network.network_address), prefix._network.prefixlen)
+    return (prefix.version, int(prefix._address), prefix._address.max_prefixlen)
+
+
+class PrefixTrie:
+    """
+    Values indexed by Prefix, with one RadixTrie per IP version
+
+    Prefixes of no IP version (e.g. "default", "any") are matched as Prefix
+    objects do, one by one.
+    """
+
+    __slots__ = ("_tries", "_items", "_unversioned")
+
+    def __init__(self, items=()):
+        """
+        Input: iterable of (Prefix or str, value)
+        """
+        self._tries = {4: RadixTrie(32), 6: RadixTrie(128)}
+        self._items = []
+        self._unversioned = []
+        for prefix, value in items:
+            self.insert(prefix, value)
+
+    def insert(self, prefix, value):
+        if not isinstance(prefix, Prefix):
+            prefix = Prefix(prefix)
+        self._items.append((prefix, value))
+        if key := prefix_key(prefix):
+            version, network, prefixlen = key
+            self._tries[version].insert(network, prefixlen, (prefix, value))
+        else:
+            self._unversioned.append((prefix, value))
+
+    def _query(self, prefix, method, match):
+        """
+        Values of trie `method`, and of the prefixes of no IP version `match`-ing
+        """
+        if not (key := prefix_key(prefix)):
+            return [value for other, value in self._items if match(prefix, other)]
+        version, network, prefixlen = key
+        res = [value for other, value in getattr(self._tries[version], method)(network, prefixlen)]
+        return res + [value for other, value in self._unversioned if match(prefix, other)]
+
+    def exact(self, prefix):
+        """
+        Values of the prefixes equal to `prefix` (e.g. ip route list exact PREFIX)
+        """
+        if not (key := prefix_key(prefix)):
+            return [value for other, value in self._items if prefix == other]
+        version, network, prefixlen = key
+        # the same network may have different addresses (e.g. 10.0.0.1/24 and 10.0.0.2/24)
+        items = self._tries[version].exact(network, prefixlen) + self._unversioned
+        return [value for other, value in items if prefix == other]
+
+    def supernets(self, prefix):
+        """
+        Values of the prefixes containing `prefix` (e.g. ip route list match PREFIX)
+        """
+        return self._query(prefix, "supernets", lambda prefix, other: prefix in other)
+
+    def subnets(self, prefix):
+        """
+        Values of the prefixes within `prefix` (e.g. ip route list root PREFIX)
+        """
+        return self._query(prefix, "subnets", lambda prefix, other: other in prefix)
+
+    def longest(self, address):
+        """
+        Values of the longest prefix containing the host `address`
+        """
+        if not (key := prefix_key(address)):
+            return []
+        version, network, prefixlen = key
+        return [value for other, value in self._tries[version].longest(network)]
+
+    def first(self, prefix):
+        """
+        First value inserted within `prefix`, None if none (e.g. the route preferred source)
+        """
+        if not (key := prefix_key(prefix)):
+            return next((value for other, value in self._items if other in prefix), None)
+        version, network, prefixlen = key
+        item = self._tries[version].first(network, prefixlen)
+        return item[1] if item else None
@@ -1,6 +1,9 @@
+import ipaddress
 import re
 
 import iproute4mac.ifconfig as ifconfig
+import iproute4mac.radix as radix
+import iproute4mac.rtsock as rtsock
 import iproute4mac.socket as socket
 import iproute4mac.utils as utils
 
@@ -37,6 +40,34 @@ _RTF_XRESOLVE = "X"  # External daemon translates proto to link address
 _RTF_PROXY = "Y"  # Proxying; cloned routes will not be scoped
 _RTF_GLOBAL = "g"  # Route to a destination of the global internet (policy hint)
 
+# route -n get flags, in bit order (see rtsock.py)
+_RTF_NAMES = (
+    (_RTF_UP, "UP"),
+    (_RTF_GATEWAY, "GATEWAY"),
+    (_RTF_HOST, "HOST"),
+    (_RTF_REJECT, "REJECT"),
+    (_RTF_DYNAMIC, "DYNAMIC"),
+    (_RTF_MODIFIED, "MODIFIED"),
+    (None, "DONE"),  # set on every RTM_GET reply
+    (_RTF_CLONING, "CLONING"),
+    (_RTF_XRESOLVE, "XRESOLVE"),
+    (_RTF_LLINFO, "LLINFO"),
+    (_RTF_STATIC, "STATIC"),
+    (_RTF_BLACKHOLE, "BLACKHOLE"),
+    (_RTF_PROTO2, "PROTO2"),
+    (_RTF_PROTO1, "PROTO1"),
+    (_RTF_PRCLONING, "PRCLONING"),
+    (_RTF_WASCLONED, "WASCLONED"),
+    (_RTF_PROTO3, "PROTO3"),
+    (_RTF_BROADCAST, "BROADCAST"),
+    (_RTF_MULTICAST, "MULTICAST"),
+    (_RTF_IFSCOPE, "IFSCOPE"),
+    (_RTF_IFREF, "IFREF"),
+    (_RTF_PROXY, "PROXY"),
+    (_RTF_ROUTER, "ROUTER"),
+    (_RTF_GLOBAL, "GLOBAL"),
+)
+
 _NETSTAT_DETAIL_FIELDS = ["expire"]
 
 _ROUTE_DUMP_MAGIC = 0x45311224
@@ -96,9 +127,13 @@ def is_rtn(name):
 
 
 class _Route(_Item):
+    __slots__ = ("_flags",)
     _OPTIONAL_FIELDS = {"expire": None, "type": "unicast", "scope": "global"}
 
     def __init__(self, dst, prefix, gateway, flags, dev, expire, src):
+        # netstat flags, for route get (see RouteGets)
+        self._flags = flags
+
         # address type
         if _RTF_BLACKHOLE in flags:
             addr_type = "blackhole"
@@ -178,6 +213,37 @@ class _Route(_Item):
         return res
 
 
+def from_entry(entry, inet=None, kernel=False):
+    """
+    Route of the netstat -n -r columns (dst, prefix, gateway, flags, dev, expire),
+    None for the routes not shown by iproute2 (e.g. cloned ones)
+
+    Input:
+    `entry` netstat -n -r columns
+    `inet` (optional) radix.PrefixTrie of the local addresses
+    `kernel` (optional) keep the routes not shown, as the kernel looks them up
+    """
+    dst, prefix, gateway, flags, dev, expire = entry
+    if _RTF_WASCLONED in flags and not kernel:
+        utils.debug(f"Skip cloned rotue: {entry}")
+        return None
+    if _RTF_PROXY in flags and not kernel:
+        utils.debug(f"Skip proxy rotue: {entry}")
+        return None
+    if dst == gateway:
+        if not kernel:
+            utils.debug(f"Skip self rotue: {entry}")
+            return None
+        # local address: reached through its interface
+        gateway = dev
+    dst = Prefix(f"{dst}/{prefix}", pack=True) if prefix is not None else Prefix(dst)
+    if inet is not None and not dst.is_default and not dst.is_host:
+        src = inet.first(dst)
+    else:
+        src = None
+    return _Route(dst, prefix, gateway, flags, dev, expire, src)
+
+
 class Routes(_Items):
     _route = re.compile(
         rf"^(?P<dst>(?:default|{IPV4ADDR}|{IPV6ADDR}))(?:%\w+)?(?:/(?P<prefix>\d+))?"
@@ -188,27 +254,106 @@ class Routes(_Items):
         flags=re.MULTILINE,
     )
 
-    def __init__(self):
-        res = utils.shell(_NETSTAT, "-n", "-r")
-        links = ifconfig.IpAddress()
+    def __init__(self, family=None, exact=None, links=None, kernel=False):
+        """
+        Input:
+        `family` (optional) address family the routes are to be selected by
+        `exact` (optional) destination prefix the routes are to be equal to
+        `links` (optional) ifconfig.NativeIpAddress() already read by the caller
+        `kernel` (optional) also the cloned, proxy and local address routes (see from_entry())
+
+        Where possible, only the routes of `family` (netstat -f), or to `exact`
+        (route -n get) are read: the routes are still to be selected by them.
+        """
+        # only addresses are needed: no ifconfig dump
+        if links is None:
+            links = ifconfig.NativeIpAddress()
         inet = [address["local"] for item in links for address in item["addr_info"]]
-        for route in self._route.finditer(res):
-            dst, prefix, gateway, flags, dev, expire = route.groups()
-            if _RTF_WASCLONED in flags:
-                utils.debug(f"Skip cloned rotue: {route.group()}")
-                continue
-            if _RTF_PROXY in flags:
-                utils.debug(f"Skip proxy rotue: {route.group()}")
-                continue
-            if dst == gateway:
-                utils.debug(f"Skip self rotue: {route.group()}")
-                continue
-            dst = Prefix(f"{dst}/{prefix}", pack=True) if prefix is not None else Prefix(dst)
-            if not dst.is_default and not dst.is_host:
-                src = next((a for a in inet if a in dst), None)
-            else:
-                src = None
-            self.append(_Route(dst, prefix, gateway, flags, dev, expire, src))
+        if exact is not None and (entry := self._get(exact)):
+            self._data = self._parse([entry], inet, kernel)
+            return
+        kind = "KernelRoutes" if kernel else "Routes"
+        version = {socket._AF_INET: 4, socket._AF_INET6: 6}.get(family)
+        if (res := utils.route_dump()) is not None:
+            names = {int(item["ifindex"]): item.name for item in links}
+            self._data = utils.parsed(
+                kind,
+                ["route_dump()", f"IPv{version}"],
+                [res, *inet],
+                lambda: self._parse(rtsock.routes(res, names, version=version), inet, kernel),
+            )
+            return
+        args = self.netstat(family)
+        res = utils.snapshot(args)
+        self._data = utils.parsed(
+            kind,
+            args,
+            [res, *inet],
+            lambda: self._parse(
+                (route.groups() for route in self._route.finditer(res)), inet, kernel
+            ),
+        )
+
+    @staticmethod
+    def netstat(family=None):
+        """
+        netstat argv of the routes of `family`, without a routing table dump
+        """
+        if family in (socket._AF_INET, socket._AF_INET6):
+            return (_NETSTAT, "-n", "-r", "-f", socket.family_name(family))
+        return (_NETSTAT, "-n", "-r")
+
+    @staticmethod
+    def _get(exact):
+        """
+        netstat -n -r columns of the route to network `exact` (see route.Routes._route),
+        False if not to be told by route -n get
+        """
+        if not exact._initialized or exact.is_host or exact.is_default or exact.is_link:
+            return False
+        # not in table: no errors, the whole table tells
+        with utils.options_overridden(verbose=-1):
+            res = utils.snapshot(
+                _ROUTE,
+                "-n",
+                "get",
+                "-inet" if exact.version == 4 else "-inet6",
+                "-net",
+                exact.prefix,
+                fatal=False,
+            )
+        if not isinstance(res, str) or not (route := _RouteGet._route_get.search(res)):
+            return False
+        dst, mask, gateway, dev, flags, expire = route.group(
+            "dst", "mask", "gateway", "dev", "flags", "expire"
+        )
+        prefix = None
+        if dst != "default" and mask:
+            prefix = str(bin(int(ipaddress.ip_address(mask))).count("1"))
+        names = flags.split(",")
+        flags = "".join(flag for flag, name in _RTF_NAMES if flag and name in names)
+        # the gateway of direct routes is not shown, but the interface is
+        return (dst, prefix, gateway or dev, flags, dev, expire if expire != "0" else None)
+
+    def _parse(self, entries, inet, kernel=False):
+        """
+        Yield the routes of `entries`, as they are parsed
+
+        Input:
+        `entries` iterable of netstat -n -r columns (dst, prefix, gateway, flags, dev, expire)
+        `inet` list of local addresses
+        `kernel` (optional) see from_entry()
+        """
+        inet = radix.PrefixTrie((address, address) for address in inet)
+        for entry in entries:
+            if route := from_entry(entry, inet, kernel=kernel):
+                yield route
+
+    def table(self):
+        """
+        Routes indexed by destination (see radix.PrefixTrie)
+        """
+        return radix.PrefixTrie((item["dst"], item) for item in self.data)
 
 
 class _RouteGet:
@@ -218,7 +363,7 @@ class _RouteGet:
         rf"\s+route to: (?P<to>default|{IPV4ADDR}|{IPV6ADDR})\n"
         rf"destination: (?P<dst>default|{IPV4ADDR}|{IPV6ADDR})\n"
         rf"(?:\s+mask: (?P<mask>default|{IPV4ADDR}|{IPV6ADDR})\n)?"
-        rf"(?:\s+gateway: (?P<gateway>default|{IPV4ADDR}|{IPV6ADDR})\n)?"
+        rf"(?:\s+gateway: (?P<gateway>default|{IPV4ADDR}|{IPV6ADDR})(?:%\w+)?\n)?"
         rf"\s+interface: (?P<dev>{IFNAME})\n"
         r"\s+flags: <(?P<flags>.*)>\n"
         r"\s+recvpipe\s+sendpipe\s+ssthresh\s+rtt,msec\s+rttvar\s+hopcount\s+mtu\s+expire\n"
@@ -265,17 +410,14 @@ class _RouteGet:
         if gateway:
             self._route["gateway"] = Prefix(gateway)
         self._route["dev"] = dev
-        try:
-            self._route["prefsrc"] = socket.get_prefsrc(self._route["dst"])
-        except Exception:
-            pass
+        self._route["prefsrc"] = utils.get_prefsrc(self._route["dst"])
         self._route["flags"] = flags.split(",") if flags != "" else []
         if uid is not None:
             self._route["uid"] = uid
         self._route["metrics"] = [{"mtu": mtu}]
         self._route["cache"] = []
         if expire:
-            route["cache"].append({"expire": expire})
+            self._route["cache"].append({"expire": expire})
 
     def dict(self, details=True):
         """
@@ -315,8 +457,9 @@ class _RouteGet:
         res += "\n"
 
         res += "    cache"
-        for key, value in route["cache"]:
-            res += f" {key} {value}"
+        for cache in route["cache"]:
+            for key, value in cache.items():
+                res += f" {key} {value}"
         res += "\n"
 
         return res
@@ -326,7 +469,7 @@ class RouteGet:
     __slots__ = "_route"
 
     def __init__(self, host, uid=None):
-        res = utils.shell(
+        res = utils.snapshot(
             _ROUTE, "-n", "get", "-inet" if host.version == 4 else "-inet6", repr(host)
         )
         self._route = _RouteGet(res, uid=uid)
@@ -336,3 +479,100 @@ class RouteGet:
 
     def str(self, details=True):
         return self._route.str(details=details)
+
+
+class _LocalRouteGet(_RouteGet):
+    """
+    Route to a host, as route -n get would report it, from a routing table entry
+    """
+
+    def __init__(self, host, route, prefsrc=None, mtu=None, uid=None):
+        self._route = {}
+        if route["type"] != "unicast":
+            self._route["type"] = route["type"]
+        self._route["dst"] = host
+        if route["gateway"]:
+            self._route["gateway"] = route["gateway"]
+        self._route["dev"] = route["dev"]
+        if prefsrc:
+            self._route["prefsrc"] = prefsrc
+        self._route["flags"] = [
+            name for flag, name in _RTF_NAMES if flag is None or flag in route._flags
+        ]
+        if uid is not None:
+            self._route["uid"] = uid
+        if mtu is not None:
+            self._route["metrics"] = [{"mtu": mtu}]
+        self._route["cache"] = []
+        if route["expire"]:
+            self._route["cache"].append({"expire": route["expire"]})
+
+
+class RouteGets(_Items):
+    """
+    Routes to many hosts, looked up in a single routing table snapshot
+
+    The table includes the cloned and local address routes, as route -n get
+    looks them up (see Routes(kernel=True)). Interface scoped routes
+    (RTF_IFSCOPE) are only used for link-local hosts, for the primary
+    interface (that of the unscoped default route), or if the egress
+    interface `dev` is given.
+
+    The preferred source address is that of the route, if any, else the one
+    selected by the kernel (through `dev`, see utils.get_prefsrc()), once per
+    (family, interface) rather than connecting a UDP socket to every host.
+
+    The hosts with no route are left out, and listed in `unreachable`.
+    """
+
+    def __init__(self, hosts, dev=None, uid=None):
+        self.unreachable = []
+        self._data = self._lookup(hosts, dev, uid)
+
+    def _lookup(self, hosts, dev, uid):
+        """
+        Yield the route to every host of `hosts`, as soon as it is looked up
+        """
+        links = ifconfig.NativeIpAddress()
+        routes = Routes(links=links, kernel=True)
+        if dev is not None:
+            table = unscoped = radix.PrefixTrie(
+                (item["dst"], item) for item in routes.data if item["dev"] == dev
+            )
+        else:
+            table = routes.table()
+            primary = {
+                item["dst"].version: item["dev"]
+                for item in reversed(routes.data)
+                if item["dst"].is_default and _RTF_IFSCOPE not in item._flags
+            }
+            unscoped = radix.PrefixTrie(
+                (item["dst"], item)
+                for item in routes.data
+                if _RTF_IFSCOPE not in item._flags
+                or item["dev"] == primary.get(item["dst"].version)
+            )
+        links = {item.name: item for item in links}
+        prefsrc = {}
+        for host in hosts:
+            routes = (table if host.is_link else unscoped).longest(host)
+            if not routes:
+                utils.stderr(f"RTNETLINK answers: Network is unreachable ({repr(host)})")
+                self.unreachable.append(host)
+                continue
+            route = routes[0]
+            link = links.get(route["dev"])
+            if route["prefsrc"]:
+                src = repr(route["prefsrc"])
+            else:
+                key = (host.family, route["dev"])
+                if key not in prefsrc:
+                    prefsrc[key] = utils.get_prefsrc(host, dev=dev)
+                src = prefsrc[key]
+            yield _LocalRouteGet(
+                host,
+                route,
+                prefsrc=src,
+                mtu=int(link["mtu"]) if link else None,
+                uid=uid,
+            )
@@ -0,0 +1,484 @@
+import errno
+import ipaddress
+import itertools
+import os
+import socket
+import struct
+import sys
+import time
+
+import iproute4mac.libc as libc
+
+
+# https://opensource.apple.com/source/xnu/xnu-7195.81.3/bsd/net/route.h.auto.html
+
+# <sys/socket.h>
+_AF_UNSPEC = 0
+_AF_INET = 2
+_AF_LINK = 18
+_AF_INET6 = 30
+_PF_ROUTE = 17
+
+# <sys/sysctl.h>
+_CTL_NET = 4
+_NET_RT_DUMP = 1
+
+_RTM_VERSION = 5
+
+# message types
+RTM_ADD = 0x1
+RTM_DELETE = 0x2
+RTM_CHANGE = 0x3
+RTM_GET = 0x4
+RTM_LOSING = 0x5
+RTM_REDIRECT = 0x6
+RTM_MISS = 0x7
+RTM_LOCK = 0x8
+RTM_RESOLVE = 0xB
+RTM_NEWADDR = 0xC
+RTM_DELADDR = 0xD
+RTM_IFINFO = 0xE
+RTM_NEWMADDR = 0xF
+RTM_DELMADDR = 0x10
+
+# route flags, as printed by netstat (see route.py)
+RTF_UP = 0x1
+RTF_GATEWAY = 0x2
+RTF_HOST = 0x4
+RTF_REJECT = 0x8
+RTF_DYNAMIC = 0x10
+RTF_MODIFIED = 0x20
+RTF_DONE = 0x40
+RTF_CLONING = 0x100
+RTF_XRESOLVE = 0x200
+RTF_LLINFO = 0x400
+RTF_STATIC = 0x800
+RTF_BLACKHOLE = 0x1000
+RTF_PROTO2 = 0x4000
+RTF_PROTO1 = 0x8000
+RTF_PRCLONING = 0x10000
+RTF_WASCLONED = 0x20000
+RTF_PROTO3 = 0x40000
+RTF_BROADCAST = 0x400000
+RTF_MULTICAST = 0x800000
+RTF_IFSCOPE = 0x1000000
+RTF_IFREF = 0x4000000
+RTF_PROXY = 0x8000000
+RTF_ROUTER = 0x10000000
+RTF_GLOBAL = 0x40000000
+
+_RTF_NETSTAT = (
+    (RTF_UP, "U"),
+    (RTF_GATEWAY, "G"),
+    (RTF_HOST, "H"),
+    (RTF_REJECT, "R"),
+    (RTF_DYNAMIC, "D"),
+    (RTF_MODIFIED, "M"),
+    (RTF_MULTICAST, "m"),
+    (RTF_BROADCAST, "b"),
+    (RTF_DONE, "d"),
+    (RTF_CLONING, "C"),
+    (RTF_XRESOLVE, "X"),
+    (RTF_LLINFO, "L"),
+    (RTF_STATIC, "S"),
+    (RTF_PROTO1, "1"),
+    (RTF_PROTO2, "2"),
+    (RTF_WASCLONED, "W"),
+    (RTF_PRCLONING, "c"),
+    (RTF_PROTO3, "3"),
+    (RTF_BLACKHOLE, "B"),
+    (RTF_IFSCOPE, "I"),
+    (RTF_IFREF, "i"),
+    (RTF_PROXY, "Y"),
+    (RTF_ROUTER, "r"),
+    (RTF_GLOBAL, "g"),
+)
+
+# sockaddrs present in a message, in this order
+RTA_DST = 0x1
+RTA_GATEWAY = 0x2
+RTA_NETMASK = 0x4
+RTA_GENMASK = 0x8
+RTA_IFP = 0x10
+RTA_IFA = 0x20
+RTA_AUTHOR = 0x40
+RTA_BRD = 0x80
+_RTAX_MAX = 8
+
+# metrics initialized (rtm_inits) or locked (rmx_locks) by a message
+RTV_MTU = 0x1
+RTV_HOPCOUNT = 0x2
+RTV_EXPIRE = 0x4
+RTV_RPIPE = 0x8
+RTV_SPIPE = 0x10
+RTV_SSTHRESH = 0x20
+RTV_RTT = 0x40
+RTV_RTTVAR = 0x80
+
+_RTV = {
+    "mtu": RTV_MTU,
+    "hopcount": RTV_HOPCOUNT,
+    "expire": RTV_EXPIRE,
+    "recvpipe": RTV_RPIPE,
+    "sendpipe": RTV_SPIPE,
+    "ssthresh": RTV_SSTHRESH,
+    "rtt": RTV_RTT,
+    "rttvar": RTV_RTTVAR,
+}
+
+# struct rt_msghdr, struct rt_metrics
+_RT_MSGHDR = struct.Struct("=HBBH2xiiiiiiI")
+_RT_METRICS = struct.Struct("=IIIiIIIIIII12x")
+_RT_METRICS_FIELDS = (
+    "locks",
+    "mtu",
+    "hopcount",
+    "expire",
+    "recvpipe",
+    "sendpipe",
+    "ssthresh",
+    "rtt",
+    "rttvar",
+    "pksent",
+    "state",
+)
+RT_MSGHDR_SIZE = _RT_MSGHDR.size + _RT_METRICS.size
+
+# struct ifa_msghdr (RTM_NEWADDR, RTM_DELADDR)
+_IFA_MSGHDR = struct.Struct("=HBBiiH2xi")
+# struct if_msghdr (RTM_IFINFO) head, followed by struct if_data
+_IF_MSGHDR = struct.Struct("=HBBiiH2x")
+# struct if_data head up to ifi_mtu
+_IF_DATA_MTU = struct.Struct("=8xI")
+
+# struct sockaddr_dl head: sdl_len, sdl_family, sdl_index, sdl_type, sdl_nlen, sdl_alen, sdl_slen
+_SOCKADDR_DL = struct.Struct("=BBHBBBB")
+_SOCKADDR_DL_SIZE = 20
+_SOCKADDR_IN = struct.Struct("=BBH4s8x")
+_SOCKADDR_IN6 = struct.Struct("=BBHI16sI")
+
+# sequence numbers of the messages written by this process
+_SEQ = itertools.count(1)
+# seconds to wait for the kernel reply to a request
+_TIMEOUT = 5
+
+
+def _roundup(size):
+    # ROUNDUP() of sockaddrs in routing messages (sizeof(uint32_t))
+    return (size + 3) & ~3 if size else 4
+
+
+def _inet6(addr):
+    addr = bytearray(addr)
+    if addr[0] == 0xFE and addr[1] & 0xC0 == 0x80 or addr[0] == 0xFF and addr[1] & 0x0F <= 2:
+        # clear the KAME embedded scope id
+        addr[2:4] = b"\0\0"
+    return socket.inet_ntop(socket.AF_INET6, bytes(addr))
+
+
+def sockaddr_family(sa):
+    return sa[1] if len(sa) > 1 else _AF_UNSPEC
+
+
+def sockaddr_str(sa):
+    """
+    Printable sockaddr (address, link-layer address, interface name or "link#<index>")
+    """
+    family = sockaddr_family(sa)
+    if family == _AF_INET:
+        return socket.inet_ntop(socket.AF_INET, bytes(sa[4:8]).ljust(4, b"\0"))
+    if family == _AF_INET6:
+        return _inet6(bytes(sa[8:24]).ljust(16, b"\0"))
+    if family == _AF_LINK:
+        _, _, index, _, nlen, alen, _ = _SOCKADDR_DL.unpack_from(sa)
+        if alen == 6:
+            return ":".join(f"{byte:02x}" for byte in sa[8 + nlen : 8 + nlen + alen])
+        if nlen:
+            return bytes(sa[8 : 8 + nlen]).decode()
+        return f"link#{index}"
+    return None
+
+
+def netmask_prefixlen(sa, family):
+    """
+    Prefix length of a (possibly trimmed, and family-less) netmask sockaddr
+    """
+    start = 8 if family == _AF_INET6 else 4
+    return sum(bin(byte).count("1") for byte in sa[start:])
+
+
+def messages(buf):
+    """
+    Decode routing messages without copying them: yield a dictionary of the
+    rt_msghdr fields, "rmx" metrics, and "sockaddrs" (RTA_* -> memoryview)
+
+    RTM_NEWADDR and RTM_DELADDR messages have the ifa_msghdr "index",
+    "flags", "addrs", "metric" and "sockaddrs" fields, RTM_IFINFO ones the
+    if_msghdr "index", "flags" and "mtu" fields: any other message only has
+    the common "msglen", "version" and "type" fields.
+    """
+    view = memoryview(buf)
+    offset = 0
+    while offset + 4 <= len(view):
+        msglen, version, rtm_type = struct.unpack_from("=HBB", view, offset)
+        if msglen < 4 or offset + msglen > len(view):
+            raise ValueError(f"truncated routing message at offset {offset}")
+        msg = view[offset : offset + msglen]
+        offset += msglen
+        head = {"msglen": msglen, "version": version, "type": rtm_type}
+        if version != _RTM_VERSION:
+            yield {**head, "data": msg}
+        elif rtm_type in (RTM_NEWADDR, RTM_DELADDR) and msglen >= _IFA_MSGHDR.size:
+            _, _, _, addrs, flags, index, metric = _IFA_MSGHDR.unpack_from(msg)
+            yield {
+                **head,
+                "index": index,
+                "flags": flags,
+                "addrs": addrs,
+                "metric": metric,
+                "sockaddrs": _sockaddrs(msg, _IFA_MSGHDR.size, addrs),
+            }
+        elif rtm_type == RTM_IFINFO and msglen >= _IF_MSGHDR.size + _IF_DATA_MTU.size:
+            _, _, _, _, flags, index = _IF_MSGHDR.unpack_from(msg)
+            (mtu,) = _IF_DATA_MTU.unpack_from(msg, _IF_MSGHDR.size)
+            yield {**head, "index": index, "flags": flags, "mtu": mtu}
+        elif rtm_type > RTM_RESOLVE or msglen < RT_MSGHDR_SIZE:
+            yield {**head, "data": msg}
+        else:
+            yield _rt_msghdr(head, msg)
+
+
+def _rt_msghdr(head, msg):
+    _, _, _, index, flags, addrs, pid, seq, errno, use, inits = _RT_MSGHDR.unpack_from(msg)
+    rmx = dict(zip(_RT_METRICS_FIELDS, _RT_METRICS.unpack_from(msg, _RT_MSGHDR.size)))
+    return {
+        **head,
+        "index": index,
+        "flags": flags,
+        "addrs": addrs,
+        "pid": pid,
+        "seq": seq,
+        "errno": errno,
+        "use": use,
+        "inits": inits,
+        "rmx": rmx,
+        "sockaddrs": _sockaddrs(msg, RT_MSGHDR_SIZE, addrs),
+    }
+
+
+def complete(buf):
+    """
+    Length of the complete routing messages at the start of `buf` (a stream may split them)
+    """
+    end = 0
+    while end + 4 <= len(buf):
+        (msglen,) = struct.unpack_from("=H", buf, end)
+        if msglen < 4:
+            raise ValueError(f"invalid routing message at offset {end}")
+        if end + msglen > len(buf):
+            break
+        end += msglen
+    return end
+
+
+def stream(sock, bufsize=65536):
+    """
+    Decode the routing messages read from `sock` as they come (see messages()),
+    until the socket is closed
+    """
+    buf = b""
+    while data := sock.recv(bufsize):
+        buf += data
+        end = complete(buf)
+        yield from messages(buf[:end])
+        buf = buf[end:]
+
+
+def _sockaddrs(msg, offset, addrs):
+    res = {}
+    for bit in range(_RTAX_MAX):
+        if not addrs & (1 << bit):
+            continue
+        if offset >= len(msg):
+            break
+        size = msg[offset]
+        res[1 << bit] = msg[offset : offset + size]
+        offset += _roundup(size)
+    return res
+
+
+def netstat_flags(flags):
+    return "".join(letter for bit, letter in _RTF_NETSTAT if flags & bit)
+
+
+def routes(buf, names, now=None, version=None):
+    """
+    Decode a NET_RT_DUMP buffer into the netstat -n -r columns:
+    (dst, prefix, gateway, flags, dev, expire), like route.Routes._route
+
+    Input:
+    `buf` sysctl(NET_RT_DUMP) output
+    `names` dictionary of interface names by index
+    `now` time the expire metric is relative to (default: time.time())
+    `version` (optional) IP version of the routes, the others are not decoded at all
+    """
+    now = time.time() if now is None else now
+    family = {4: _AF_INET, 6: _AF_INET6}.get(version)
+    for msg in messages(buf):
+        if msg["type"] != RTM_GET:
+            continue
+        if family and sockaddr_family(msg.get("sockaddrs", {}).get(RTA_DST, b"")) != family:
+            continue
+        if entry := route(msg, names, now):
+            yield entry
+
+
+def route(msg, names, now=None):
+    """
+    Decode a route message (see messages()) into the netstat -n -r columns,
+    None if it is not an inet/inet6 route
+    """
+    sockaddrs = msg.get("sockaddrs", {})
+    if "rmx" not in msg or RTA_DST not in sockaddrs:
+        return None
+    family = sockaddr_family(sockaddrs[RTA_DST])
+    if family not in (_AF_INET, _AF_INET6):
+        return None
+    dst = sockaddr_str(sockaddrs[RTA_DST])
+    prefix = None
+    if not msg["flags"] & RTF_HOST:
+        prefix = netmask_prefixlen(sockaddrs.get(RTA_NETMASK, b""), family)
+        if prefix == 0:
+            dst = "default"
+            prefix = None
+        else:
+            prefix = str(prefix)
+    gateway = sockaddr_str(sockaddrs[RTA_GATEWAY]) if RTA_GATEWAY in sockaddrs else None
+    expire = msg["rmx"]["expire"]
+    now = time.time() if now is None else now
+    return (
+        dst,
+        prefix,
+        gateway,
+        netstat_flags(msg["flags"]),
+        names.get(msg["index"], f"link#{msg['index']}"),
+        str(max(int(expire - now), 0)) if expire else None,
+    )
+
+
+def dump(family=_AF_UNSPEC):
+    """
+    Routing table as sysctl(NET_RT_DUMP) output
+    """
+    return libc.sysctl_mib(_CTL_NET, _PF_ROUTE, 0, family, _NET_RT_DUMP, 0)
+
+
+def sockaddr_inet(address, index=0):
+    """
+    Encode an IPv4 or IPv6 address (ipaddress object) as sockaddr_in or sockaddr_in6
+
+    The interface `index` of link-local IPv6 addresses is embedded KAME-style.
+    """
+    packed = address.packed
+    if address.version == 4:
+        return _SOCKADDR_IN.pack(_SOCKADDR_IN.size, _AF_INET, 0, packed)
+    if index and (address.is_link_local or address.is_multicast and packed[1] & 0x0F <= 2):
+        packed = packed[:2] + index.to_bytes(2, "big") + packed[4:]
+    return _SOCKADDR_IN6.pack(_SOCKADDR_IN6.size, _AF_INET6, 0, 0, packed, 0)
+
+
+def sockaddr_netmask(prefixlen, version):
+    """
+    Encode the netmask of a `prefixlen` long IPv4 or IPv6 prefix
+    """
+    if version == 4:
+        return sockaddr_inet(ipaddress.IPv4Network(f"0.0.0.0/{prefixlen}").netmask)
+    return sockaddr_inet(ipaddress.IPv6Network(f"::/{prefixlen}").netmask)
+
+
+def sockaddr_dl(index, name=""):
+    """
+    Encode an interface as sockaddr_dl (without link-layer address)
+    """
+    name = name.encode()
+    size = max(_SOCKADDR_DL.size + len(name), _SOCKADDR_DL_SIZE)
+    head = _SOCKADDR_DL.pack(size, _AF_LINK, index, 0, len(name), 0, 0)
+    return (head + name).ljust(size, b"\0")
+
+
+def message(rtm_type, sockaddrs, index=0, flags=0, metrics=None, locks=(), seq=None):
+    """
+    Encode a routing message (e.g. RTM_ADD)
+
+    Input:
+    `rtm_type` message type
+    `sockaddrs` dictionary of encoded sockaddrs by RTA_* bit
+    `index` interface index (RTF_IFSCOPE routes)
+    `flags` RTF_* flags
+    `metrics` dictionary of metrics by rt_metrics field name (e.g. "mtu")
+    `locks` metrics not to be modified by the kernel
+    `seq` sequence number (default: next of this process)
+    """
+    metrics = metrics or {}
+    inits = 0
+    for name in metrics:
+        inits |= _RTV[name]
+    rmx = dict.fromkeys(_RT_METRICS_FIELDS, 0)
+    rmx.update(metrics)
+    rmx["locks"] = 0
+    for name in locks:
+        rmx["locks"] |= _RTV[name]
+    addrs = 0
+    body = b""
+    for bit in range(_RTAX_MAX):
+        if (sa := sockaddrs.get(1 << bit)) is None:
+            continue
+        addrs |= 1 << bit
+        body += sa.ljust(_roundup(len(sa)), b"\0")
+    header = _RT_MSGHDR.pack(
+        RT_MSGHDR_SIZE + len(body),
+        _RTM_VERSION,
+        rtm_type,
+        index,
+        flags,
+        addrs,
+        os.getpid(),
+        next(_SEQ) if seq is None else seq,
+        0,
+        0,
+        inits,
+    )
+    return header + _RT_METRICS.pack(*(rmx[name] for name in _RT_METRICS_FIELDS)) + body
+
+
+def request(sock, msg):
+    """
+    Write a routing message to `sock`, and wait for the kernel reply
+
+    Output:
+    the errno of the request (0 on success)
+    """
+    _, _, _, _, _, _, pid, seq, _, _, _ = _RT_MSGHDR.unpack_from(msg)
+    sock.settimeout(_TIMEOUT)
+    try:
+        sock.send(msg)
+        while True:
+            if not (data := sock.recv(65536)):
+                raise ConnectionResetError(errno.ECONNRESET, "routing socket closed")
+            # every routing socket gets every message: wait for the reply to this one
+            for reply in messages(data):
+                if reply.get("seq") == seq and reply.get("pid") == pid:
+                    return reply["errno"]
+    except TimeoutError:
+        return errno.ETIMEDOUT
+    except OSError as e:
+        return e.errno
+
+
+def routing_socket():
+    """
+    Routing socket to write messages with (None on systems without PF_ROUTE)
+    """
+    if sys.platform != "darwin":
+        return None
+    return socket.socket(_PF_ROUTE, socket.SOCK_RAW, _AF_UNSPEC)
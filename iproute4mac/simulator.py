@@ -0,0 +1,1353 @@
+#!/usr/bin/env python3
+
+"""
+Simulated macOS network, and the commands reading and changing it
+
+A Network holds the interfaces (as parsed from ifconfig, see
+ifconfig._Ifconfig), routes, ARP/NDP entries, bridge forwarding entries and
+sysctl values of a Mac, and runs ifconfig, netstat, route, arp, ndp and
+sysctl on them, printing what macOS would print.
+
+    IPROUTE4MAC_SIMULATE=network.json ip link add link en0 type vlan id 100
+
+runs the commands of ip and bridge on the network saved in network.json,
+created on first use (see backend.SimulatedBackend). Other programs (e.g.
+the tests needing root on a Mac) run the same commands through drop-in
+shims:
+
+    python -m iproute4mac.simulator -state network.json exec pytest tests/test_020_ip_vlan.py
+"""
+
+import contextlib
+import fcntl
+import ipaddress
+import json
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+
+import iproute4mac.backend as backend
+import iproute4mac.ifaddrs as ifaddrs
+import iproute4mac.ifconfig as ifconfig
+import iproute4mac.libc as libc
+import iproute4mac.route as route
+
+
+STATE_VERSION = 1
+
+# the commands run on the network, and the ones of this package using them
+TOOLS = ("ifconfig", "netstat", "route", "arp", "ndp", "sysctl")
+_CLI = {"ip": "iproute4mac.cmd.ip", "bridge": "iproute4mac.cmd.bridge"}
+
+# interfaces created (and destroyed) by ifconfig
+_CLONERS = ("bond", "bridge", "feth", "vlan")
+
+_SYSCTL = {
+    "net.link.generic.system.sndq_maxlen": 128,
+    "net.inet.ip.forwarding": 0,
+    "net.inet6.ip6.forwarding": 0,
+}
+
+# seconds a dynamic neighbour entry lasts
+_ARP_EXPIRE = 1200
+_NDP_EXPIRE = 86400
+
+_ROUTE_GET_METRICS = (
+    " recvpipe  sendpipe  ssthresh  rtt,msec    rttvar  hopcount      mtu     expire"
+)
+
+
+class CommandError(Exception):
+    """
+    Failure of a simulated command, with its exit code and output
+    """
+
+    def __init__(self, message, returncode=libc.EXIT_FAILURE, stdout=""):
+        super().__init__(message)
+        self.returncode = returncode
+        self.stdout = stdout
+
+
+def _flags(names):
+    """
+    ifconfig flags (flag, flags) of the flag `names`, in the order of <net/if.h>
+    """
+    bits = [bit for bit, name in enumerate(ifaddrs._IFF_DARWIN) if name in names]
+    return f"{sum(1 << bit for bit in bits):x}", [ifaddrs._IFF_DARWIN[bit] for bit in bits]
+
+
+def _flagged(flag, *names):
+    return {"flag": flag, "flags": list(names)}
+
+
+def _mac(prefix, index):
+    return f"{prefix}:{index >> 16 & 0xFF:02x}:{index >> 8 & 0xFF:02x}:{index & 0xFF:02x}"
+
+
+def _address(family, address, **fields):
+    """
+    Address of an ifconfig inet/inet6 line (see ifaddrs._ADDRESS_FIELDS)
+    """
+    return {
+        **dict.fromkeys(ifaddrs._ADDRESS_FIELDS),
+        "family": family,
+        "address": address,
+        **fields,
+    }
+
+
+def _interface(name, index, kind, flags, mtu=1500, ether=None):
+    """
+    Interface just created (or attached), as parsed from ifconfig -L -m -v
+    """
+    flag, flags = _flags(flags)
+    res = {
+        "interface": name,
+        "flag": flag,
+        "flags": flags,
+        "mtu": str(mtu),
+        "index": str(index),
+        "ether": ether,
+        "address": [],
+    }
+    if kind == "loopback":
+        res.update(
+            {
+                "eflags": _flagged("12000000", "ECN_DISABLE", "SENDLIST"),
+                "xflags": _flagged("4", "NOAUTONX"),
+                "options": _flagged("1203", "RXCSUM", "TXCSUM", "TXSTATUS", "SW_TIMESTAMP"),
+                "nd6_options": _flagged("201", "PERFORMNUD", "DAD"),
+            }
+        )
+        return res
+    if kind == "ethernet":
+        res.update(
+            {
+                "eflags": _flagged("1000080", "TXSTART", "NOACKPRI"),
+                "xflags": _flagged("4", "NOAUTONX"),
+                "options": _flagged("460", "TSO4", "TSO6", "CHANNEL_IO"),
+                "nd6_options": _flagged("201", "PERFORMNUD", "DAD"),
+            }
+        )
+    elif kind == "bridge":
+        res.update(
+            {
+                "options": _flagged("63", "RXCSUM", "TXCSUM", "TSO4", "TSO6"),
+                "bridge": {
+                    "id": "0:0:0:0:0:0",
+                    "priority": "0",
+                    "hellotime": "0",
+                    "fwddelay": "0",
+                    "maxage": "0",
+                    "holdcnt": "0",
+                    "proto": "stp",
+                    "maxaddr": "100",
+                    "timeout": "1200",
+                    "root_id": "0:0:0:0:0:0",
+                    "root_priority": "0",
+                    "root_cost": "0",
+                    "root_port": "0",
+                    "ipfilter": "disabled",
+                    "flag": "0x0",
+                    "member": [],
+                },
+                "nd6_options": _flagged("201", "PERFORMNUD", "DAD"),
+            }
+        )
+    elif kind == "vlan":
+        res.update(
+            {
+                "options": _flagged("3", "RXCSUM", "TXCSUM"),
+                "vlan": {"vlanid": "0", "parent": "<none>"},
+            }
+        )
+    elif kind == "bond":
+        res.update({"options": _flagged("3", "RXCSUM", "TXCSUM"), "bond": []})
+    elif kind == "feth":
+        res.update({"options": _flagged("3", "RXCSUM", "TXCSUM"), "peer": None})
+    res.update(
+        {
+            "media": "autoselect",
+            "status": "active" if "RUNNING" in flags else "inactive",
+            "supported_media": [{"type": "autoselect", "opts": []}],
+            "generation_id": "1",
+            "type": "Ethernet",
+            "state_availability": {"availability": "0", "desc": "true"},
+            "scheduler": {"type": "FQ_CODEL", "desc": ""},
+            "routermode4": "disabled",
+            "routermode6": "disabled",
+        }
+    )
+    return res
+
+
+def _kind(name):
+    if name.startswith("lo"):
+        return "loopback"
+    return next((cloner for cloner in _CLONERS if name.startswith(cloner)), "ethernet")
+
+
+def _network(entry):
+    """
+    ipaddress network of a route `entry`
+    """
+    if entry["dst"] == "default":
+        return ipaddress.ip_network("0.0.0.0/0" if entry["family"] == "inet" else "::/0")
+    return ipaddress.ip_network(entry["dst"], strict=False)
+
+
+def _netstat_dst(entry):
+    """
+    Destination of a route `entry`, as printed by netstat -n -r
+    """
+    dst = entry["dst"]
+    scope = f"%{entry['scope']}" if entry.get("scope") else ""
+    if dst == "default" or "/" not in dst:
+        return f"{dst}{scope}"
+    network = ipaddress.ip_network(dst)
+    if network.version == 6:
+        return f"{network.network_address}{scope}/{network.prefixlen}"
+    # trailing zero bytes are left out, as is the length of class networks
+    octets = str(network.network_address).split(".")
+    while len(octets) > 1 and octets[-1] == "0":
+        octets.pop()
+    first = int(octets[0])
+    natural = 8 if first < 128 else 16 if first < 192 else 24
+    res = ".".join(octets)
+    return res if network.prefixlen == natural else f"{res}/{network.prefixlen}"
+
+
+def _sec2str(seconds):
+    """
+    Expiration of a neighbour entry, as printed by ndp
+    """
+    res = ""
+    for unit, size in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds >= size or res:
+            res += f"{seconds // size}{unit}"
+            seconds %= size
+    return f"{res}{seconds}s"
+
+
+def _options(argv, flags, values=""):
+    """
+    Split the getopt(3) options of `argv` (e.g. -nr -f inet) from its operands
+
+    Output:
+    (dict of the options, list of the operands)
+    """
+    options = {}
+    argv = list(argv)
+    while argv and argv[0].startswith("-") and argv[0] != "-":
+        arg = argv.pop(0)
+        for index, opt in enumerate(arg[1:]):
+            if opt in values:
+                value = arg[index + 2 :] or (argv.pop(0) if argv else None)
+                if value is None:
+                    raise CommandError(f"option requires an argument -- {opt}")
+                options[opt] = value
+                break
+            if opt not in flags:
+                raise CommandError(f"illegal option -- {opt}")
+            options[opt] = True
+    return options, argv
+
+
+class Network:
+    """
+    Network of a Mac, changed by the commands run on it (see run())
+
+    Input:
+    `data` (optional) state of the network, as of dict() (a Mac with lo0,
+    a wired en0 on 192.168.1.0/24 and an unplugged en1 by default)
+    """
+
+    __slots__ = ("arp", "changed", "fdb", "interfaces", "ndp", "routes", "sysctl")
+
+    def __init__(self, data=None):
+        if data is None:
+            self._default()
+            return
+        if data.get("version") != STATE_VERSION:
+            raise ValueError(f'unsupported network state version "{data.get("version")}"')
+        self.interfaces = {item["interface"]: item for item in data["interfaces"]}
+        self.routes = data["routes"]
+        self.arp = data["arp"]
+        self.ndp = data["ndp"]
+        self.fdb = data["fdb"]
+        self.sysctl = data["sysctl"]
+        self.changed = False
+
+    def _default(self):
+        self.interfaces = {}
+        self.routes = []
+        self.arp = []
+        self.ndp = []
+        self.fdb = {}
+        self.sysctl = dict(_SYSCTL)
+        lo0 = self._attach("lo0", "loopback", ["UP", "LOOPBACK", "RUNNING", "MULTICAST"], 16384)
+        self._add_address(lo0, "inet", ipaddress.ip_interface("127.0.0.1/8"))
+        self._add_address(lo0, "inet6", ipaddress.ip_interface("::1/128"))
+        self._add_address(lo0, "inet6", ipaddress.ip_interface("fe80::1/64"))
+        en0 = self._attach(
+            "en0", "ethernet", ["UP", "BROADCAST", "SMART", "RUNNING", "SIMPLEX", "MULTICAST"]
+        )
+        self._add_address(en0, "inet6", ipaddress.ip_interface("fe80::1c2f:3eaa:fe01:2345/64"))
+        self._add_address(en0, "inet", ipaddress.ip_interface("192.168.1.10/24"))
+        self._attach("en1", "ethernet", ["BROADCAST", "SMART", "SIMPLEX", "MULTICAST"])
+        self._add_route("inet", "default", "192.168.1.1", "UGScg", "en0")
+        self._add_route("inet6", "default", "fe80::1%en0", "UGcg", "en0")
+        self.arp.append(
+            {
+                "address": "192.168.1.1",
+                "lladdr": "aa:bb:cc:dd:ee:ff",
+                "netif": "en0",
+                "expire": 1177,
+            }
+        )
+        self.ndp.append(
+            {
+                "address": "fe80::1",
+                "scope": "en0",
+                "lladdr": "aa:bb:cc:dd:ee:ff",
+                "netif": "en0",
+                "expire": 86398,
+                "state": "S",
+                "flags": "R",
+            }
+        )
+        self.changed = False
+
+    def dict(self):
+        return {
+            "version": STATE_VERSION,
+            "interfaces": list(self.interfaces.values()),
+            "routes": self.routes,
+            "arp": self.arp,
+            "ndp": self.ndp,
+            "fdb": self.fdb,
+            "sysctl": self.sysctl,
+        }
+
+    def run(self, args):
+        """
+        Run the command `args` on the network, as subprocess.run() would run it on a Mac
+        """
+        args = list(args)
+        tool = os.path.basename(args[0]) if args else ""
+        if tool not in TOOLS:
+            return subprocess.CompletedProcess(
+                args, backend._NOT_RECORDED, "", f"{tool}: command not found\n"
+            )
+        try:
+            res = getattr(self, f"_{tool}")(args[1:])
+        except CommandError as err:
+            message = f"{tool}: {err}\n" if str(err) else ""
+            return subprocess.CompletedProcess(args, err.returncode, err.stdout, message)
+        if isinstance(res, tuple):
+            # succeeded, with something to tell on standard error
+            return subprocess.CompletedProcess(args, libc.EXIT_SUCCESS, *res)
+        return subprocess.CompletedProcess(args, libc.EXIT_SUCCESS, res, "")
+
+    def getifaddrs(self):
+        """
+        Interfaces and addresses, as of ifaddrs.getifaddrs()
+        """
+        return [
+            {
+                "interface": item["interface"],
+                "flag": item["flag"],
+                "flags": item["flags"],
+                "mtu": item["mtu"],
+                "index": item["index"],
+                "ether": item["ether"] if "LOOPBACK" not in item["flags"] else None,
+                "address": item["address"],
+            }
+            for item in self.interfaces.values()
+        ]
+
+    # interfaces
+
+    def _lookup(self, name):
+        if (item := self.interfaces.get(name)) is None:
+            raise CommandError(f"interface {name} does not exist")
+        return item
+
+    def _next_index(self):
+        return max((int(item["index"]) for item in self.interfaces.values()), default=0) + 1
+
+    def _attach(self, name, kind, flags, mtu=1500):
+        index = self._next_index()
+        prefix = {"ethernet": "3c:22:fb", "bridge": "36:5a:1b", "feth": "d6:0e:c3"}.get(kind)
+        ether = _mac(prefix, index) if prefix else None
+        if kind in ("vlan", "bond"):
+            ether = "00:00:00:00:00:00"
+        item = _interface(name, index, kind, flags, mtu=mtu, ether=ether)
+        self.interfaces[name] = item
+        self.changed = True
+        return item
+
+    def _set_flags(self, item, add=(), remove=()):
+        names = (set(item["flags"]) | set(add)) - set(remove)
+        item["flag"], item["flags"] = _flags(names)
+        if "status" in item:
+            item["status"] = "active" if "RUNNING" in item["flags"] else "inactive"
+
+    def _running(self, item):
+        """
+        Whether the interface `item` is running, once up
+        """
+        if "vlan" in item:
+            return item["vlan"]["parent"] in self.interfaces
+        if "bond" in item:
+            return bool(item["bond"])
+        return item["interface"] != "en1"
+
+    def _create(self, name):
+        """
+        Create interface `name` (e.g. "vlan" for the next vlanN)
+
+        Output:
+        the name of the interface created, if not `name`
+        """
+        cloner = name.rstrip("0123456789")
+        if cloner not in _CLONERS:
+            raise CommandError("SIOCIFCREATE2: Invalid argument")
+        if name == cloner:
+            unit = 0
+            while f"{cloner}{unit}" in self.interfaces:
+                unit += 1
+            created = f"{cloner}{unit}"
+        elif name in self.interfaces:
+            raise CommandError("SIOCIFCREATE2: File exists")
+        else:
+            created = name
+        flags = ["BROADCAST", "SIMPLEX", "MULTICAST"]
+        if cloner in ("bridge", "bond"):
+            flags.append("SMART")
+        if cloner == "feth":
+            flags.append("RUNNING")
+        self._attach(created, cloner, flags)
+        return created if created != name else ""
+
+    def _destroy(self, item):
+        name = item["interface"]
+        if _kind(name) not in _CLONERS:
+            raise CommandError("SIOCIFDESTROY: Invalid argument")
+        for other in self.interfaces.values():
+            if other.get("bridge"):
+                other["bridge"]["member"] = [
+                    member for member in other["bridge"]["member"] if member["interface"] != name
+                ]
+            if name in other.get("bond", []):
+                other["bond"].remove(name)
+            if other.get("peer") == name:
+                other["peer"] = None
+            if other.get("vlan", {}).get("parent") == name:
+                other["vlan"]["parent"] = "<none>"
+                self._set_flags(other, remove=["RUNNING"])
+        for member in item.get("bridge", {}).get("member", []):
+            self._set_flags(self.interfaces[member["interface"]], remove=["PROMISC"])
+        self.routes = [
+            entry
+            for entry in self.routes
+            if entry["netif"] != name and entry.get("source") not in self._addresses(item)
+        ]
+        self.arp = [entry for entry in self.arp if entry["netif"] != name]
+        self.ndp = [entry for entry in self.ndp if entry["netif"] != name]
+        self.fdb.pop(name, None)
+        for entries in self.fdb.values():
+            entries[:] = [entry for entry in entries if entry["dev"] != name]
+        del self.interfaces[name]
+
+    def _addresses(self, item):
+        return [address["address"] for address in item["address"]]
+
+    def _add_address(self, item, family, inet, broadcast=None, replace=False):
+        """
+        Add the ipaddress.ip_interface `inet` to interface `item`, along
+        with the routes to its network
+        """
+        name = item["interface"]
+        index = int(item["index"])
+        address = str(inet.ip)
+        if family == "inet":
+            if broadcast is None and "BROADCAST" in item["flags"] and inet.network.prefixlen < 31:
+                broadcast = str(inet.network.broadcast_address)
+            res = _address(
+                family, address, netmask=f"{int(inet.network.netmask):08x}", broadcast=broadcast
+            )
+        else:
+            link = inet.ip.is_link_local
+            res = _address(
+                family,
+                address,
+                net=name if link else None,
+                prefixlen=str(inet.network.prefixlen),
+                scopeid=f"0x{index:x}" if link else None,
+            )
+        current = [old for old in item["address"] if old["family"] == family]
+        if existing := next((old for old in current if old["address"] == address), None):
+            # already there: only its mask (and broadcast) changes
+            existing.update(res)
+            return
+        if replace and current:
+            self._delete_address(item, current[0])
+        item["address"].append(res)
+        self.changed = True
+        gateway = f"link#{index}"
+        if family == "inet":
+            if "LOOPBACK" in item["flags"]:
+                # the loopback networks are reached through the address itself
+                if inet.network.prefixlen < 32:
+                    self._add_route(family, str(inet.network), address, "UCS", name, source=address)
+                self._add_route(family, address, address, "UH", name, source=address)
+            else:
+                if inet.network.prefixlen < 32:
+                    self._add_route(family, str(inet.network), gateway, "UCS", name, "!", address)
+                self._add_route(family, f"{address}/32", gateway, "UCS", name, "!", address)
+        else:
+            scope = name if inet.ip.is_link_local else None
+            if inet.network.prefixlen < 128:
+                dst = str(inet.network)
+                if not any(r["dst"] == dst and r.get("scope") == scope for r in self.routes):
+                    flags = "UcI" if "LOOPBACK" in item["flags"] else "UCI"
+                    self._add_route(family, dst, gateway, flags, name, source=address, scope=scope)
+            # only the link-local addresses are interface scoped
+            flags = "UHLI" if scope else "UHL"
+            self._add_route(family, address, gateway, flags, "lo0", source=address, scope=scope)
+
+    def _delete_address(self, item, address):
+        item["address"].remove(address)
+        self.routes = [entry for entry in self.routes if entry.get("source") != address["address"]]
+        self.changed = True
+
+    def _add_route(
+        self, family, dst, gateway, flags, netif, expire="", source=None, scope=None, mtu=None
+    ):
+        entry = {
+            "family": family,
+            "dst": dst,
+            "scope": scope,
+            "gateway": gateway,
+            "flags": flags,
+            "netif": netif,
+            "expire": expire,
+            "source": source,
+            "mtu": mtu,
+        }
+        self.routes.append(entry)
+        self.changed = True
+        return entry
+
+    # ifconfig
+
+    def _ifconfig_show(self, names):
+        res = [ifconfig._NativeIfconfig(self.interfaces[name]).str() for name in names]
+        return "\n".join(res) + "\n" if res else ""
+
+    def _ifconfig(self, argv):
+        options, argv = _options(argv, "LmvalAudrC")
+        if options.get("l"):
+            names = [
+                name
+                for name, item in self.interfaces.items()
+                if not (options.get("u") and "UP" not in item["flags"])
+                and not (options.get("d") and "UP" in item["flags"])
+            ]
+            return " ".join(names) + "\n"
+        if not argv:
+            return self._ifconfig_show(self.interfaces)
+        name, argv = argv[0], argv[1:]
+        if argv[:1] == ["create"]:
+            created = self._create(name)
+            name, argv = created or name, argv[1:]
+            res = f"{created}\n" if created else ""
+            if argv:
+                res += self._ifconfig_set(self.interfaces[name], argv)
+            return res
+        item = self._lookup(name)
+        if not argv:
+            return self._ifconfig_show([name])
+        return self._ifconfig_set(item, argv)
+
+    def _ifconfig_set(self, item, argv):
+        """
+        Change interface `item` as of the ifconfig `argv` (e.g. "mtu 9000 up")
+        """
+        family = None
+        inet = []
+        mask = None
+        broadcast = None
+        alias = None
+        res = ""
+        while argv:
+            opt = argv.pop(0)
+            if opt == "destroy":
+                self._destroy(item)
+                self.changed = True
+                return res
+            elif opt == "create":
+                raise CommandError("SIOCIFCREATE2: File exists")
+            elif opt in ("up", "down"):
+                if opt == "up":
+                    self._set_flags(item, ["UP", "RUNNING"] if self._running(item) else ["UP"])
+                else:
+                    self._set_flags(item, remove=["UP", "RUNNING"])
+            elif opt in ("arp", "-arp"):
+                self._set_flags(item, *((["NOARP"], ()) if opt == "-arp" else ((), ["NOARP"])))
+            elif opt == "mtu":
+                item["mtu"] = str(int(self._value(argv, opt)))
+            elif opt in ("lladdr", "ether", "link"):
+                item["ether"] = self._value(argv, opt).lower()
+            elif opt in ("inet", "inet6"):
+                family = opt
+            elif opt in ("alias", "add"):
+                alias = True
+            elif opt in ("-alias", "delete"):
+                alias = False
+            elif opt == "netmask":
+                mask = self._value(argv, opt)
+            elif opt == "prefixlen":
+                mask = int(self._value(argv, opt))
+            elif opt == "broadcast":
+                broadcast = self._value(argv, opt)
+            elif opt == "vlan":
+                item.setdefault("vlan", {})["vlanid"] = str(int(self._value(argv, opt)))
+            elif opt == "vlandev":
+                parent = self._lookup(self._value(argv, opt))
+                item["vlan"]["parent"] = parent["interface"]
+                item["ether"] = parent["ether"]
+                if "UP" in item["flags"]:
+                    self._set_flags(item, ["RUNNING"])
+            elif opt == "-vlandev":
+                item["vlan"].update({"vlanid": "0", "parent": "<none>"})
+                self._set_flags(item, remove=["RUNNING"])
+            elif opt in ("addm", "deletem", "static", "deladdr"):
+                self._bridge(item, opt, argv)
+            elif opt in ("bonddev", "-bonddev", "bondmode"):
+                self._bond(item, opt, argv)
+            elif opt in ("peer", "-peer"):
+                self._peer(item, opt, argv)
+            elif opt == "addr":
+                res += self._bridge_addr(item)
+            elif family and not inet and opt != "-":
+                inet.append(opt)
+            else:
+                raise CommandError(f"{opt}: bad value")
+            self.changed = True
+        if family or inet:
+            self._ifconfig_address(item, family or "inet", inet, mask, broadcast, alias)
+        return res
+
+    @staticmethod
+    def _value(argv, opt):
+        if not argv:
+            raise CommandError(f"{opt}: missing argument")
+        return argv.pop(0)
+
+    def _ifconfig_address(self, item, family, inet, mask, broadcast, alias):
+        if not inet:
+            if alias is not False or not (
+                current := [a for a in item["address"] if a["family"] == family]
+            ):
+                raise CommandError("ioctl (SIOCDIFADDR): Can't assign requested address")
+            self._delete_address(item, current[0])
+            return
+        address = inet[0].split("%")[0]
+        try:
+            if "/" not in address and mask is not None:
+                address += f"/{mask}"
+            elif "/" not in address:
+                address += "/64" if family == "inet6" else ""
+            value = ipaddress.ip_interface(address)
+        except ValueError:
+            raise CommandError(f"{inet[0]}: bad value")
+        if alias is False:
+            existing = [a for a in item["address"] if a["address"] == str(value.ip)]
+            if not existing:
+                raise CommandError("ioctl (SIOCDIFADDR): Can't assign requested address")
+            self._delete_address(item, existing[0])
+            return
+        self._add_address(item, family, value, broadcast=broadcast, replace=alias is None)
+
+    def _bridge(self, item, opt, argv):
+        name = item["interface"]
+        if "bridge" not in item:
+            raise CommandError(f"{opt}: Operation not supported")
+        members = item["bridge"]["member"]
+        dev = self._value(argv, opt)
+        if opt == "deladdr":
+            self.fdb[name] = [entry for entry in self.fdb.get(name, []) if entry["mac"] != dev]
+            return
+        if (member := self.interfaces.get(dev)) is None:
+            raise CommandError(f"BRDG{'DEL' if opt == 'deletem' else 'ADD'} {dev}: No such device")
+        present = any(m["interface"] == dev for m in members)
+        if opt == "addm":
+            if present:
+                raise CommandError(f"BRDGADD {dev}: File exists")
+            if any(
+                dev in (m["interface"] for m in other.get("bridge", {}).get("member", []))
+                for other in self.interfaces.values()
+            ):
+                raise CommandError(f"BRDGADD {dev}: Device busy")
+            members.append(
+                {
+                    "interface": dev,
+                    "flag": "3",
+                    "flags": ["LEARNING", "DISCOVER"],
+                    "ifmaxaddr": "0",
+                    "port": member["index"],
+                    "priority": "0",
+                    "cost": "0",
+                    "hostfilter": "0",
+                    "hw": "0:0:0:0:0:0",
+                    "ip": "0.0.0.0",
+                    "checksum_stats": None,
+                }
+            )
+            self._set_flags(member, ["PROMISC"])
+        elif opt == "deletem":
+            if not present:
+                raise CommandError(f"BRDGDEL {dev}: No such file or directory")
+            members[:] = [m for m in members if m["interface"] != dev]
+            self._set_flags(member, remove=["PROMISC"])
+        else:
+            if not present:
+                raise CommandError(f"BRDGSADDR {dev}: Invalid argument")
+            mac = self._value(argv, opt).lower()
+            entries = [entry for entry in self.fdb.get(name, []) if entry["mac"] != mac]
+            entries.append({"mac": mac, "vlan": 1, "dev": dev, "expire": 0, "static": True})
+            self.fdb[name] = entries
+
+    def _bridge_addr(self, item):
+        if "bridge" not in item:
+            raise CommandError("addr: Operation not supported")
+        return "".join(
+            f"{entry['mac']} Vlan{entry['vlan']} {entry['dev']} {entry['expire']} "
+            + ("flags=8<STATIC>" if entry["static"] else "flags=0<>")
+            + "\n"
+            for entry in self.fdb.get(item["interface"], [])
+        )
+
+    def _bond(self, item, opt, argv):
+        if "bond" not in item:
+            raise CommandError(f"{opt}: Operation not supported")
+        value = self._value(argv, opt)
+        if opt == "bondmode":
+            if value not in ("lacp", "static"):
+                raise CommandError(f"bondmode: {value}: bad value")
+            return
+        member = self._lookup(value)
+        if opt == "bonddev":
+            if value in item["bond"] or any(
+                value in other.get("bond", []) for other in self.interfaces.values()
+            ):
+                raise CommandError(f"SIOCSIFBOND {value}: Device busy")
+            item["bond"].append(value)
+            if item["ether"] == "00:00:00:00:00:00":
+                item["ether"] = member["ether"]
+        else:
+            if value not in item["bond"]:
+                raise CommandError(f"SIOCSIFBOND {value}: No such device")
+            item["bond"].remove(value)
+        if "UP" in item["flags"]:
+            self._set_flags(
+                item, ["RUNNING"] if item["bond"] else (), () if item["bond"] else ["RUNNING"]
+            )
+
+    def _peer(self, item, opt, argv):
+        if "peer" not in item:
+            raise CommandError(f"{opt}: Operation not supported")
+        if item["peer"]:
+            self.interfaces[item["peer"]]["peer"] = None
+            item["peer"] = None
+        if opt == "-peer":
+            return
+        peer = self._lookup(self._value(argv, opt))
+        if "peer" not in peer or peer["interface"] == item["interface"]:
+            raise CommandError("SIOCSDRVSPEC: Invalid argument")
+        if peer["peer"]:
+            raise CommandError("SIOCSDRVSPEC: Device busy")
+        item["peer"], peer["peer"] = peer["interface"], item["interface"]
+
+    # routes
+
+    def _netstat(self, argv):
+        options, argv = _options(argv, "nrlaW", values="f")
+        if not options.get("r"):
+            raise CommandError("only the routing tables (-r) are simulated")
+        families = {"inet": ("inet",), "inet6": ("inet6",), None: ("inet", "inet6")}
+        if options.get("f") not in families:
+            raise CommandError(f"{options['f']}: unknown address family")
+        res = "Routing tables\n"
+        for family in families[options.get("f")]:
+            width = 18 if family == "inet" else 39
+            res += "\nInternet:\n" if family == "inet" else "\nInternet6:\n"
+            res += self._netstat_row(width, "Destination", "Gateway", "Flags", "Netif", "Expire")
+            for entry in self.routes:
+                if entry["family"] == family:
+                    res += self._netstat_row(
+                        width,
+                        _netstat_dst(entry),
+                        entry["gateway"],
+                        entry["flags"],
+                        entry["netif"],
+                        entry["expire"],
+                    )
+        return res
+
+    @staticmethod
+    def _netstat_row(width, dst, gateway, flags, netif, expire):
+        return f"{dst:<{width}} {gateway:<{width}} {flags:<19} {netif:>5} {expire:>6}\n"
+
+    def _route(self, argv):
+        options, argv = _options(argv, "nqv")
+        if not argv:
+            raise CommandError("usage: route [-dnqtv] command [[modifiers] args]")
+        cmd = argv.pop(0)
+        if cmd not in ("add", "delete", "change", "get"):
+            raise CommandError(f"{cmd}: bad command")
+        family = None
+        net = None
+        interface = False
+        ifscope = None
+        flags = ""
+        mtu = None
+        expire = None
+        operands = []
+        while argv:
+            opt = argv.pop(0)
+            if opt in ("-inet", "-inet6"):
+                family = opt[1:]
+            elif opt in ("-net", "-host"):
+                net = opt == "-net"
+            elif opt in ("-interface", "-iface"):
+                interface = True
+            elif opt == "-ifscope":
+                ifscope = self._lookup(self._value(argv, opt))["interface"]
+            elif opt in ("-blackhole", "-reject", "-static", "-cloning"):
+                flags += {"-blackhole": "B", "-reject": "R", "-static": "", "-cloning": "C"}[opt]
+            elif opt in ("-lock", "-lockrest"):
+                pass
+            elif opt == "-mtu":
+                mtu = int(self._value(argv, opt))
+            elif opt == "-expire":
+                expire = int(self._value(argv, opt))
+            elif opt in ("-netmask", "-prefixlen") and operands:
+                operands[0] += f"/{self._value(argv, opt)}"
+            elif opt.startswith("-") and opt not in ("-",):
+                # metrics not simulated (e.g. -hopcount)
+                self._value(argv, opt)
+            else:
+                operands.append(opt)
+        if not operands:
+            raise CommandError("destination required")
+        dst = operands[0]
+        if family is None:
+            family = "inet6" if ":" in dst else "inet"
+        try:
+            entry = self._route_dst(family, dst, net)
+        except ValueError:
+            raise CommandError(f"{dst}: bad address")
+        if cmd == "get":
+            return self._route_get(entry, dst)
+        return self._route_modify(cmd, entry, operands, interface, ifscope, flags, mtu, expire)
+
+    @staticmethod
+    def _route_dst(family, dst, net):
+        """
+        Route entry of the destination `dst`, without gateway
+        """
+        dst, _, scope = dst.partition("%")
+        if "/" in scope:
+            scope, prefix = scope.split("/")
+            dst = f"{dst}/{prefix}"
+        if dst == "default":
+            return {"family": family, "dst": "default", "scope": scope or None}
+        if "/" in dst or net:
+            network = ipaddress.ip_network(dst, strict=False)
+            if network.num_addresses > 1 or net:
+                return {"family": family, "dst": str(network), "scope": scope or None}
+            dst = str(network.network_address)
+        return {"family": family, "dst": str(ipaddress.ip_address(dst)), "scope": scope or None}
+
+    def _route_lookup(self, family, host, netif=None):
+        """
+        Route to address `host` (the longest prefix match), through interface
+        `netif` if given, None if unreachable
+        """
+        res = None
+        for entry in self.routes:
+            if entry["family"] != family or netif not in (None, entry["netif"]):
+                continue
+            network = _network(entry)
+            if host in network and (res is None or network.prefixlen > _network(res).prefixlen):
+                res = entry
+        return res
+
+    def source_address(self, address, dev=None):
+        """
+        Source address of the packets to `address` (through interface `dev`, if
+        given), None if unreachable: the address of the egress interface on the
+        network of `address`, if any, else the source of its route, else the
+        first one of the same family
+        """
+        host = ipaddress.ip_address(address.split("%")[0])
+        family = "inet" if host.version == 4 else "inet6"
+        if (found := self._route_lookup(family, host, netif=dev)) is None:
+            return None
+        item = self.interfaces.get(found["netif"], {})
+        inet = [old for old in item.get("address", []) if old["family"] == family]
+        for old in inet:
+            if family == "inet":
+                network = f"{old['address']}/{ipaddress.ip_address(int(old['netmask'], 16))}"
+            else:
+                network = f"{old['address']}/{old['prefixlen']}"
+            if host in ipaddress.ip_interface(network).network:
+                return old["address"]
+        if found["source"]:
+            return found["source"]
+        # same scope first
+        inet.sort(
+            key=lambda old: ipaddress.ip_address(old["address"]).is_link_local != host.is_link_local
+        )
+        return inet[0]["address"] if inet else None
+
+    def _route_modify(self, cmd, entry, operands, interface, ifscope, flags, mtu, expire):
+        family = entry["family"]
+        host = "/" not in entry["dst"] and entry["dst"] != "default"
+        gateway = operands[1] if len(operands) > 1 else None
+        message = f"{cmd} {'host' if host else 'net'} {operands[0]}"
+        if gateway:
+            message += f": gateway {gateway}"
+        existing = next(
+            (
+                old
+                for old in self.routes
+                if old["family"] == family
+                and old["dst"] == entry["dst"]
+                and old.get("scope") == entry["scope"]
+                and (ifscope is None or old["netif"] == ifscope)
+                and "W" not in old["flags"]
+            ),
+            None,
+        )
+
+        def failure(reason):
+            return f"{message}: {reason}\n", f"route: writing to routing socket: {reason}\n"
+
+        if cmd == "delete":
+            if existing is None:
+                return failure("not in table")
+            self.routes.remove(existing)
+            self.changed = True
+            return f"{message}\n"
+        if cmd == "add" and existing is not None:
+            return failure("File exists")
+        if cmd == "change" and existing is None:
+            return failure("not in table")
+        if gateway is None:
+            raise CommandError("gateway required")
+        if interface:
+            netif = self._lookup(gateway)["interface"]
+            gateway = f"link#{self.interfaces[netif]['index']}"
+            flags = "US" + flags
+        else:
+            try:
+                address = ipaddress.ip_address(gateway.split("%")[0])
+            except ValueError:
+                raise CommandError(f"{gateway}: bad address")
+            if ifscope:
+                netif = ifscope
+            elif "B" in flags or "R" in flags:
+                netif = "lo0"
+            elif via := self._route_lookup(family, address):
+                netif = via["netif"]
+            else:
+                return failure("Network is unreachable")
+            flags = "UGS" + flags
+        if host:
+            flags += "H"
+        if ifscope:
+            flags += "I"
+        if existing is not None:
+            self.routes.remove(existing)
+        self._add_route(
+            family,
+            entry["dst"],
+            gateway,
+            flags,
+            netif,
+            str(expire) if expire else "",
+            scope=entry["scope"],
+            mtu=mtu,
+        )
+        return f"{message}\n"
+
+    def _route_get(self, entry, dst):
+        if entry["dst"] == "default":
+            found = next(
+                (
+                    old
+                    for old in self.routes
+                    if old["family"] == entry["family"] and old["dst"] == "default"
+                ),
+                None,
+            )
+        else:
+            found = self._route_lookup(entry["family"], _network(entry).network_address)
+        if found is None:
+            return "", "route: writing to routing socket: not in table\n"
+        network = _network(found)
+        res = f"   route to: {dst.split('/')[0]}\n"
+        destination = found["dst"] if found["dst"] == "default" else str(network.network_address)
+        res += f"destination: {destination}\n"
+        if found["dst"] == "default":
+            res += "       mask: default\n"
+        elif "H" not in found["flags"] and "/" in found["dst"]:
+            res += f"       mask: {network.netmask}\n"
+        if "G" in found["flags"]:
+            res += f"    gateway: {found['gateway']}\n"
+        res += f"  interface: {found['netif']}\n"
+        names = [name for flag, name in route._RTF_NAMES if flag is None or flag in found["flags"]]
+        res += f"      flags: <{','.join(names)}>\n"
+        res += _ROUTE_GET_METRICS + "\n"
+        item = self.interfaces.get(found["netif"], {})
+        mtu = found["mtu"] or int(item.get("mtu", 0))
+        expire = int(found["expire"]) if found["expire"].isdigit() else 0
+        res += " ".join(f"{value:8} " for value in (0, 0, 0, 0, 0, 0, mtu, expire)) + "\n"
+        return res
+
+    # neighbours
+
+    def _intuit(self, family, host):
+        """
+        Interface of the neighbour `host`, on a directly connected network
+        """
+        via = self._route_lookup(family, host)
+        if via is None or via["gateway"] != f"link#{self.interfaces[via['netif']]['index']}":
+            return None
+        return via["netif"]
+
+    def _arp(self, argv):
+        options, argv = _options(argv, "nlaSsd", values="i")
+        if options.get("a") and not options.get("d"):
+            entries = [e for e in self.arp if options.get("i") in (None, e["netif"])]
+            if options.get("i") and options["i"] not in self.interfaces:
+                raise CommandError(f"{options['i']}: no such interface")
+            return self._arp_show(entries)
+        if options.get("d"):
+            return self._arp_delete(argv)
+        if options.get("s") or options.get("S"):
+            return self._arp_set(argv)
+        if not argv:
+            raise CommandError("usage: arp [-n] [-i interface] hostname")
+        entries = [e for e in self.arp if e["address"] == argv[0]]
+        if not entries:
+            return f"{argv[0]} ({argv[0]}) -- no entry\n"
+        return self._arp_show(entries).split("\n", 1)[1]
+
+    @staticmethod
+    def _arp_show(entries):
+        res = "Neighbor                Linklayer Address Expire(O) Expire(I)    Netif Refs Prbs\n"
+        for entry in entries:
+            lladdr = entry["lladdr"] or "(incomplete)"
+            if entry["expire"] is None:
+                expire, refs = "(none)", ""
+            elif entry["expire"] <= 0 or not entry["lladdr"]:
+                expire, refs = "expired", "    1"
+            else:
+                expire, refs = f"{entry['expire'] // 60}m{entry['expire'] % 60}s", "    1"
+            res += f"{entry['address']:<23} {lladdr:<17} {expire:<9} {expire:<9} "
+            res += f"{entry['netif']:>8}{refs}\n"
+        return res
+
+    def _arp_set(self, argv):
+        if len(argv) < 2:
+            raise CommandError(
+                "usage: arp -s hostname ether_addr [temp] [reject] [blackhole] [pub [only]]"
+            )
+        host, lladdr, argv = argv[0], argv[1].lower(), argv[2:]
+        netif = argv[argv.index("ifscope") + 1] if "ifscope" in argv[:-1] else None
+        try:
+            address = ipaddress.IPv4Address(host)
+        except ValueError:
+            raise CommandError(f"{host}: Unknown host", returncode=libc.EXIT_FAILURE)
+        netif = netif or self._intuit("inet", address)
+        if netif is None:
+            raise CommandError(f"cannot intuit interface index and type for {host}")
+        self.arp = [e for e in self.arp if e["address"] != host]
+        self.arp.append(
+            {
+                "address": host,
+                "lladdr": lladdr,
+                "netif": netif,
+                "expire": _ARP_EXPIRE if "temp" in argv else None,
+            }
+        )
+        self.changed = True
+        return ""
+
+    def _arp_delete(self, argv):
+        if not argv:
+            raise CommandError("usage: arp -d hostname [pub] [ifscope interface]")
+        host = argv[0]
+        netif = argv[argv.index("ifscope") + 1] if "ifscope" in argv[:-1] else None
+        entry = next(
+            (e for e in self.arp if e["address"] == host and netif in (None, e["netif"])), None
+        )
+        if entry is None:
+            raise CommandError(f"delete: cannot locate {host}")
+        self.arp.remove(entry)
+        self.changed = True
+        return f"{host} ({host}) deleted\n"
+
+    def _ndp(self, argv):
+        options, argv = _options(argv, "nlasdt")
+        if options.get("a"):
+            return self._ndp_show(self.ndp)
+        if options.get("d"):
+            return self._ndp_delete(argv)
+        if options.get("s"):
+            return self._ndp_set(argv)
+        if not argv:
+            raise CommandError("usage: ndp [-nt] hostname")
+        host, _, scope = argv[0].partition("%")
+        entries = [e for e in self.ndp if e["address"] == host and scope in ("", e["scope"])]
+        if not entries:
+            raise CommandError("", stdout=f"{argv[0]} ({argv[0]}) -- no entry\n")
+        return self._ndp_show(entries).split("\n", 1)[1]
+
+    @staticmethod
+    def _ndp_show(entries):
+        res = (
+            "Neighbor                                Linklayer Address  Netif Expire    Expire"
+            "    St Flgs Prbs\n"
+        )
+        for entry in entries:
+            address = entry["address"] + (f"%{entry['scope']}" if entry["scope"] else "")
+            lladdr = entry["lladdr"] or "(incomplete)"
+            expire = "permanent" if entry["expire"] is None else _sec2str(entry["expire"])
+            res += (
+                f"{address:<39} {lladdr:<18} {entry['netif']:>5} {expire:<9} {expire:<9} "
+                f"{entry['state']} {entry['flags']}\n"
+            )
+        return res
+
+    def _ndp_set(self, argv):
+        if len(argv) < 2:
+            raise CommandError("usage: ndp -s nodename etheraddr [temp] [proxy]")
+        host, _, scope = argv[0].partition("%")
+        try:
+            address = ipaddress.IPv6Address(host)
+        except ValueError:
+            raise CommandError(f"{argv[0]}: bad value")
+        if not scope and address.is_link_local:
+            raise CommandError(f"{argv[0]}: link-local addresses need an interface (%dev)")
+        netif = scope or self._intuit("inet6", address)
+        if netif is None:
+            raise CommandError(f"cannot intuit interface index and type for {host}")
+        self.ndp = [e for e in self.ndp if not (e["address"] == host and e["netif"] == netif)]
+        self.ndp.append(
+            {
+                "address": host,
+                "scope": scope or None,
+                "lladdr": argv[1].lower(),
+                "netif": netif,
+                "expire": _NDP_EXPIRE if "temp" in argv[2:] else None,
+                "state": "R",
+                "flags": "",
+            }
+        )
+        self.changed = True
+        return ""
+
+    def _ndp_delete(self, argv):
+        if not argv:
+            raise CommandError("usage: ndp -d hostname")
+        host, _, scope = argv[0].partition("%")
+        entry = next(
+            (e for e in self.ndp if e["address"] == host and scope in ("", e["netif"])), None
+        )
+        if entry is None:
+            raise CommandError(f"delete: cannot locate {argv[0]}")
+        self.ndp.remove(entry)
+        self.changed = True
+        return f"{argv[0]} ({argv[0]}) deleted\n"
+
+    # sysctl
+
+    def _sysctl(self, argv):
+        options, argv = _options(argv, "nwa")
+        if options.get("a") or not argv:
+            return "".join(f"{name}: {value}\n" for name, value in sorted(self.sysctl.items()))
+        res = ""
+        for arg in argv:
+            name, sep, value = arg.partition("=")
+            if name not in self.sysctl:
+                raise CommandError(f"unknown oid '{name}'")
+            if sep:
+                old = self.sysctl[name]
+                self.sysctl[name] = int(value) if value.lstrip("-").isdigit() else value
+                self.changed = True
+                res += f"{name}: {old} -> {self.sysctl[name]}\n"
+            elif options.get("n"):
+                res += f"{self.sysctl[name]}\n"
+            else:
+                res += f"{name}: {self.sysctl[name]}\n"
+        return res
+
+
+class Store:
+    """
+    Network shared by the processes (e.g. ip, bridge and the shims) running
+    commands on it, saved into a JSON file
+
+    Input:
+    `network` path of the file (created on first use), or a Network not saved at all
+    """
+
+    __slots__ = ("_network", "_path", "_stamp")
+
+    def __init__(self, network):
+        self._stamp = None
+        if isinstance(network, Network):
+            self._network = network
+            self._path = None
+        else:
+            self._network = None
+            self._path = os.fspath(network)
+
+    def _read_stamp(self):
+        try:
+            stat = os.stat(self._path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _save(self):
+        directory = os.path.dirname(os.path.abspath(self._path))
+        with tempfile.NamedTemporaryFile("w", dir=directory, delete=False, suffix=".tmp") as tmp:
+            json.dump(self._network.dict(), tmp)
+        os.replace(tmp.name, self._path)
+        self._network.changed = False
+        self._stamp = self._read_stamp()
+
+    @contextlib.contextmanager
+    def network(self):
+        """
+        The network, up to date, for one command: changes are saved on exit
+        """
+        if self._path is None:
+            yield self._network
+            return
+        with open(self._path + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            stamp = self._read_stamp()
+            if stamp is None:
+                self._network = Network()
+                self._save()
+            elif self._network is None or stamp != self._stamp:
+                with open(self._path, encoding="utf-8") as source:
+                    self._network = Network(json.load(source))
+                self._stamp = stamp
+            try:
+                yield self._network
+            finally:
+                if self._network.changed:
+                    self._save()
+
+
+def _shim(tool, state=None):
+    """
+    Shell script running `tool` (a simulated command, ip or bridge) on the network
+    """
+    module = _CLI.get(tool, f"iproute4mac.simulator {tool}")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    res = "#!/bin/sh\n"
+    if state:
+        res += f": ${{{backend.ENV_SIMULATE}:={shlex.quote(os.path.abspath(state))}}}\n"
+        res += f"export {backend.ENV_SIMULATE}\n"
+    res += f"PYTHONPATH={shlex.quote(root)}${{PYTHONPATH:+:$PYTHONPATH}} "
+    res += f'exec {shlex.quote(sys.executable)} -m {module} "$@"\n'
+    return res
+
+
+def install(directory, state=None):
+    """
+    Write the shims of the simulated commands, ip and bridge into `directory`
+    """
+    os.makedirs(directory, exist_ok=True)
+    for tool in (*TOOLS, *_CLI):
+        path = os.path.join(directory, tool)
+        with open(path, "w") as shim:
+            shim.write(_shim(tool, state))
+        os.chmod(path, 0o755)
+
+
+def usage():
+    sys.stderr.write("""\
+Usage: python -m iproute4mac.simulator [ -state FILE ] { ifconfig | netstat | route | arp |
+                                                        ndp | sysctl } [ ARGS... ]
+       python -m iproute4mac.simulator [ -state FILE ] install DIRECTORY
+       python -m iproute4mac.simulator [ -state FILE ] exec COMMAND [ ARGS... ]
+       python -m iproute4mac.simulator [ -state FILE ] { show | reset }
+The network is saved in FILE (by default $IPROUTE4MAC_SIMULATE), created on first use.
+""")
+    exit(libc.EXIT_ERROR)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    state = os.environ.get(backend.ENV_SIMULATE)
+    if argv[:1] == ["-state"]:
+        if len(argv) < 2:
+            usage()
+        state, argv = argv[1], argv[2:]
+    if not argv:
+        usage()
+    cmd, argv = argv[0], argv[1:]
+
+    if cmd == "exec":
+        if not argv:
+            usage()
+        with tempfile.TemporaryDirectory(prefix="iproute4mac-") as tmp:
+            state = state or os.path.join(tmp, "network.json")
+            install(os.path.join(tmp, "bin"), state)
+            env = {
+                **os.environ,
+                backend.ENV_SIMULATE: os.path.abspath(state),
+                "PATH": os.path.join(tmp, "bin") + os.pathsep + os.environ.get("PATH", ""),
+            }
+            return subprocess.run(argv, env=env).returncode
+    if cmd == "install":
+        if len(argv) != 1:
+            usage()
+        install(argv[0], state)
+        return libc.EXIT_SUCCESS
+    if not state:
+        sys.stderr.write(f"{backend.ENV_SIMULATE} is not set (nor -state given)\n")
+        return libc.EXIT_ERROR
+    if cmd == "reset":
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(state)
+        with Store(state).network():
+            return libc.EXIT_SUCCESS
+    if cmd == "show":
+        with Store(state).network() as network:
+            print(json.dumps(network.dict(), indent=1))
+        return libc.EXIT_SUCCESS
+    if cmd not in TOOLS:
+        usage()
+    with Store(state).network() as network:
+        res = network.run([cmd, *argv])
+    sys.stdout.write(res.stdout)
+    sys.stderr.write(res.stderr)
+    return res.returncode
+
+
+if __name__ == "__main__":
+    sys.exit(main())
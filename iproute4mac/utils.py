@@ -1,13 +1,19 @@
+import importlib
 import json
+import os
+import pickle
 import re
-import subprocess
+import shlex
 import sys
 
+import iproute4mac
+import iproute4mac.backend as backend
+import iproute4mac.cache as cache
 import iproute4mac.libc as libc
+import iproute4mac.profiler as profiler
+import iproute4mac.rtsock as rtsock
 import iproute4mac.socket as socket
 
-from _ctypes import PyObj_FromPtr
-
 from iproute4mac import OPTION
 from iproute4mac.prefix import Prefix
 
@@ -22,6 +28,20 @@ LOG_DEBUG = 5
 LOG_LABEL = (None, "Hint", "Error", "Warning", "Info", "Debug")
 
 
+class Exit(SystemExit):
+    """
+    Exit of a failed command, already reported on stderr: `kind` of failure
+    ("invalid", "not_found", "unsupported", "command" or None) and `message`
+    let embedders (see api) tell why, `command` being the failed argv (if any)
+    """
+
+    def __init__(self, code, message="", kind=None, command=None):
+        super().__init__(code)
+        self.message = message
+        self.kind = kind
+        self.command = command
+
+
 def stdout(*args, sep="", end="", optional=False):
     if OPTION["verbose"] < LOG_STDERR or (optional and OPTION["verbose"] < LOG_HINT):
         return
@@ -36,9 +56,9 @@ def stderr(text, log_level=LOG_STDERR):
     sys.stderr.write(text.rstrip() + "\n")
 
 
-def error(text):
+def error(text, kind=None):
     stderr(text, log_level=LOG_ERROR)
-    exit(libc.EXIT_ERROR)
+    raise Exit(libc.EXIT_ERROR, text, kind=kind)
 
 
 def warn(text):
@@ -58,23 +78,23 @@ def hint(text):
 
 
 def missarg(key):
-    error(f'argument "{key}" is required')
+    error(f'argument "{key}" is required', kind="invalid")
 
 
 def invarg(msg, arg):
-    error(f'argument "{arg}" is wrong: {msg}')
+    error(f'argument "{arg}" is wrong: {msg}', kind="invalid")
 
 
 def duparg(key, arg):
-    error(f'duplicate "{key}": "{arg}" is the second value.')
+    error(f'duplicate "{key}": "{arg}" is the second value.', kind="invalid")
 
 
 def duparg2(key, arg):
-    error(f'either "{key}" is duplicate, or "{arg}" is a garbage.')
+    error(f'either "{key}" is duplicate, or "{arg}" is a garbage.', kind="invalid")
 
 
 def on_off(msg, arg):
-    error(f'argument of "{msg}" must be "on" or "off", not "{arg}"')
+    error(f'argument of "{msg}" must be "on" or "off", not "{arg}"', kind="invalid")
 
 
 def on_off_switch(key, arg):
@@ -88,16 +108,52 @@ def parse_on_off(key, arg):
 
 def incomplete_command():
     stderr('Command line is not complete. Try option "help"')
-    exit(libc.EXIT_ERROR)
+    raise Exit(libc.EXIT_ERROR, "Command line is not complete", kind="invalid")
+
+
+def output(obj, options=None):
+    """
+    Write `obj` as of `options` (the ones of the current context by default)
+    """
+    if options is not None:
+        with iproute4mac.using(options):
+            return output(obj)
+    if hasattr(obj, "iterdict"):
+        return output_stream(obj)
+    with profiler.phase("render"):
+        if OPTION["json"]:
+            res = json_dumps(obj.dict(details=OPTION["show_details"]))
+        else:
+            res = obj.str(details=OPTION["show_details"])
+    if res:
+        with profiler.phase("write"):
+            stdout(res, end="\n")
 
 
-def output(obj):
-    if OPTION["json"]:
-        res = json_dumps(obj.dict(details=OPTION["show_details"]))
-    else:
-        res = obj.str(details=OPTION["show_details"])
-    if res:
-        stdout(res, end="\n")
+def output_stream(items):
+    """
+    Write every item as soon as it is rendered (see data._Items.iterdict()):
+    a closed pipe (e.g. "| head") stops the parsing
+    """
+    try:
+        if OPTION["json"]:
+            chunks = json_iterdumps(items.iterdict(details=OPTION["show_details"]))
+            for chunk in profiler.iterate("render", chunks):
+                with profiler.phase("write"):
+                    stdout(chunk)
+            with profiler.phase("write"):
+                stdout("\n")
+        else:
+            lines = items.iterstr(details=OPTION["show_details"])
+            for res in profiler.iterate("render", lines):
+                with profiler.phase("write"):
+                    stdout(res, end="\n")
+        with profiler.phase("write"):
+            sys.stdout.flush()
+    except BrokenPipeError:
+        # no flush errors at exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        exit(libc.EXIT_FAILURE)
 
 
 def next_arg(argv):
@@ -114,57 +170,51 @@ def bit_count(self):
 
 def get_addr(name, family):
     if family == socket._AF_MPLS:
-        error("MPLS protocol not supported.")
+        error("MPLS protocol not supported.", kind="unsupported")
     addr = Prefix(name, family=family)
     if family in (socket._AF_UNSPEC, socket._AF_PACKET) or addr.family == family:
         return addr
 
-    error(f'{socket.family_name_verbose(family)} address is expected rather than "{name}".')
+    error(
+        f'{socket.family_name_verbose(family)} address is expected rather than "{name}".',
+        kind="invalid",
+    )
 
 
 def get_prefix(name, family):
     if family == socket._AF_PACKET:
-        error(f'"{name}" may be inet prefix, but it is not allowed in this context.')
+        error(
+            f'"{name}" may be inet prefix, but it is not allowed in this context.', kind="invalid"
+        )
 
     try:
         prefix = get_addr(name, family)
     except ValueError:
-        error(f'{socket.family_name_verbose(family)} prefix is expected rather than "{name}".')
+        error(
+            f'{socket.family_name_verbose(family)} prefix is expected rather than "{name}".',
+            kind="invalid",
+        )
 
     return prefix
 
 
-def ref(obj_id):
-    return PyObj_FromPtr(obj_id)
-
-
 def json_dumps(data):
     if OPTION["pretty"]:
         return json.dumps(data, cls=PrettyJSON, indent=4)
     return json.dumps(data, cls=SimpleJSON, separators=(",", ":"))
 
 
-def json_unindent_list(obj):
-    if isinstance(obj, dict):
-        for k, v in obj.items():
-            obj[k] = json_unindent_list(v)
-    elif isinstance(obj, list):
-        if all(isinstance(x, str) for x in obj):
-            return NoIndent(obj)
-        for index, entry in enumerate(obj):
-            obj[index] = json_unindent_list(entry)
-    return obj
-
-
-class NoIndent(object):
-    def __init__(self, value):
-        self.value = value
-
-    def __repr__(self):
-        if self.value:
-            reps = (repr(v) for v in self.value)
-            return "[ " + ",".join(reps).replace("'", '"') + " ]"
-        return "[ ]"
+def json_iterdumps(records):
+    """
+    Yield json_dumps(list(records)) in chunks, one record at a time
+    """
+    # the same output of json_dumps() of a list, without the list
+    start, end, empty = ("[ ", " ]", "[ ]") if OPTION["pretty"] else ("[", "]", "[]")
+    sep = start
+    for record in records:
+        yield sep + json_dumps([record])[len(start) : -len(end)]
+        sep = ","
+    yield empty if sep == start else end
 
 
 class SimpleJSON(json.JSONEncoder):
@@ -175,27 +225,117 @@ class SimpleJSON(json.JSONEncoder):
 
 
 class PrettyJSON(json.JSONEncoder):
-    FORMAT_SPEC = "@@{}@@"
-    regex = re.compile(FORMAT_SPEC.format(r"(\d+)"))
+    """
+    Pretty JSON of iproute2: lists of strings in a single line, and
+    dictionaries in lists next to the brackets ("[ {", "},{" and "} ]")
+    """
 
     def default(self, obj):
-        if isinstance(obj, NoIndent):
-            return self.FORMAT_SPEC.format(id(obj))
         if isinstance(obj, Prefix):
             return str(obj)
         return super(PrettyJSON, self).default(obj)
 
     def encode(self, obj):
-        obj = json_unindent_list(obj)
-        format_spec = self.FORMAT_SPEC
-        json_repr = super(PrettyJSON, self).encode(obj)
-        for match in self.regex.finditer(json_repr):
-            id = int(match.group(1))
-            json_repr = json_repr.replace(f'"{format_spec.format(id)}"', repr(ref(id)))
-        json_repr = re.sub(r"\[\n\s+{", "[ {", json_repr)
-        json_repr = re.sub(r"},\n\s+{", "},{", json_repr)
-        json_repr = re.sub(r"}\n\s*\]", "} ]", json_repr)
-        return json_repr
+        # single pass: no placeholders to replace, nor regular expressions to apply
+        if isinstance(self.indent, int):
+            self.indent = " " * self.indent
+        chunks = []
+        self._encode(obj, "\n", chunks.append)
+        return "".join(chunks)
+
+    def _string(self, obj):
+        if self.ensure_ascii:
+            return json.encoder.encode_basestring_ascii(obj)
+        return json.encoder.encode_basestring(obj)
+
+    def _float(self, obj):
+        if obj != obj:
+            res = "NaN"
+        elif obj == float("inf"):
+            res = "Infinity"
+        elif obj == -float("inf"):
+            res = "-Infinity"
+        else:
+            return float.__repr__(obj)
+        if not self.allow_nan:
+            raise ValueError(f"Out of range float values are not JSON compliant: {obj!r}")
+        return res
+
+    def _key(self, key):
+        if isinstance(key, str):
+            return key
+        if isinstance(key, float):
+            return self._float(key)
+        if key is True:
+            return "true"
+        if key is False:
+            return "false"
+        if key is None:
+            return "null"
+        if isinstance(key, int):
+            return int.__repr__(key)
+        raise TypeError(f"keys must be str, int, float, bool or None, not {type(key).__name__}")
+
+    def _encode(self, obj, newline, write, flat=True):
+        """
+        Input:
+        `newline` newline and indentation of `obj`
+        `write` callable writing the encoded chunks
+        `flat` lists of strings are written in a single line (not within tuples)
+        """
+        if isinstance(obj, str):
+            write(self._string(obj))
+        elif obj is None:
+            write("null")
+        elif obj is True:
+            write("true")
+        elif obj is False:
+            write("false")
+        elif isinstance(obj, int):
+            write(int.__repr__(obj))
+        elif isinstance(obj, float):
+            write(self._float(obj))
+        elif isinstance(obj, list) and flat and all(isinstance(item, str) for item in obj):
+            # repr() of the strings, as they always were
+            write("[ " + ",".join(map(repr, obj)).replace("'", '"') + " ]" if obj else "[ ]")
+        elif isinstance(obj, list | tuple):
+            if not obj:
+                write("[]")
+                return
+            flat = flat and isinstance(obj, list)
+            indent = newline + self.indent
+            after_dict = False
+            for index, item in enumerate(obj):
+                is_dict = isinstance(item, dict)
+                if index == 0:
+                    write("[ " if is_dict else "[" + indent)
+                elif is_dict and after_dict:
+                    write(self.item_separator)
+                else:
+                    write(self.item_separator + indent)
+                self._encode(item, indent, write, flat=flat)
+                after_dict = is_dict
+            write(" ]" if after_dict else newline + "]")
+        elif isinstance(obj, dict):
+            if not obj:
+                write("{}")
+                return
+            indent = newline + self.indent
+            first = True
+            for key, value in obj.items():
+                try:
+                    key = self._key(key)
+                except TypeError:
+                    if self.skipkeys:
+                        continue
+                    raise
+                write(("{" if first else self.item_separator) + indent)
+                write(self._string(key) + self.key_separator)
+                self._encode(value, indent, write, flat=flat)
+                first = False
+            write("{}" if first else newline + "}")
+        else:
+            self._encode(self.default(obj), newline, write, flat=flat)
 
 
 def flat_tuple(*args):
@@ -258,24 +398,39 @@ def deep_update(source, update):
         source[key] = value
 
 
-def options_override(options={}):
-    for key, value in options.items():
-        OPTION[key], options[key] = value, OPTION[key]
-    return options
+def options_overridden(**options):
+    """
+    Context manager running with `options` overridden in the current context
+    """
+    return iproute4mac.using(iproute4mac.options().replace(options))
 
 
-def options_restore(options={}):
-    OPTION.update(options)
+# read-only commands output shared by every parser of the same process
+_SNAPSHOTS = {}
 
+# objects parsed in batch mode, pickled to hand out independent copies
+_PARSED = {}
 
-def shell(*args, fatal=True):
-    args = flat_tuple(*args)
+# max concurrent read-only commands
+_SHELL_WORKERS = 16
+
+# snapshots made stale by a command (any snapshot for commands not listed here)
+_INVALIDATES = {
+    "ifconfig": ("ifconfig", "netstat", "route", "arp", "ndp"),
+    "route": ("netstat", "route"),
+    "arp": ("arp",),
+    "ndp": ("ndp",),
+}
+
+
+def _run(args, fatal=True):
     info('executing "' + " ".join(args) + '"')
-    cmd = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, encoding="utf-8")
+    with profiler.phase("shell", " ".join(args)):
+        cmd = backend.get().run(args)
     if cmd.returncode != 0:
         stderr(cmd.stderr)
         if fatal:
-            exit(cmd.returncode)
+            raise Exit(cmd.returncode, cmd.stderr.strip(), kind="command", command=args)
         else:
             return cmd.returncode
     else:
@@ -285,25 +440,267 @@ def shell(*args, fatal=True):
     return cmd.stdout.rstrip("\n")
 
 
-def get_prefsrc(host):
+def invalidate(*commands):
+    """
+    Drop the snapshots of `commands` (all snapshots if none is given)
+    """
+    for args in list(_SNAPSHOTS):
+        if not commands or os.path.basename(args[0]) in commands:
+            del _SNAPSHOTS[args]
+    if not commands:
+        _PARSED.clear()
+
+
+def invalidate_if(predicate):
+    """
+    Drop the snapshots whose argv `predicate` returns True for
+    """
+    for args in list(_SNAPSHOTS):
+        if predicate(args):
+            del _SNAPSHOTS[args]
+
+
+def preload(snapshots):
+    """
+    Reuse `snapshots` (argv: output), e.g. run asynchronously, as if taken by snapshot()
+    """
+    for args, res in snapshots.items():
+        _SNAPSHOTS[flat_tuple(*args)] = res
+
+
+def snapshot(*args, fatal=True):
+    """
+    Run a read-only command only once, and reuse its output until invalidated
+    """
+    args = flat_tuple(*args)
+    # possibly invalidated by another thread
+    if (res := _SNAPSHOTS.get(args)) is not None:
+        debug('reusing "' + " ".join(args) + '"')
+        return res
+    if OPTION["cache"]:
+        res = cache.DiskCache(OPTION["cache"]).get(
+            os.path.basename(args[0]), args, lambda: _run(args, fatal=fatal)
+        )
+    else:
+        res = _run(args, fatal=fatal)
+    if isinstance(res, str):
+        _SNAPSHOTS[args] = res
+    return res
+
+
+def snapshots(*commands, fatal=True):
+    """
+    Run independent read-only commands concurrently (see snapshot())
+
+    Input:
+    `commands` list of argv (tuple or list)
+
+    Output:
+    list of the commands output, in the same order
+    """
+    commands = [flat_tuple(*args) for args in commands]
+    pending = list(dict.fromkeys(args for args in commands if args not in _SNAPSHOTS))
+    res = {}
+    if len(pending) > 1:
+        from concurrent.futures import ThreadPoolExecutor
+
+        # the workers start from the default options
+        options = iproute4mac.options()
+
+        def run(args):
+            with iproute4mac.using(options):
+                return snapshot(args, fatal=False)
+
+        workers = min(len(pending), _SHELL_WORKERS)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            res = dict(zip(pending, pool.map(run, pending)))
+        # errors are already reported, but exit from the caller thread
+        failed = ((args, r) for args, r in res.items() if not isinstance(r, str))
+        if fatal and (err := next(failed, None)):
+            raise Exit(err[1], f'"{" ".join(err[0])}" failed', kind="command", command=err[0])
+    return [res[args] if args in res else snapshot(args, fatal=fatal) for args in commands]
+
+
+def shell(*args, fatal=True):
+    """
+    Run a (possibly) mutating command, invalidating the affected snapshots
+    """
+    args = flat_tuple(*args)
+    try:
+        return _run(args, fatal=fatal)
+    finally:
+        stale = _INVALIDATES.get(os.path.basename(args[0]), ())
+        invalidate(*stale)
+        cache.invalidate(*stale)
+
+
+def parsed(kind, key, sources, parse):
+    """
+    Parse commands output, or reuse the objects parsed from the same output
+    by another process (see OPTION["cache"])
+
+    Input:
+    `kind` name of the parsed objects (e.g. "IpAddress")
+    `key` list of str identifying the objects whatever the output (e.g. the
+    commands argv): the on-disk entry of the previous output is replaced
+    `sources` list of commands output `parse` depends on
+    `parse` callable returning the list (or an iterator) of parsed objects
+
+    Output:
+    the parsed objects: an iterator is returned as is only if not reused
+    """
+    if not OPTION["cache"] and not OPTION["batch_mode"]:
+        with profiler.phase("parse"):
+            res = parse()
+        # parsed lazily, as the items are read
+        return res if isinstance(res, list) else profiler.iterate("parse", res, count=False)
+
+    def parse_list():
+        with profiler.phase("parse"):
+            res = parse()
+            return res if isinstance(res, list) else list(res)
+
+    # parsed objects follow the lifetime of their (possibly invalidated) sources
+    digest = cache.digest(sources)
+    if OPTION["cache"]:
+        return cache.DiskCache(OPTION["cache"]).get(kind, key, parse_list, tag=digest)
+    if kind in _PARSED and _PARSED[kind][0] == digest:
+        debug(f'reusing parsed "{kind}"')
+        return pickle.loads(_PARSED[kind][1])
+    res = parse_list()
+    _PARSED[kind] = (digest, pickle.dumps(res, protocol=pickle.HIGHEST_PROTOCOL))
+    return res
+
+
+def _batch_lines(source):
+    """
+    Yield (line number, line) of every command, joining continued lines
+    """
+    line = ""
+    for lineno, text in enumerate(source, start=1):
+        line += text.rstrip("\n")
+        if line.endswith("\\"):
+            line = line[:-1]
+            continue
+        yield lineno, line
+        line = ""
+    if line:
+        yield lineno, line
+
+
+def batch(name, do_cmd):
+    """
+    Run every command of file `name` (stdin if "-") within the same process,
+    sharing the snapshots (and parsed objects) until a command invalidates them
+    """
+    try:
+        source = sys.stdin if name == "-" else open(name, encoding="utf-8")
+    except OSError as e:
+        stderr(f'Cannot open file "{name}" for reading: {e.strerror}')
+        return libc.EXIT_FAILURE
+
+    # every command starts from the command line options
+    options = iproute4mac.options().replace(batch_mode=True)
+    res = libc.EXIT_SUCCESS
+    with source:
+        for lineno, line in _batch_lines(source):
+            try:
+                argv = shlex.split(line, comments=True)
+            except ValueError as e:
+                stderr(f"{e}")
+                ret = libc.EXIT_FAILURE
+            else:
+                if not argv:
+                    # blank line or comment
+                    continue
+                try:
+                    with iproute4mac.using(options):
+                        ret = do_cmd(argv)
+                except SystemExit as e:
+                    ret = e.code
+                sys.stdout.flush()
+            if ret:
+                stderr(f"Command failed {name}:{lineno}")
+                res = libc.EXIT_FAILURE
+                if not options["force"]:
+                    break
+    return res
+
+
+def sysctl(name):
+    with profiler.phase("shell", f"sysctl({name})"):
+        return backend.get().sysctl(name)
+
+
+def getifaddrs():
+    with profiler.phase("shell", "getifaddrs()"):
+        return backend.get().getifaddrs()
+
+
+def route_dump():
+    with profiler.phase("shell", "route_dump()"):
+        return backend.get().route_dump()
+
+
+def route_socket():
+    return backend.get().route_socket()
+
+
+def route_request(message):
+    """
+    Write a routing message, invalidating the affected snapshots
+
+    Input:
+    `message` callable returning the encoded message (see rtsock.message())
+
+    Output:
+    the errno of the request (0 on success), None if there is no routing socket
+    """
+    if (sock := route_socket()) is None:
+        return None
+    try:
+        with sock:
+            msg = message()
+            info(f"writing routing message type {msg[3]}")
+            return rtsock.request(sock, msg)
+    finally:
+        invalidate(*_INVALIDATES["route"])
+        cache.invalidate(*_INVALIDATES["route"])
+
+
+def get_prefsrc(host, dev=None):
+    """
+    Source address the kernel selects to reach `host` (through interface
+    `dev`, if given), None if unreachable
+    """
     if not isinstance(host, Prefix):
         raise ValueError(f"host ({type(host)}) must by of {Prefix}")
-    sock = socket.socket(host.family, socket.SOCK_DGRAM)
-    sock.connect((repr(host), 7))
-    src = sock.getsockname()[0]
-    sock.close()
-    return src
+    with profiler.phase("shell", "get_prefsrc()"):
+        return backend.get().source_address(repr(host), dev=dev)
 
 
 def do_notsupported(*args):
     if args:
-        error('"' + " ".join(map(str, args)) + '" not supported')
+        error('"' + " ".join(map(str, args)) + '" not supported', kind="unsupported")
     else:
-        error("function not supported")
+        error("function not supported", kind="unsupported")
 
 
 def do_notimplemented(*args):
     if args:
-        error('"' + " ".join(map(str, args)) + '" not implemented')
+        error('"' + " ".join(map(str, args)) + '" not implemented', kind="unsupported")
     else:
-        error("function not implemented")
+        error("function not implemented", kind="unsupported")
+
+
+def lazy(module, name):
+    """
+    Function `name` of iproute4mac.`module`, imported on first call (e.g.
+    "ip -V" does not load every object of ip)
+    """
+
+    def function(*args, **kwargs):
+        return getattr(importlib.import_module(f"iproute4mac.{module}"), name)(*args, **kwargs)
+
+    function.__name__ = name
+    return function
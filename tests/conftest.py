@@ -0,0 +1,35 @@
+import os
+
+import pytest
+
+import iproute4mac.backend as backend
+
+
+_ARCHIVE = os.path.join(os.path.dirname(__file__), "fixtures", "macos.json")
+
+
+class CountingBackend(backend.ReplayBackend):
+    """
+    ReplayBackend keeping the argv of the commands run, in `calls`
+    """
+
+    __slots__ = ("calls",)
+
+    def __init__(self, archive):
+        super().__init__(archive)
+        self.calls = []
+
+    def run(self, args):
+        self.calls.append(tuple(args))
+        return super().run(args)
+
+
+@pytest.fixture
+def counting_backend():
+    """
+    CountingBackend of the macOS fixture, set as the backend of the test
+    """
+    res = CountingBackend(_ARCHIVE)
+    backend.set(res)
+    yield res
+    backend.set(None)
@@ -1,5 +1,34 @@
 import iproute4mac.nud as nud
 
 
+_ARP = """\
+Neighbor                Linklayer Address Expire(O) Expire(I)    Netif Refs Prbs
+192.168.1.1             aa:bb:cc:dd:ee:01 (none)    (none)         en0
+192.168.1.2             aa:bb:cc:dd:ee:02 (none)    (none)         en0
+192.168.1.3             aa:bb:cc:dd:ee:03 19m58s    19m58s         en0    1
+"""
+
+_NDP = """\
+Neighbor                             Linklayer Address  Netif Expire(O) Expire(I)    St Flgs Prbs
+fe80::1%lo0                          (incomplete)         lo0 permanent permanent    R
+fe80::2%en0                          aa:bb:cc:dd:ee:01    en0 permanent permanent    R
+fe80::3%en0                          aa:bb:cc:dd:ee:02    en0 23h59m58s 23h59m58s    S R
+"""
+
+
 def test_Nud():
     nud.Nud()
+
+
+def test_parse_without_trailing_columns():
+    # the optional columns (refs, flags, probes) of an entry do not run into the next one
+    nuds = nud.Nud.__new__(nud.Nud)._parse(_ARP, _NDP)
+    assert [str(n["dst"]) for n in nuds] == [
+        "192.168.1.1",
+        "192.168.1.2",
+        "192.168.1.3",
+        "fe80::1",
+        "fe80::2",
+        "fe80::3",
+    ]
+    assert [n["dev"] for n in nuds] == ["en0", "en0", "en0", "lo0", "en0", "en0"]
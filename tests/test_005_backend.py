@@ -0,0 +1,99 @@
+import json
+import os
+
+import iproute4mac.backend as backend
+import iproute4mac.ifconfig as ifconfig
+import iproute4mac.nud as nud
+import iproute4mac.route as route
+import iproute4mac.utils as utils
+
+from iproute4mac.prefix import Prefix
+
+
+_ARCHIVE = os.path.join(os.path.dirname(__file__), "fixtures", "macos.json")
+
+
+def setup_module(module):
+    """setup any state specific to the execution of the given module"""
+    utils.invalidate()
+    backend.replay(_ARCHIVE)
+
+
+def teardown_module(module):
+    """teardown any state that was previously setup with a setup_module method"""
+    utils.invalidate()
+    backend.set(None)
+
+
+def test_replay_Ifconfig():
+    links = ifconfig.Ifconfig()
+    assert [link.name for link in links] == ["lo0", "en0", "en1", "bridge0", "vlan0"]
+    assert links.lookup("interface", "vlan0")["vlan"]["parent"] == "en0"
+
+
+def test_replay_IpAddress():
+    links = ifconfig.IpAddress()
+    assert links.lookup("ifname", "en1")["master"] == "bridge0"
+    en0 = links.lookup("ifname", "en0")
+    assert [addr["local"] for addr in en0["addr_info"]] == [
+        "fe80::1c2f:3eaa:fe01:2345",
+        "192.168.1.10",
+    ]
+
+
+def test_replay_Routes():
+    routes = route.Routes()
+    assert routes[0].str(details=False) == "default via 192.168.1.1 dev en0 proto static"
+    assert any(str(r["dst"]) == "198.18.0.0/15" for r in routes)
+
+
+def test_replay_Nud():
+    assert "192.168.1.1 dev en0 lladdr aa:bb:cc:dd:ee:ff REACHABLE" in nud.Nud().str()
+
+
+def test_replay_FDB():
+    entries = ifconfig.FDB()
+    assert [e["mac"] for e in entries] == ["aa:bb:cc:00:00:01", "aa:bb:cc:00:00:02"]
+    assert all(e.bridge == "bridge0" for e in entries)
+
+
+def test_replay_RouteGet():
+    res = route.RouteGet(Prefix("8.8.8.8"))
+    assert res.dict()[0]["gateway"] == Prefix("192.168.1.1")
+    assert res.dict()[0]["dev"] == "en0"
+
+
+def test_replay_missing():
+    assert utils.shell("ifconfig", "-l", "-d", fatal=False) == 127
+
+
+def test_replay_sequence():
+    archive = {
+        "version": 1,
+        "shell": [
+            {"argv": ["ifconfig", "-l"], "returncode": 0, "stdout": "lo0\n", "stderr": ""},
+            {"argv": ["ifconfig", "-l"], "returncode": 0, "stdout": "lo0 en0\n", "stderr": ""},
+        ],
+    }
+    replay = backend.ReplayBackend(archive)
+    assert replay.run(["ifconfig", "-l"]).stdout == "lo0\n"
+    assert replay.run(["ifconfig", "-l"]).stdout == "lo0 en0\n"
+    assert replay.run(["ifconfig", "-l"]).stdout == "lo0 en0\n"
+
+
+def test_record(tmp_path):
+    archive = tmp_path / "record.json.gz"
+    recorder = backend.RecordBackend(archive)
+    assert recorder.run(["echo", "recorded"]).stdout == "recorded\n"
+    recorder.save()
+    replay = backend.ReplayBackend(archive)
+    cmd = replay.run(["echo", "recorded"])
+    assert (cmd.returncode, cmd.stdout, cmd.stderr) == (0, "recorded\n", "")
+
+
+def test_replay_cli(script_runner):
+    env = {**os.environ, backend.ENV_REPLAY: _ARCHIVE}
+    res = script_runner.run(["ip", "-j", "route", "show", "dev", "vlan0"], env=env)
+    assert res.returncode == 0
+    assert json.loads(res.stdout)[0]["dst"] == "10.0.100.0/24"
+    assert res.stderr == ""
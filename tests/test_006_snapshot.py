@@ -0,0 +1,59 @@
+import pytest
+
+import iproute4mac.backend as backend
+import iproute4mac.ifconfig as ifconfig
+import iproute4mac.nud as nud
+import iproute4mac.route as route
+import iproute4mac.utils as utils
+
+
+# commands counted by tests/conftest.py
+pytestmark = pytest.mark.usefixtures("counting_backend")
+
+
+def setup_function(function):
+    """setup any state specific to the execution of the given function"""
+    utils.invalidate()
+
+
+def teardown_function(function):
+    """teardown any state that was previously setup with a setup_function method"""
+    utils.invalidate()
+    backend.set(None)
+
+
+def test_shared_snapshot():
+    ifconfig.Ifconfig()
+    ifconfig.IpAddress()
+    ifconfig.Bridge()
+    route.Routes()
+    nud.Nud()
+    nud.Nud()
+    calls = backend.get().calls
+    assert calls.count(("ifconfig", "-L", "-m", "-v")) == 1
+    assert calls.count(("netstat", "-n", "-r")) == 1
+    assert calls.count(("arp", "-n", "-l", "-a")) == 1
+
+
+def test_invalidate_on_mutation():
+    ifconfig.IpAddress()
+    route.Routes()
+    nud.Nud()
+    route.run("delete", "198.18.0.0/15", fatal=False)
+    ifconfig.IpAddress()
+    route.Routes()
+    nud.Nud()
+    calls = backend.get().calls
+    assert calls.count(("netstat", "-n", "-r")) == 2
+    assert calls.count(("ifconfig", "-L", "-m", "-v")) == 1
+    assert calls.count(("arp", "-n", "-l", "-a")) == 1
+
+    ifconfig.run("en0", "down", fatal=False)
+    ifconfig.IpAddress()
+    assert calls.count(("ifconfig", "-L", "-m", "-v")) == 2
+
+
+def test_failure_not_cached():
+    assert utils.snapshot("ifconfig", "bridge9", "addr", fatal=False) == 127
+    assert utils.snapshot("ifconfig", "bridge9", "addr", fatal=False) == 127
+    assert backend.get().calls.count(("ifconfig", "bridge9", "addr")) == 2
@@ -0,0 +1,80 @@
+import os
+import threading
+
+import iproute4mac.backend as backend
+import iproute4mac.ifconfig as ifconfig
+import iproute4mac.nud as nud
+import iproute4mac.utils as utils
+
+
+_ARCHIVE = os.path.join(os.path.dirname(__file__), "fixtures", "macos.json")
+
+
+class BarrierBackend(backend.ReplayBackend):
+    """
+    Every command waits for the others: a serial caller would time out
+    """
+
+    __slots__ = ("_barrier",)
+
+    def __init__(self, archive, parties):
+        super().__init__(archive)
+        self._barrier = threading.Barrier(parties, timeout=5)
+
+    def run(self, args):
+        self._barrier.wait()
+        return super().run(args)
+
+
+def setup_function(function):
+    """setup any state specific to the execution of the given function"""
+    utils.invalidate()
+
+
+def teardown_function(function):
+    """teardown any state that was previously setup with a setup_function method"""
+    utils.invalidate()
+    backend.set(None)
+
+
+def test_Nud():
+    backend.set(BarrierBackend(_ARCHIVE, 2))
+    assert len(nud.Nud()) > 0
+
+
+def test_FDB():
+    bridges = ["bridge0", "bridge1", "bridge2"]
+    shell = [
+        {"argv": ["ifconfig", "-l"], "returncode": 0, "stdout": " ".join(bridges), "stderr": ""}
+    ]
+    for index, bridge in enumerate(bridges):
+        shell.append(
+            {
+                "argv": ["ifconfig", bridge, "addr"],
+                "returncode": 0,
+                "stdout": f"aa:bb:cc:00:00:0{index} Vlan1 en{index} 0 flags=0<>\n",
+                "stderr": "",
+            }
+        )
+    # "ifconfig -l" is not part of the fan-out
+    backend.set(backend.ReplayBackend({"version": 1, "shell": shell}))
+    utils.snapshot("ifconfig", "-l")
+    backend.set(BarrierBackend({"version": 1, "shell": shell}, len(bridges)))
+    entries = ifconfig.FDB()
+    assert [(e.bridge, e["ifname"]) for e in entries] == list(zip(bridges, ["en0", "en1", "en2"]))
+
+
+def test_snapshots_order():
+    backend.replay(_ARCHIVE)
+    arp, ifl, ndp = utils.snapshots(
+        ("arp", "-n", "-l", "-a"), ("ifconfig", "-l"), ("ndp", "-n", "-l", "-a")
+    )
+    assert arp.startswith("Neighbor")
+    assert ifl == "lo0 en0 en1 bridge0 vlan0"
+    assert ndp.startswith("Neighbor")
+
+
+def test_snapshots_not_fatal():
+    backend.replay(_ARCHIVE)
+    res = utils.snapshots(("ifconfig", "-l"), ("ifconfig", "bridge9", "addr"), fatal=False)
+    assert res == ["lo0 en0 en1 bridge0 vlan0", 127]
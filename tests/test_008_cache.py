@@ -0,0 +1,149 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+
+import iproute4mac.backend as backend
+import iproute4mac.cache as cache
+import iproute4mac.ifconfig as ifconfig
+import iproute4mac.nud as nud
+import iproute4mac.route as route
+import iproute4mac.utils as utils
+
+from iproute4mac import OPTION
+
+
+_ARCHIVE = os.path.join(os.path.dirname(__file__), "fixtures", "macos.json")
+
+
+# commands counted by tests/conftest.py
+pytestmark = pytest.mark.usefixtures("counting_backend")
+
+
+def setup_function(function):
+    """setup any state specific to the execution of the given function"""
+    utils.invalidate()
+    OPTION["cache"] = 60
+
+
+def teardown_function(function):
+    """teardown any state that was previously setup with a setup_function method"""
+    OPTION["cache"] = 0
+    utils.invalidate()
+    backend.set(None)
+
+
+def test_shared_across_invocations(tmp_path, monkeypatch):
+    monkeypatch.setenv(cache.ENV_CACHE_DIR, str(tmp_path))
+    links = ifconfig.IpAddress()
+    routes = route.Routes()
+    neighs = nud.Nud()
+    # a new invocation only has the on-disk entries
+    utils.invalidate()
+    assert ifconfig.IpAddress().dict() == links.dict()
+    assert route.Routes().dict() == routes.dict()
+    assert nud.Nud().dict() == neighs.dict()
+    calls = backend.get().calls
+    assert calls.count(("ifconfig", "-L", "-m", "-v")) == 1
+    assert calls.count(("netstat", "-n", "-r")) == 1
+    assert calls.count(("arp", "-n", "-l", "-a")) == 1
+
+
+def test_replaced(tmp_path, monkeypatch):
+    monkeypatch.setenv(cache.ENV_CACHE_DIR, str(tmp_path))
+    disk = cache.DiskCache(60)
+    assert disk.get("Nud", ["arp -n -l -a"], lambda: "first", tag="1") == "first"
+    assert disk.get("Nud", ["arp -n -l -a"], lambda: "second", tag="1") == "first"
+    # e.g. parsed from the output of another expire countdown
+    assert disk.get("Nud", ["arp -n -l -a"], lambda: "third", tag="2") == "third"
+    assert sorted(name.rpartition(".")[2] for name in os.listdir(tmp_path)) == ["lock", "pickle"]
+    cache.invalidate("Nud")
+    assert os.listdir(tmp_path) == []
+
+
+def test_untrusted(tmp_path, monkeypatch):
+    disk = cache.DiskCache(60, str(tmp_path))
+    assert disk.get("test", ["key"], lambda: "first") == "first"
+    (entry,) = [name for name in os.listdir(tmp_path) if name.endswith(".pickle")]
+    assert os.stat(tmp_path / entry).st_mode & 0o777 == 0o600
+    # written by another user
+    os.chmod(tmp_path / entry, 0o620)
+    assert disk.get("test", ["key"], lambda: "second") == "second"
+    os.chmod(tmp_path, 0o770)
+    assert disk.get("test", ["key"], lambda: "third") == "third"
+    os.chmod(tmp_path, 0o700)
+    assert disk.get("test", ["key"], lambda: "fourth") == "second"
+
+    # HOME kept by sudo
+    monkeypatch.delenv(cache.ENV_CACHE_DIR, raising=False)
+    monkeypatch.setattr(os, "geteuid", lambda: os.getuid() + 1)
+    assert cache.directory().endswith(f"iproute4mac-{os.getuid() + 1}")
+
+
+def test_expired(tmp_path):
+    disk = cache.DiskCache(0.05, str(tmp_path))
+    calls = []
+    assert disk.get("test", ["key"], lambda: calls.append(1) or "first") == "first"
+    assert disk.get("test", ["key"], lambda: calls.append(1) or "second") == "first"
+    time.sleep(0.1)
+    assert disk.get("test", ["key"], lambda: calls.append(1) or "third") == "third"
+    assert len(calls) == 2
+
+
+def test_single_refresh(tmp_path):
+    disk = cache.DiskCache(60, str(tmp_path))
+    started = threading.Event()
+    calls = []
+
+    def refresh():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return "value"
+
+    res = []
+    threads = [threading.Thread(target=lambda: res.append(disk.get("test", ["key"], refresh)))]
+    threads[0].start()
+    started.wait(5)
+    threads.append(threading.Thread(target=lambda: res.append(disk.get("test", ["key"], refresh))))
+    threads[1].start()
+    for thread in threads:
+        thread.join()
+    assert res == ["value", "value"]
+    assert len(calls) == 1
+
+
+def test_failure_not_cached(tmp_path, monkeypatch):
+    monkeypatch.setenv(cache.ENV_CACHE_DIR, str(tmp_path))
+    assert utils.snapshot("ifconfig", "bridge9", "addr", fatal=False) == 127
+    assert utils.snapshot("ifconfig", "bridge9", "addr", fatal=False) == 127
+    assert backend.get().calls.count(("ifconfig", "bridge9", "addr")) == 2
+
+
+def test_invalidate_on_mutation(tmp_path, monkeypatch):
+    monkeypatch.setenv(cache.ENV_CACHE_DIR, str(tmp_path))
+    ifconfig.IpAddress()
+    route.Routes()
+    nud.Nud()
+    route.run("delete", "198.18.0.0/15", fatal=False)
+    utils.invalidate()
+    ifconfig.IpAddress()
+    route.Routes()
+    nud.Nud()
+    calls = backend.get().calls
+    assert calls.count(("netstat", "-n", "-r")) == 2
+    assert calls.count(("ifconfig", "-L", "-m", "-v")) == 1
+    assert calls.count(("arp", "-n", "-l", "-a")) == 1
+
+
+def test_cache_cli(script_runner, tmp_path):
+    env = {**os.environ, backend.ENV_REPLAY: _ARCHIVE, cache.ENV_CACHE_DIR: str(tmp_path)}
+    for _ in range(2):
+        res = script_runner.run(
+            ["ip", "-cache", "60", "-j", "route", "show", "dev", "vlan0"], env=env
+        )
+        assert res.returncode == 0
+        assert json.loads(res.stdout)[0]["dst"] == "10.0.100.0/24"
+    assert any(name.startswith("Routes-") for name in os.listdir(tmp_path))
@@ -0,0 +1,95 @@
+import os
+
+import pytest
+
+import iproute4mac.backend as backend
+import iproute4mac.cmd.ip as ip
+import iproute4mac.ifconfig as ifconfig
+import iproute4mac.utils as utils
+
+from iproute4mac import OPTION
+
+
+_ARCHIVE = os.path.join(os.path.dirname(__file__), "fixtures", "macos.json")
+
+
+# commands counted by tests/conftest.py
+pytestmark = pytest.mark.usefixtures("counting_backend")
+
+
+def setup_function(function):
+    """setup any state specific to the execution of the given function"""
+    utils.invalidate()
+
+
+def teardown_function(function):
+    """teardown any state that was previously setup with a setup_function method"""
+    OPTION["batch_mode"] = False
+    OPTION["force"] = False
+    utils.invalidate()
+    backend.set(None)
+
+
+def test_batch_shared(tmp_path, capsys):
+    batch = tmp_path / "batch"
+    batch.write_text(
+        "# comment\naddress show\n\nroute show \\\n  dev vlan0\naddress show dev en0\n"
+    )
+    assert utils.batch(str(batch), ip.do_obj) == 0
+    out = capsys.readouterr().out
+    assert "10.0.100.0/24 proto static scope link src 10.0.100.1" in out
+    assert out.count(" en0: <") == 2
+    calls = backend.get().calls
+    assert calls.count(("ifconfig", "-L", "-m", "-v")) == 1
+    assert calls.count(("netstat", "-n", "-r", "-f", "inet")) == 1
+
+
+def test_batch_parsed_copies():
+    OPTION["batch_mode"] = True
+    links = ifconfig.IpAddress()
+    links.pop()
+    assert len(ifconfig.IpAddress()) == len(links) + 1
+
+
+def test_batch_invalidate(tmp_path):
+    batch = tmp_path / "batch"
+    batch.write_text(
+        "address show\nroute show\nroute delete 198.18.0.0/15\nroute show\naddress show\n"
+    )
+    OPTION["force"] = True
+    utils.batch(str(batch), ip.do_obj)
+    calls = backend.get().calls
+    assert calls.count(("netstat", "-n", "-r", "-f", "inet")) == 2
+    assert calls.count(("ifconfig", "-L", "-m", "-v")) == 1
+
+
+def test_batch_failure(tmp_path, capsys):
+    batch = tmp_path / "batch"
+    batch.write_text('route show dev vlan0\nbogus\nroute show "dev\n')
+    assert utils.batch(str(batch), ip.do_obj) == 1
+    err = capsys.readouterr().err
+    assert f"Command failed {batch}:2" in err
+    assert f"Command failed {batch}:3" not in err
+
+    OPTION["force"] = True
+    assert utils.batch(str(batch), ip.do_obj) == 1
+    err = capsys.readouterr().err
+    assert f"Command failed {batch}:2" in err
+    assert f"Command failed {batch}:3" in err
+
+
+def test_batch_missing_file(tmp_path, capsys):
+    assert utils.batch(str(tmp_path / "missing"), ip.do_obj) == 1
+    assert "Cannot open file" in capsys.readouterr().err
+
+
+def test_batch_stdin(script_runner, tmp_path):
+    batch = tmp_path / "batch"
+    batch.write_text("route show dev vlan0\nlink show dev vlan0\n")
+    env = {**os.environ, backend.ENV_REPLAY: _ARCHIVE}
+    with open(batch) as stdin:
+        res = script_runner.run(["ip", "-batch", "-"], env=env, stdin=stdin)
+    assert res.returncode == 0
+    assert res.stdout.startswith("10.0.100.0/24 proto static scope link src 10.0.100.1\n")
+    assert "vlan0@en0:" in res.stdout
+    assert res.stderr == ""
@@ -0,0 +1,77 @@
+import json
+import os
+import socket
+
+import iproute4mac.backend as backend
+import iproute4mac.ifconfig as ifconfig
+import iproute4mac.route as route
+import iproute4mac.utils as utils
+
+
+_ARCHIVE = os.path.join(os.path.dirname(__file__), "fixtures", "macos.json")
+
+
+def setup_function(function):
+    """setup any state specific to the execution of the given function"""
+    utils.invalidate()
+
+
+def teardown_function(function):
+    """teardown any state that was previously setup with a setup_function method"""
+    utils.invalidate()
+    backend.set(None)
+
+
+def _core(links):
+    return [
+        (
+            link["ifindex"],
+            link["ifname"],
+            link["flags"],
+            link["mtu"],
+            link["link_type"],
+            link["address"],
+            [(a["family"], a["local"], a["prefixlen"], a["scope"]) for a in link["addr_info"]],
+        )
+        for link in links
+    ]
+
+
+def test_native_matches_ifconfig(counting_backend):
+    native = ifconfig.NativeIpAddress()
+    assert counting_backend.calls == []
+    assert _core(native) == _core(ifconfig.IpAddress())
+
+
+def test_native_fallback():
+    with open(_ARCHIVE) as source:
+        archive = json.load(source)
+    del archive["getifaddrs"]
+    backend.set(backend.ReplayBackend(archive))
+    assert ifconfig.NativeIpAddress().dict() == ifconfig.IpAddress().dict()
+
+
+def test_routes_without_ifconfig(counting_backend):
+    routes = route.Routes()
+    assert [r["prefsrc"] for r in routes if str(r["dst"]) == "10.0.100.0/24"] == ["10.0.100.1"]
+    assert counting_backend.calls == [("netstat", "-n", "-r")]
+
+
+def test_native_live():
+    backend.live()
+    links = ifconfig.NativeIpAddress()
+    assert len(links) == len(socket.if_nameindex())
+    for index, name in socket.if_nameindex():
+        link = links.lookup("ifname", name)
+        assert link["ifindex"] == str(index)
+        assert int(link["mtu"]) > 0
+    loopback = next(link for link in links if link["link_type"] == "loopback")
+    assert "127.0.0.1" in [a["local"] for a in loopback["addr_info"]]
+
+
+def test_record(tmp_path):
+    archive = tmp_path / "record.json"
+    recorder = backend.RecordBackend(archive)
+    recorded = recorder.getifaddrs()
+    recorder.save()
+    assert backend.ReplayBackend(archive).getifaddrs() == recorded
@@ -0,0 +1,72 @@
+import base64
+import json
+import os
+
+import pytest
+
+import iproute4mac.backend as backend
+import iproute4mac.route as route
+import iproute4mac.rtsock as rtsock
+import iproute4mac.utils as utils
+
+
+_FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+_ARCHIVE = os.path.join(_FIXTURES, "macos.json")
+# NET_RT_DUMP of the same routing table of the "netstat -n -r" in macos.json
+_RT_DUMP = os.path.join(_FIXTURES, "rt_dump.bin")
+_NAMES = {1: "lo0", 11: "en0", 21: "vlan0"}
+
+
+def _dump():
+    with open(_RT_DUMP, "rb") as source:
+        return source.read()
+
+
+def setup_function(function):
+    """setup any state specific to the execution of the given function"""
+    utils.invalidate()
+
+
+def teardown_function(function):
+    """teardown any state that was previously setup with a setup_function method"""
+    utils.invalidate()
+    backend.set(None)
+
+
+def test_messages():
+    msgs = list(rtsock.messages(_dump()))
+    assert len(msgs) == 18
+    assert all(msg["type"] == rtsock.RTM_GET for msg in msgs)
+    assert sum(msg["msglen"] for msg in msgs) == len(_dump())
+    default = msgs[0]
+    assert default["index"] == 11
+    assert default["addrs"] == rtsock.RTA_DST | rtsock.RTA_GATEWAY | rtsock.RTA_NETMASK
+    assert rtsock.sockaddr_str(default["sockaddrs"][rtsock.RTA_GATEWAY]) == "192.168.1.1"
+    # sockaddrs are views on the dump
+    assert isinstance(default["sockaddrs"][rtsock.RTA_DST], memoryview)
+
+
+def test_routes():
+    entries = list(rtsock.routes(_dump(), _NAMES, now=1700000000))
+    assert entries[0] == ("default", None, "192.168.1.1", "UGScg", "en0", None)
+    assert entries[1] == ("10.0.100.0", "24", "link#21", "UCS", "vlan0", None)
+    assert ("192.168.1.1", None, "aa:bb:cc:dd:ee:ff", "UHLWIir", "en0", "1180") in entries
+    assert ("198.18.0.0", "15", "lo0", "USc", "lo0", None) in entries
+    # KAME embedded scope
+    assert ("fe80::", "64", "link#11", "UCI", "en0", None) in entries
+
+
+def test_truncated():
+    with pytest.raises(ValueError):
+        list(rtsock.messages(_dump()[:-1]))
+
+
+def test_Routes_from_dump():
+    backend.replay(_ARCHIVE)
+    expected = route.Routes().dict()
+    with open(_ARCHIVE) as source:
+        archive = json.load(source)
+    archive["route_dump"] = base64.b64encode(_dump()).decode()
+    backend.set(backend.ReplayBackend(archive))
+    utils.invalidate()
+    assert route.Routes().dict() == expected
@@ -0,0 +1,165 @@
+import errno
+import ipaddress
+import socket
+import struct
+import threading
+
+import pytest
+
+import iproute4mac.backend as backend
+import iproute4mac.iproute as iproute
+import iproute4mac.rtsock as rtsock
+import iproute4mac.utils as utils
+
+
+# offset of rtm_errno in struct rt_msghdr
+_RTM_ERRNO = 24
+
+
+class _SocketpairBackend(backend.Backend):
+    """
+    Route socket stand-in: every message is answered with the next errno of `replies`
+    """
+
+    __slots__ = ("messages", "replies")
+
+    def __init__(self, *replies):
+        self.messages = []
+        self.replies = list(replies)
+
+    def route_socket(self):
+        sock, kernel = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        threading.Thread(target=self._kernel, args=(kernel,), daemon=True).start()
+        return sock
+
+    def _kernel(self, kernel):
+        with kernel:
+            msg = bytearray(kernel.recv(65536))
+            self.messages.append(next(rtsock.messages(bytes(msg))))
+            # some other process message first
+            other = bytearray(msg)
+            struct.pack_into("=i", other, 16, 1)
+            kernel.send(other)
+            struct.pack_into("=i", msg, _RTM_ERRNO, self.replies.pop(0) if self.replies else 0)
+            kernel.send(msg)
+
+
+def setup_function(function):
+    """setup any state specific to the execution of the given function"""
+    utils.invalidate()
+
+
+def teardown_function(function):
+    """teardown any state that was previously setup with a setup_function method"""
+    utils.invalidate()
+    backend.set(None)
+
+
+def test_message():
+    dst = rtsock.sockaddr_inet(ipaddress.ip_address("198.18.0.0"))
+    netmask = rtsock.sockaddr_netmask(15, 4)
+    gateway = rtsock.sockaddr_inet(ipaddress.ip_address("fe80::1"), index=4)
+    msg = rtsock.message(
+        rtsock.RTM_ADD,
+        {rtsock.RTA_NETMASK: netmask, rtsock.RTA_DST: dst, rtsock.RTA_GATEWAY: gateway},
+        index=4,
+        flags=rtsock.RTF_UP | rtsock.RTF_GATEWAY,
+        metrics={"mtu": 1400, "hopcount": 3},
+        locks=("mtu",),
+        seq=42,
+    )
+    (res,) = rtsock.messages(msg)
+    assert res["msglen"] == len(msg)
+    assert res["type"] == rtsock.RTM_ADD
+    assert res["index"] == 4
+    assert res["seq"] == 42
+    assert res["addrs"] == rtsock.RTA_DST | rtsock.RTA_GATEWAY | rtsock.RTA_NETMASK
+    assert res["inits"] == rtsock.RTV_MTU | rtsock.RTV_HOPCOUNT
+    assert res["rmx"]["locks"] == rtsock.RTV_MTU
+    assert res["rmx"]["mtu"] == 1400
+    assert res["rmx"]["hopcount"] == 3
+    sockaddrs = res["sockaddrs"]
+    assert rtsock.sockaddr_str(sockaddrs[rtsock.RTA_DST]) == "198.18.0.0"
+    assert rtsock.netmask_prefixlen(sockaddrs[rtsock.RTA_NETMASK], rtsock._AF_INET) == 15
+    # KAME embedded scope
+    assert bytes(sockaddrs[rtsock.RTA_GATEWAY][10:12]) == b"\0\4"
+    assert rtsock.sockaddr_str(sockaddrs[rtsock.RTA_GATEWAY]) == "fe80::1"
+
+
+def test_sockaddr_dl():
+    sa = rtsock.sockaddr_dl(7, "en0")
+    assert len(sa) == 20
+    assert rtsock.sockaddr_str(sa) == "en0"
+
+
+def test_request():
+    sock = _SocketpairBackend(errno.EEXIST)
+    msg = rtsock.message(rtsock.RTM_ADD, {})
+    with sock.route_socket() as s:
+        assert rtsock.request(s, msg) == errno.EEXIST
+
+
+def test_request_no_reply(monkeypatch):
+    msg = rtsock.message(rtsock.RTM_ADD, {})
+    sock, kernel = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+    with sock, kernel:
+        monkeypatch.setattr(rtsock, "_TIMEOUT", 0.1)
+        assert rtsock.request(sock, msg) == errno.ETIMEDOUT
+        # closed by the other end
+        kernel.shutdown(socket.SHUT_WR)
+        assert rtsock.request(sock, msg) == errno.ECONNRESET
+
+
+def test_add(capsys):
+    sock = _SocketpairBackend()
+    backend.set(sock)
+    iproute.iproute_modify("add", "198.18.0.0/15 via 192.168.1.1 mtu lock 1400 expires 60".split())
+    (msg,) = sock.messages
+    assert msg["type"] == rtsock.RTM_ADD
+    assert msg["flags"] == rtsock.RTF_UP | rtsock.RTF_STATIC | rtsock.RTF_GATEWAY
+    assert msg["inits"] == rtsock.RTV_MTU | rtsock.RTV_EXPIRE
+    assert msg["rmx"]["locks"] == rtsock.RTV_MTU
+    # absolute
+    assert msg["rmx"]["expire"] > 60
+    assert rtsock.sockaddr_str(msg["sockaddrs"][rtsock.RTA_GATEWAY]) == "192.168.1.1"
+
+
+def test_add_host_dev():
+    index, name = socket.if_nameindex()[0]
+    sock = _SocketpairBackend()
+    backend.set(sock)
+    iproute.iproute_modify("add", f"192.0.2.1 dev {name}".split())
+    (msg,) = sock.messages
+    assert msg["flags"] & rtsock.RTF_HOST
+    assert msg["addrs"] == rtsock.RTA_DST | rtsock.RTA_GATEWAY
+    assert rtsock.sockaddr_str(msg["sockaddrs"][rtsock.RTA_GATEWAY]) == name
+    assert msg["index"] == 0
+
+
+@pytest.mark.parametrize(
+    "cmd, reply, error",
+    (
+        ("add", errno.EEXIST, "RTNETLINK answers: File exists\n"),
+        ("delete", errno.ESRCH, "RTNETLINK answers: No such process\n"),
+    ),
+)
+def test_errors(capsys, cmd, reply, error):
+    backend.set(_SocketpairBackend(reply))
+    with pytest.raises(SystemExit) as e:
+        iproute.iproute_modify(cmd, ["198.18.0.0/15", "via", "192.168.1.1"])
+    assert e.value.code == 2
+    assert capsys.readouterr().err == error
+
+
+def test_replace():
+    sock = _SocketpairBackend(errno.ESRCH, 0)
+    backend.set(sock)
+    iproute.iproute_modify("replace", ["198.18.0.0/15", "via", "192.168.1.1"])
+    assert [msg["type"] for msg in sock.messages] == [rtsock.RTM_CHANGE, rtsock.RTM_ADD]
+
+
+def test_replace_existing():
+    sock = _SocketpairBackend()
+    backend.set(sock)
+    iproute.iproute_modify("replace", ["198.18.0.0/15", "via", "192.168.1.1"])
+    assert [msg["type"] for msg in sock.messages] == [rtsock.RTM_CHANGE]
@@ -0,0 +1,181 @@
+import ipaddress
+import json
+import socket
+
+import pytest
+
+import iproute4mac.backend as backend
+import iproute4mac.ipmonitor as ipmonitor
+import iproute4mac.rtsock as rtsock
+import iproute4mac.utils as utils
+
+from iproute4mac import OPTION
+
+
+# no such interface: named "if<index>"
+_INDEX = 999
+_IFF_UP_RUNNING = 0x41
+
+
+class _SocketpairBackend(backend.Backend):
+    """
+    Route socket stand-in injecting recorded messages, split across two writes
+    """
+
+    __slots__ = ("_messages",)
+
+    def __init__(self, *messages):
+        self._messages = b"".join(messages)
+
+    def route_socket(self):
+        sock, kernel = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        with kernel:
+            middle = len(self._messages) // 2 + 1
+            kernel.sendall(self._messages[:middle])
+            kernel.sendall(self._messages[middle:])
+        return sock
+
+
+def _inet(address):
+    return rtsock.sockaddr_inet(ipaddress.ip_address(address))
+
+
+def _route(rtm_type, dst, prefixlen, gateway, flags=rtsock.RTF_GATEWAY | rtsock.RTF_STATIC):
+    return rtsock.message(
+        rtm_type,
+        {
+            rtsock.RTA_DST: _inet(dst),
+            rtsock.RTA_GATEWAY: _inet(gateway),
+            rtsock.RTA_NETMASK: rtsock.sockaddr_netmask(prefixlen, 4),
+        },
+        index=_INDEX,
+        flags=rtsock.RTF_UP | flags,
+    )
+
+
+def _neigh(rtm_type, dst, lladdr):
+    # sockaddr_dl with a 6 bytes sdl_alen
+    gateway = rtsock._SOCKADDR_DL.pack(20, rtsock._AF_LINK, _INDEX, 0, 0, 6, 0)
+    gateway = (gateway + bytes.fromhex(lladdr.replace(":", ""))).ljust(20, b"\0")
+    return rtsock.message(
+        rtm_type,
+        {rtsock.RTA_DST: _inet(dst), rtsock.RTA_GATEWAY: gateway},
+        index=_INDEX,
+        flags=rtsock.RTF_UP | rtsock.RTF_HOST | rtsock.RTF_LLINFO,
+    )
+
+
+def _address(rtm_type, address, prefixlen, broadcast):
+    sockaddrs = rtsock.sockaddr_netmask(prefixlen, 4) + _inet(address) + _inet(broadcast)
+    addrs = rtsock.RTA_NETMASK | rtsock.RTA_IFA | rtsock.RTA_BRD
+    head = rtsock._IFA_MSGHDR.pack(
+        rtsock._IFA_MSGHDR.size + len(sockaddrs), rtsock._RTM_VERSION, rtm_type, addrs, 0, _INDEX, 0
+    )
+    return head + sockaddrs
+
+
+def _link(flags, mtu):
+    if_data = rtsock._IF_DATA_MTU.pack(mtu).ljust(96, b"\0")
+    size = rtsock._IF_MSGHDR.size + len(if_data)
+    head = rtsock._IF_MSGHDR.pack(size, rtsock._RTM_VERSION, rtsock.RTM_IFINFO, 0, flags, _INDEX)
+    return head + if_data
+
+
+_MESSAGES = (
+    _link(_IFF_UP_RUNNING, 1500),
+    _address(rtsock.RTM_NEWADDR, "192.0.2.1", 24, "192.0.2.255"),
+    _route(rtsock.RTM_ADD, "198.18.0.0", 15, "192.0.2.254"),
+    _neigh(rtsock.RTM_ADD, "192.0.2.254", "aa:bb:cc:dd:ee:ff"),
+    # not monitored
+    rtsock.message(rtsock.RTM_GET, {rtsock.RTA_DST: _inet("198.18.0.1")}),
+    _route(rtsock.RTM_DELETE, "198.18.0.0", 15, "192.0.2.254"),
+    _address(rtsock.RTM_DELADDR, "192.0.2.1", 24, "192.0.2.255"),
+)
+
+
+def setup_function(function):
+    """setup any state specific to the execution of the given function"""
+    utils.invalidate()
+    backend.set(_SocketpairBackend(*_MESSAGES))
+
+
+def teardown_function(function):
+    """teardown any state that was previously setup with a setup_function method"""
+    OPTION["json"] = False
+    OPTION["timestamp"] = False
+    OPTION["timestamp_short"] = False
+    OPTION["preferred_family"] = 0
+    utils.invalidate()
+    backend.set(None)
+
+
+def test_stream():
+    sock = backend.get().route_socket()
+    with sock:
+        msgs = list(rtsock.stream(sock, bufsize=7))
+    assert [msg["type"] for msg in msgs] == [
+        rtsock.RTM_IFINFO,
+        rtsock.RTM_NEWADDR,
+        rtsock.RTM_ADD,
+        rtsock.RTM_ADD,
+        rtsock.RTM_GET,
+        rtsock.RTM_DELETE,
+        rtsock.RTM_DELADDR,
+    ]
+    assert msgs[0]["mtu"] == 1500
+    assert msgs[1]["index"] == _INDEX
+
+
+def test_monitor(capsys):
+    assert ipmonitor.do_ipmonitor([]) == 0
+    assert capsys.readouterr().out.splitlines() == [
+        f"{_INDEX}: if{_INDEX}: <UP,RUNNING> mtu 1500 state UP",
+        f"{_INDEX}: if{_INDEX}    inet 192.0.2.1/24 brd 192.0.2.255 scope global if{_INDEX}",
+        f"198.18.0.0/15 via 192.0.2.254 dev if{_INDEX} proto static",
+        f"192.0.2.254 dev if{_INDEX} lladdr aa:bb:cc:dd:ee:ff REACHABLE",
+        f"Deleted 198.18.0.0/15 via 192.0.2.254 dev if{_INDEX} proto static",
+        f"Deleted {_INDEX}: if{_INDEX}    inet 192.0.2.1/24 brd 192.0.2.255 scope global "
+        f"if{_INDEX}",
+    ]
+
+
+def test_monitor_objects(capsys):
+    assert ipmonitor.do_ipmonitor(["route", "all"]) == 0
+    assert capsys.readouterr().out.splitlines() == [
+        f"[ROUTE]198.18.0.0/15 via 192.0.2.254 dev if{_INDEX} proto static",
+        f"[ROUTE]Deleted 198.18.0.0/15 via 192.0.2.254 dev if{_INDEX} proto static",
+    ]
+
+
+def test_monitor_family(capsys):
+    OPTION["preferred_family"] = socket.AF_INET6
+    assert ipmonitor.do_ipmonitor(["address", "route", "neigh"]) == 0
+    assert capsys.readouterr().out == ""
+
+
+def test_monitor_json(capsys):
+    OPTION["json"] = True
+    OPTION["timestamp"] = True
+    assert ipmonitor.do_ipmonitor(["address"]) == 0
+    new, deleted = map(json.loads, capsys.readouterr().out.splitlines())
+    assert "timestamp" in new
+    assert "deleted" not in new
+    assert new["ifname"] == f"if{_INDEX}"
+    assert new["addr_info"][0]["local"] == "192.0.2.1"
+    assert new["addr_info"][0]["prefixlen"] == 24
+    assert deleted["deleted"] is True
+
+
+def test_monitor_timestamp(capsys):
+    OPTION["timestamp"] = True
+    OPTION["timestamp_short"] = True
+    assert ipmonitor.do_ipmonitor(["link"]) == 0
+    (line,) = capsys.readouterr().out.splitlines()
+    assert line.startswith("[")
+    assert line.endswith(f"] {_INDEX}: if{_INDEX}: <UP,RUNNING> mtu 1500 state UP")
+
+
+def test_monitor_unknown(capsys):
+    with pytest.raises(SystemExit):
+        ipmonitor.do_ipmonitor(["foo"])
+    assert capsys.readouterr().err == 'Argument "foo" is unknown, try "ip monitor help".\n'
@@ -0,0 +1,97 @@
+import os
+import sys
+
+import pytest
+
+import iproute4mac.backend as backend
+import iproute4mac.route as route
+import iproute4mac.utils as utils
+
+from iproute4mac import OPTION
+from iproute4mac.data import _Item, _Items
+
+
+_ARCHIVE = os.path.join(os.path.dirname(__file__), "fixtures", "macos.json")
+
+
+class _Counter(_Item):
+    def __init__(self, value):
+        self._data = {"value": value, "even": value % 2 == 0}
+
+    def str(self, details=True):
+        return f"value {self['value']}"
+
+
+class _Counters(_Items):
+    """
+    Items parsed on demand, counting how many have been
+    """
+
+    __slots__ = ("parsed",)
+
+    def __init__(self, count):
+        self.parsed = 0
+        self._data = self._parse(count)
+
+    def _parse(self, count):
+        for value in range(count):
+            self.parsed += 1
+            yield _Counter(value)
+
+
+def setup_function(function):
+    """setup any state specific to the execution of the given function"""
+    utils.invalidate()
+    backend.replay(_ARCHIVE)
+
+
+def teardown_function(function):
+    """teardown any state that was previously setup with a setup_function method"""
+    OPTION["json"] = False
+    OPTION["pretty"] = False
+    utils.invalidate()
+    backend.set(None)
+
+
+@pytest.mark.parametrize("pretty", (False, True))
+@pytest.mark.parametrize("count", (0, 1, 3))
+def test_json_iterdumps(pretty, count):
+    OPTION["pretty"] = pretty
+    records = [{"value": value, "list": ["a", "b"], "dicts": [{"a": 1}]} for value in range(count)]
+    assert "".join(utils.json_iterdumps(iter(records))) == utils.json_dumps(records)
+
+
+def test_lazy():
+    items = _Counters(10)
+    items.filter(lambda item: item["even"])
+    items.delete_keys("even")
+    assert items.parsed == 0
+    records = items.iterdict()
+    assert next(records) == {"value": 0}
+    assert items.parsed == 1
+    # any other access parses everything
+    items = _Counters(10)
+    assert len(items) == 10
+    assert items.parsed == 10
+
+
+@pytest.mark.parametrize("json", (False, True))
+def test_output_Routes(capsys, json):
+    OPTION["json"] = json
+    expected = utils.json_dumps(route.Routes().dict()) if json else route.Routes().str()
+    utils.invalidate()
+    utils.output(route.Routes())
+    assert capsys.readouterr().out == expected + "\n"
+
+
+def test_broken_pipe(monkeypatch):
+    read, write = os.pipe()
+    os.close(read)
+    stdout = os.fdopen(write, "w", buffering=1)
+    monkeypatch.setattr(sys, "stdout", stdout)
+    items = _Counters(100000)
+    with pytest.raises(SystemExit) as e, stdout:
+        utils.output(items)
+    assert e.value.code == 1
+    # parsing stopped at the first write
+    assert items.parsed == 1
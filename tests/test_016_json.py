@@ -0,0 +1,178 @@
+import copy
+import json
+import random
+import re
+
+import iproute4mac.utils as utils
+
+from _ctypes import PyObj_FromPtr
+
+from iproute4mac.prefix import Prefix
+
+
+def _pretty(obj):
+    return json.dumps(obj, cls=utils.PrettyJSON, indent=4)
+
+
+def _link(index):
+    return {
+        "ifindex": index,
+        "ifname": f"feth{index}",
+        "flags": ["BROADCAST", "MULTICAST", "UP", "LOWER_UP"],
+        "mtu": 1500,
+        "operstate": "UP",
+        "address": "aa:bb:cc:dd:ee:ff",
+        "addr_info": [
+            {"family": "inet", "local": Prefix("192.0.2.1"), "prefixlen": 24},
+            {"family": "inet6", "local": Prefix("fe80::1"), "prefixlen": 64},
+        ],
+        "linkinfo": {"info_kind": "feth", "info_data": {"peer": None}},
+        "options": [],
+    }
+
+
+def test_pretty():
+    assert _pretty([]) == "[ ]"
+    assert _pretty({}) == "{}"
+    assert _pretty(["it's", 'a "b"', "c"]) == """[ "it"s","a "b"","c" ]"""
+    assert _pretty([{}, {"a": []}]) == '[ {},{\n        "a": [ ]\n    } ]'
+    assert _pretty([1, {"a": 1}, {"b": [{"c": None}, 2]}]) == (
+        "[\n"
+        "    1,\n"
+        "    {\n"
+        '        "a": 1\n'
+        "    },{\n"
+        '        "b": [ {\n'
+        '                "c": null\n'
+        "            },\n"
+        "            2\n"
+        "        ]\n"
+        "    } ]"
+    )
+    # only lists (not tuples) of strings are flattened
+    assert _pretty({"a": (["x"], "y")}) == (
+        '{\n    "a": [\n        [\n            "x"\n        ],\n        "y"\n    ]\n}'
+    )
+    assert _pretty({1: 1.5, None: Prefix("10.0.0.0/8")}) == (
+        '{\n    "1": 1.5,\n    "null": "10.0.0.0/8"\n}'
+    )
+
+
+def test_pretty_dump():
+    links = [_link(index) for index in range(2)]
+    assert _pretty(links) == (
+        "[ {\n"
+        '        "ifindex": 0,\n'
+        '        "ifname": "feth0",\n'
+        '        "flags": [ "BROADCAST","MULTICAST","UP","LOWER_UP" ],\n'
+        '        "mtu": 1500,\n'
+        '        "operstate": "UP",\n'
+        '        "address": "aa:bb:cc:dd:ee:ff",\n'
+        '        "addr_info": [ {\n'
+        '                "family": "inet",\n'
+        '                "local": "192.0.2.1",\n'
+        '                "prefixlen": 24\n'
+        "            },{\n"
+        '                "family": "inet6",\n'
+        '                "local": "fe80::1",\n'
+        '                "prefixlen": 64\n'
+        "            } ],\n"
+        '        "linkinfo": {\n'
+        '            "info_kind": "feth",\n'
+        '            "info_data": {\n'
+        '                "peer": null\n'
+        "            }\n"
+        "        },\n"
+        '        "options": [ ]\n'
+        "    },{\n" + _pretty([links[1]])[len("[ {\n") : -len(" ]")] + " ]"
+    )
+    # the input is left untouched
+    assert links[0]["flags"] == ["BROADCAST", "MULTICAST", "UP", "LOWER_UP"]
+
+
+class _NoIndent:
+    def __init__(self, value):
+        self.value = value
+
+    def __repr__(self):
+        if self.value:
+            reps = (repr(v) for v in self.value)
+            return "[ " + ",".join(reps).replace("'", '"') + " ]"
+        return "[ ]"
+
+
+def _unindent_list(obj):
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            obj[k] = _unindent_list(v)
+    elif isinstance(obj, list):
+        if all(isinstance(x, str) for x in obj):
+            return _NoIndent(obj)
+        for index, entry in enumerate(obj):
+            obj[index] = _unindent_list(entry)
+    return obj
+
+
+class _FormerPrettyJSON(json.JSONEncoder):
+    """
+    The former encoder, indenting the whole document and then rewriting it
+    """
+
+    FORMAT_SPEC = "@@{}@@"
+    regex = re.compile(FORMAT_SPEC.format(r"(\d+)"))
+
+    def default(self, obj):
+        if isinstance(obj, _NoIndent):
+            return self.FORMAT_SPEC.format(id(obj))
+        if isinstance(obj, Prefix):
+            return str(obj)
+        return super().default(obj)
+
+    def encode(self, obj):
+        obj = _unindent_list(obj)
+        format_spec = self.FORMAT_SPEC
+        json_repr = super().encode(obj)
+        for match in self.regex.finditer(json_repr):
+            id = int(match.group(1))
+            json_repr = json_repr.replace(f'"{format_spec.format(id)}"', repr(PyObj_FromPtr(id)))
+        json_repr = re.sub(r"\[\n\s+{", "[ {", json_repr)
+        json_repr = re.sub(r"},\n\s+{", "},{", json_repr)
+        json_repr = re.sub(r"}\n\s*\]", "} ]", json_repr)
+        return json_repr
+
+
+def _document(rand, depth=0):
+    """
+    Random document of the values ip and bridge write
+    """
+    scalars = (
+        lambda: rand.randint(-5, 5000),
+        lambda: rand.random() * 100,
+        lambda: rand.choice([None, True, False]),
+        lambda: rand.choice(["", "en0", "UP", "it's", "a b"]),
+        lambda: Prefix(rand.choice(["192.0.2.1", "10.0.0.0/8", "fe80::1"])),
+    )
+    if depth >= 3:
+        return rand.choice(scalars)()
+    kind = rand.randrange(5)
+    if kind == 0:
+        return {f"k{index}": _document(rand, depth + 1) for index in range(rand.randrange(4))}
+    if kind == 1:
+        return [_document(rand, depth + 1) for _ in range(rand.randrange(4))]
+    if kind == 2:
+        return [rand.choice(["BROADCAST", "UP", "x"]) for _ in range(rand.randrange(4))]
+    if kind == 3:
+        return [_document(rand, 2) if rand.random() < 0.2 else {} for _ in range(3)]
+    return rand.choice(scalars)()
+
+
+def test_same_as_former():
+    """
+    Byte-identical to the former encoder
+    """
+    rand = random.Random(0)
+    documents = [[_link(index) for index in range(50)]]
+    documents += [_document(rand) for _ in range(500)]
+    for document in documents:
+        former = json.dumps(copy.deepcopy(document), cls=_FormerPrettyJSON, indent=4)
+        assert _pretty(document) == former
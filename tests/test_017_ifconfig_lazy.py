@@ -0,0 +1,82 @@
+import os
+import pickle
+
+import iproute4mac.backend as backend
+import iproute4mac.ifconfig as ifconfig
+import iproute4mac.utils as utils
+
+from iproute4mac import OPTION
+
+
+_ARCHIVE = os.path.join(os.path.dirname(__file__), "fixtures", "macos.json")
+
+
+def setup_function(function):
+    """setup any state specific to the execution of the given function"""
+    utils.invalidate()
+    backend.replay(_ARCHIVE)
+
+
+def teardown_function(function):
+    """teardown any state that was previously setup with a setup_function method"""
+    OPTION["batch_mode"] = False
+    utils.invalidate()
+    backend.set(None)
+
+
+def _unparsed(item):
+    return {key for key, value in item._data.items() if value is ifconfig._Unparsed}
+
+
+def test_lazy():
+    links = ifconfig.IpAddress()
+    en0 = links.lookup("ifname", "en0")
+    assert en0["addr_info"]
+    assert en0.dict(details=False)
+    # expensive ifconfig fields are never parsed
+    assert {"media", "supported_media", "agent", "scheduler", "qosmarking"} <= _unparsed(
+        en0._ifconfig
+    )
+    # nor the optional ones, without details
+    assert {"eflags", "linkinfo"} <= _unparsed(en0)
+    assert "eflags" in en0.dict(details=True)
+    assert not _unparsed(en0)
+
+
+def test_full():
+    """
+    Fields are the same, in the same order, whatever the order they are parsed in
+    """
+    for eager, lazy in zip(ifconfig.Ifconfig(), ifconfig.Ifconfig()):
+        for key in reversed(list(eager._data)):
+            lazy.get(key)
+        assert list(eager.data.items()) == list(lazy.data.items())
+        assert not _unparsed(lazy)
+    assert str(ifconfig.Ifconfig()) == ifconfig.run().rstrip()
+
+
+def test_missing():
+    lo0 = ifconfig.Ifconfig().lookup("interface", "lo0")
+    # fields not in the output are dropped once parsed
+    assert "peer" not in lo0
+    assert "peer" not in lo0._data
+    assert lo0.get("peer", "<none>") == "<none>"
+    assert lo0["vlan"] == {}
+
+
+def test_delete():
+    links = ifconfig.IpAddress()
+    for link in links:
+        del link["addr_info"]
+        assert "addr_info" not in link.data
+    assert all("addr_info" not in _unparsed(link._ifconfig) for link in links)
+
+
+def test_pickle():
+    OPTION["batch_mode"] = True
+    links = ifconfig.IpAddress()
+    # reused, and still lazy
+    assert ifconfig.IpAddress().dict(details=True) == links.dict(details=True)
+    links = ifconfig.IpAddress()
+    assert _unparsed(links[0]._ifconfig)
+    assert pickle.loads(pickle.dumps(links[0])).dict() == links[0].dict()
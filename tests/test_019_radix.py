@@ -0,0 +1,95 @@
+import ipaddress
+import os
+import random
+
+import iproute4mac.backend as backend
+import iproute4mac.radix as radix
+import iproute4mac.route as route
+import iproute4mac.utils as utils
+
+from iproute4mac.prefix import Prefix
+
+
+_ARCHIVE = os.path.join(os.path.dirname(__file__), "fixtures", "macos.json")
+
+
+def setup_function(function):
+    """setup any state specific to the execution of the given function"""
+    utils.invalidate()
+    backend.replay(_ARCHIVE)
+
+
+def teardown_function(function):
+    """teardown any state that was previously setup with a setup_function method"""
+    utils.invalidate()
+    backend.set(None)
+
+
+def _net(prefix):
+    network = ipaddress.ip_network(prefix)
+    return int(network.network_address), network.prefixlen
+
+
+def test_trie():
+    trie = radix.RadixTrie(32)
+    for value, prefix in enumerate(("0.0.0.0/0", "10.0.0.0/8", "10.1.0.0/16", "10.1.2.3/32")):
+        trie.insert(*_net(prefix), value)
+    trie.insert(*_net("10.1.0.0/16"), "again")
+    assert trie.longest(_net("10.1.2.3/32")[0]) == [3]
+    assert trie.longest(_net("10.1.9.9/32")[0]) == [2, "again"]
+    assert trie.longest(_net("192.0.2.1/32")[0]) == [0]
+    assert trie.supernets(*_net("10.1.2.0/24")) == [0, 1, 2, "again"]
+    assert sorted(map(str, trie.subnets(*_net("10.0.0.0/8")))) == ["1", "2", "3", "again"]
+    assert trie.subnets(*_net("10.2.0.0/16")) == []
+    assert trie.exact(*_net("10.1.0.0/16")) == [2, "again"]
+    assert trie.exact(*_net("10.1.0.0/24")) == []
+    assert trie.first(*_net("10.1.0.0/16")) == 2
+    assert trie.first(*_net("11.0.0.0/8")) is None
+
+
+def _prefixes(count, seed=4):
+    rand = random.Random(seed)
+    res = [Prefix("default"), Prefix("default", version=4), Prefix("default", version=6)]
+    for _ in range(count):
+        if rand.random() < 0.7:
+            address = ipaddress.IPv4Address(
+                rand.choice((0x0A000000, 0xC0A80000)) | rand.getrandbits(16)
+            )
+            prefixlen = rand.choice((8, 16, 20, 24, 30, 32))
+        else:
+            address = ipaddress.IPv6Address((0xFE80 << 112) | rand.getrandbits(16))
+            prefixlen = rand.choice((10, 64, 112, 128))
+        res.append(Prefix(f"{address}/{prefixlen}", pack=True))
+    return res
+
+
+def test_prefix_trie():
+    """
+    Same results of Prefix comparisons, one by one
+    """
+    prefixes = _prefixes(300)
+    trie = radix.PrefixTrie((prefix, index) for index, prefix in enumerate(prefixes))
+    for to in _prefixes(100, seed=5):
+        assert sorted(trie.subnets(to)) == [i for i, p in enumerate(prefixes) if p in to]
+        assert sorted(trie.supernets(to)) == [i for i, p in enumerate(prefixes) if to in p]
+        assert sorted(trie.exact(to)) == [i for i, p in enumerate(prefixes) if to == p]
+        if to._initialized and not to.is_default:
+            assert trie.first(to) == next((i for i, p in enumerate(prefixes) if p in to), None)
+
+
+def test_longest():
+    trie = route.Routes().table()
+    (res,) = trie.longest(Prefix("192.168.1.77"))
+    assert str(res["dst"]) == "192.168.1.0/24"
+    (res,) = trie.longest(Prefix("8.8.8.8"))
+    assert str(res["dst"]) == "default"
+    assert trie.longest(Prefix("default")) == []
+
+
+def test_prefsrc():
+    inet = ["fe80::1", "192.0.2.1", "10.0.0.1", "10.0.0.2"]
+    trie = radix.PrefixTrie((address, address) for address in inet)
+    entry = ("10.0.0.0", "8", "link#4", "UCS", "en0", None)
+    assert route.from_entry(entry, trie)["prefsrc"] == Prefix("10.0.0.1")
+    entry = ("198.18.0.0", "15", "link#4", "UCS", "en0", None)
+    assert route.from_entry(entry, trie)["prefsrc"] is None
@@ -0,0 +1,155 @@
+import os
+
+import iproute4mac.backend as backend
+import iproute4mac.iproute as iproute
+import iproute4mac.route as route
+import iproute4mac.simulator as simulator
+import iproute4mac.utils as utils
+
+from iproute4mac import OPTION
+from iproute4mac.prefix import Prefix
+
+
+_ARCHIVE = os.path.join(os.path.dirname(__file__), "fixtures", "macos.json")
+
+
+def setup_function(function):
+    """setup any state specific to the execution of the given function"""
+    utils.invalidate()
+    backend.replay(_ARCHIVE)
+
+
+def teardown_function(function):
+    """teardown any state that was previously setup with a setup_function method"""
+    OPTION["json"] = False
+    OPTION["uid"] = -1
+    OPTION["preferred_family"] = 0
+    utils.invalidate()
+    backend.set(None)
+
+
+def test_route_gets():
+    hosts = [Prefix(host) for host in ("8.8.8.8", "10.0.100.5", "2001:db8::1", "fe80::5")]
+    res = route.RouteGets(hosts, uid=501).dict(details=True)
+    assert res == [
+        {
+            "dst": Prefix("8.8.8.8"),
+            "gateway": Prefix("192.168.1.1"),
+            "dev": "en0",
+            "prefsrc": "192.168.1.10",
+            "flags": ["UP", "GATEWAY", "DONE", "STATIC", "PRCLONING", "GLOBAL"],
+            "uid": 501,
+            "metrics": [{"mtu": 1500}],
+            "cache": [],
+        },
+        {
+            "dst": Prefix("10.0.100.5"),
+            "dev": "vlan0",
+            "prefsrc": "10.0.100.1",
+            "flags": ["UP", "DONE", "CLONING", "STATIC"],
+            "uid": 501,
+            "metrics": [{"mtu": 1500}],
+            "cache": [],
+        },
+        # 2001:db8::1 is unreachable (no IPv6 default route)
+        {
+            "dst": Prefix("fe80::5"),
+            "gateway": Prefix("fe80::1"),
+            "dev": "lo0",
+            "prefsrc": "fe80::1",
+            "flags": ["UP", "DONE", "PRCLONING", "IFSCOPE"],
+            "uid": 501,
+            "metrics": [{"mtu": 16384}],
+            "cache": [],
+        },
+    ]
+
+
+def test_same_as_route_get():
+    """
+    Same output of the route -n get archived in the fixture
+    """
+    (single,) = route.RouteGet(Prefix("8.8.8.8"), uid=0).dict()
+    (batch,) = route.RouteGets([Prefix("8.8.8.8")], uid=0).dict(details=True)
+    assert batch == single
+
+
+def test_same_as_route_get_simulated():
+    """
+    Same output of route -n get, host and local address routes included
+    """
+    network = simulator.Network()
+    network.run(["ifconfig", "en0", "inet6", "2001:db8::10/64"])
+    backend.simulate(network)
+    for host in ("8.8.8.8", "127.0.0.1", "192.168.1.10", "192.168.1.20", "::1", "2001:db8::10"):
+        single = route.RouteGet(Prefix(host), uid=0).dict()
+        assert route.RouteGets([Prefix(host)], uid=0).dict(details=True) == single, host
+
+
+def test_json_prefsrc(capsys):
+    OPTION["json"] = True
+    assert iproute.iproute_get(["8.8.8.8"]) == 0
+    assert '"prefsrc":"192.168.1.10"' in capsys.readouterr().out
+
+
+def test_two_subnets(capsys):
+    """
+    Source address of the subnet of the host, else the one selected by the kernel
+    """
+    network = simulator.Network()
+    network.run(["ifconfig", "en0", "inet", "10.0.0.5/24", "alias"])
+    backend.simulate(network)
+    assert iproute.iproute_get(["uid", "0", "10.0.0.7", "to", "8.8.8.8"]) == 0
+    assert capsys.readouterr().out.splitlines()[::3] == [
+        "10.0.0.7 dev en0 src 10.0.0.5 uid 0",
+        "8.8.8.8 via 192.168.1.1 dev en0 src 192.168.1.10 uid 0",
+    ]
+
+
+def test_file(tmp_path, capsys):
+    hosts = tmp_path / "hosts"
+    hosts.write_text("# hosts\n8.8.8.8 192.168.1.77  # gateway and LAN\n\n10.0.100.5\n")
+    OPTION["json"] = True
+    assert iproute.iproute_get(["file", str(hosts)]) == 0
+    out = capsys.readouterr().out
+    assert out.count('"dst"') == 3
+    assert '"dst":"192.168.1.77","dev":"en0","prefsrc":"192.168.1.10"' in out
+
+
+def test_many_to(capsys):
+    assert iproute.iproute_get(["uid", "0", "to", "8.8.8.8", "10.0.100.5"]) == 0
+    assert capsys.readouterr().out.splitlines()[::3] == [
+        "8.8.8.8 via 192.168.1.1 dev en0 src 192.168.1.10 uid 0",
+        "10.0.100.5 dev vlan0 src 10.0.100.1 uid 0",
+    ]
+
+
+def test_scoped():
+    network = simulator.Network()
+    network.run(["ifconfig", "en1", "inet", "192.168.2.10/24", "up"])
+    network.run(["route", "-n", "add", "-ifscope", "en1", "default", "192.168.2.1"])
+    # listed before the default route of the primary interface
+    network.routes.insert(0, network.routes.pop())
+    backend.simulate(network)
+    hosts = [Prefix("8.8.8.8")]
+    assert [item["dev"] for item in route.RouteGets(hosts, uid=0).dict()] == ["en0"]
+    assert [item["dev"] for item in route.RouteGets(hosts, dev="en1", uid=0).dict()] == ["en1"]
+    assert [item["dev"] for item in route.RouteGets(hosts, dev="en0", uid=0).dict()] == ["en0"]
+
+
+def test_unreachable(capsys):
+    assert iproute.iproute_get(["8.8.8.8", "2001:db8::1"]) == 1
+    out, err = capsys.readouterr()
+    assert out.startswith("8.8.8.8 via 192.168.1.1 dev en0")
+    assert err == "RTNETLINK answers: Network is unreachable (2001:db8::1)\n"
+
+
+def test_oif(capsys):
+    network = simulator.Network()
+    network.run(["ifconfig", "en1", "inet", "192.168.2.10/24", "up"])
+    network.run(["route", "-n", "add", "-ifscope", "en1", "default", "192.168.2.1"])
+    backend.simulate(network)
+    assert iproute.iproute_get(["oif", "en1", "8.8.8.8"]) == 0
+    assert capsys.readouterr().out.startswith("8.8.8.8 via 192.168.2.1 dev en1 src 192.168.2.10")
+    assert iproute.iproute_get(["dev", "en2", "8.8.8.8"]) == 1
+    assert capsys.readouterr().err == 'Cannot find device "en2"\n'
@@ -0,0 +1,108 @@
+import os
+import time
+
+import iproute4mac.backend as backend
+import iproute4mac.ifconfig as ifconfig
+import iproute4mac.route as route
+import iproute4mac.utils as utils
+
+from iproute4mac.prefix import Prefix
+
+
+_ARCHIVE = os.path.join(os.path.dirname(__file__), "fixtures", "macos.json")
+
+
+def setup_function(function):
+    """setup any state specific to the execution of the given function"""
+    utils.invalidate()
+    backend.replay(_ARCHIVE)
+
+
+def teardown_function(function):
+    """teardown any state that was previously setup with a setup_function method"""
+    utils.invalidate()
+    backend.set(None)
+
+
+def _scan(items, key, value):
+    """
+    Linear lookup (the former _Items.lookup())
+    """
+    return next((item for item in items if item.present(key, value)), None)
+
+
+def test_lookup():
+    for items, key, values in (
+        (ifconfig.IpAddress(), "ifname", ["lo0", "en0", "vlan0", "bridge0", "nope"]),
+        (ifconfig.IpAddress(), "ifindex", ["1", "12", 12, "99"]),
+        (ifconfig.IpAddress(), "address", ["00:00:00:00:00:00", "ff:ff:ff:ff:ff:ff"]),
+        (ifconfig.Ifconfig(), "interface", ["lo0", "en1", "nope"]),
+        (ifconfig.FDB(), "mac", ["aa:bb:cc:00:00:02", "nope"]),
+        (ifconfig.FDB(), "ifname", ["en1"]),
+        (
+            route.Routes(),
+            "dst",
+            ["default", "192.168.1.0/24", Prefix("10.0.100.1"), Prefix("default"), "::"],
+        ),
+        (route.Routes(), "gateway", ["192.168.1.1", Prefix("fe80::1"), "localhost"]),
+    ):
+        for value in values:
+            assert items.lookup(key, value) is _scan(items, key, value), (key, value)
+        # any key, also of unhashable values
+        assert items.lookup("flags", items[-1]["flags"]) is _scan(
+            items, "flags", items[-1]["flags"]
+        )
+
+
+def test_invalidate():
+    links = ifconfig.IpAddress()
+    assert links.exist("en0")
+    en0 = links.lookup("ifname", "en0")
+    links.set([link for link in links if link is not en0])
+    assert not links.exist("en0")
+    links.append(en0)
+    assert links.lookup("ifname", "en0") is en0
+    links.pop()
+    assert links.lookup("ifname", "en0") is None
+    # values changed in place are checked against
+    lo0 = links.lookup("ifname", "lo0")
+    lo0["ifname"] = "lo1"
+    assert links.lookup("ifname", "lo0") is None
+    links.filter(lambda link: True)
+    assert links.lookup("ifname", "lo1") is lo0
+
+
+def _bond(count):
+    """
+    ifconfig output of a bond of `count` feth interfaces
+    """
+    res = (
+        "bond0: flags=8843<UP,BROADCAST,RUNNING,SIMPLEX,MULTICAST> mtu 1500 index 1\n"
+        "\tether 0e:00:00:00:00:01\n"
+        f"\tbond interfaces: {' '.join(f'feth{index}' for index in range(count))}\n"
+    )
+    for index in range(count):
+        res += (
+            f"feth{index}: flags=8863<UP,BROADCAST,RUNNING,SIMPLEX,MULTICAST> mtu 1500 "
+            f"index {index + 2}\n"
+            f"\tether 0e:00:00:00:{index >> 8:02x}:{index & 0xFF:02x}\n"
+        )
+    return res
+
+
+def _link(text):
+    links = ifconfig.IpAddress.__new__(ifconfig.IpAddress)
+    start = time.perf_counter()
+    links._parse(text)
+    return time.perf_counter() - start, links
+
+
+def test_link_scale():
+    """
+    Benchmark: 8 times the bond members take about 8 times as long to link (quadratic: 64)
+    """
+    small = min(_link(_bond(500))[0] for _ in range(3))
+    large, links = min((_link(_bond(4000)) for _ in range(3)), key=lambda res: res[0])
+    print(f"bond members linking 4000/500: {large / small:.1f}x")
+    assert links.lookup("ifname", "feth3999").link is links.lookup("ifname", "bond0")
+    assert large / small < 24
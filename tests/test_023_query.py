@@ -0,0 +1,198 @@
+import base64
+import copy
+import json
+import os
+import re
+
+import iproute4mac.backend as backend
+import iproute4mac.ifconfig as ifconfig
+import iproute4mac.ipaddress as ipaddress
+import iproute4mac.iproute as iproute
+import iproute4mac.nud as nud
+import iproute4mac.route as route
+import iproute4mac.rtsock as rtsock
+import iproute4mac.socket as socket
+import iproute4mac.utils as utils
+
+from iproute4mac import OPTION
+from iproute4mac.prefix import Prefix
+from iproute4mac.query import Query
+
+
+_FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+_ARCHIVE = os.path.join(_FIXTURES, "macos.json")
+
+_ROUTE_GET_NET = """\
+   route to: 192.168.1.0
+destination: 192.168.1.0
+       mask: 255.255.255.0
+  interface: en0
+      flags: <UP,DONE,CLONING,STATIC>
+ recvpipe  sendpipe  ssthresh  rtt,msec    rttvar  hopcount      mtu     expire
+       0         0         0         0         0         0      1500         0
+"""
+
+
+def _archive():
+    with open(_ARCHIVE) as source:
+        return json.load(source)
+
+
+def _record(archive, argv, stdout, returncode=0):
+    archive["shell"].append(
+        {"argv": argv, "returncode": returncode, "stdout": stdout, "stderr": ""}
+    )
+
+
+def _without(archive, *argvs):
+    """
+    `archive` without the output of `argvs`: replaying them fails
+    """
+    archive = copy.deepcopy(archive)
+    archive["shell"] = [record for record in archive["shell"] if record["argv"] not in argvs]
+    return archive
+
+
+def _replay(archive):
+    utils.invalidate()
+    backend.set(backend.ReplayBackend(archive))
+
+
+def setup_function(function):
+    """setup any state specific to the execution of the given function"""
+    utils.invalidate()
+    backend.replay(_ARCHIVE)
+
+
+def teardown_function(function):
+    """teardown any state that was previously setup with a setup_function method"""
+    OPTION["preferred_family"] = socket._AF_UNSPEC
+    utils.invalidate()
+    backend.set(None)
+
+
+def test_query():
+    calls = []
+    query = Query().where(lambda item: calls.append(("where", item)) or item["a"] > 1)
+    query.map(lambda item: calls.append(("map", item)) or {**item, "b": item["a"] * 2})
+    query.where(lambda item: item["b"] < 8)
+    items = [{"a": 1}, {"a": 2}, {"a": 3}, {"a": 4}]
+    res = query.filter(iter(items))
+    # lazy
+    assert not calls
+    assert list(res) == [{"a": 2, "b": 4}, {"a": 3, "b": 6}]
+    # a single pass: every item goes through every step before the next one
+    assert calls[:3] == [("where", {"a": 1}), ("where", {"a": 2}), ("map", {"a": 2})]
+    assert list(Query().filter(items)) == items
+    assert not Query() and query
+    assert Query().hint("dev", "en0").hinted("dev") == "en0"
+
+
+def _full(function):
+    """
+    Output of `function` reading the whole fixture
+    """
+    utils.invalidate()
+    backend.replay(_ARCHIVE)
+    return function()
+
+
+def test_ifconfig_dev():
+    archive = _archive()
+    # no bond nor bridge to be en0 master
+    archive["getifaddrs"] = [
+        data for data in archive["getifaddrs"] if data["interface"] != "bridge0"
+    ]
+    full = next(
+        r["stdout"] for r in archive["shell"] if r["argv"] == ["ifconfig", "-L", "-m", "-v"]
+    )
+    en0 = re.search(r"^en0:.*\n(?:\t.*\n)*", full, flags=re.MULTILINE).group()
+    _record(archive, ["ifconfig", "-L", "-m", "-v", "en0"], en0)
+    expected = _full(lambda: ipaddress.get_links(["dev", "en0"]).dict(details=True))
+    _replay(_without(archive, ["ifconfig", "-L", "-m", "-v"]))
+    assert ipaddress.get_links(["dev", "en0"]).dict(details=True) == expected
+
+
+def test_ifconfig_master():
+    # en1 may be a bridge0 member: every interface is read
+    _replay(_without(_archive(), ["ifconfig", "-L", "-m", "-v", "en1"]))
+    assert [link["master"] for link in ipaddress.get_links(["dev", "en1"])] == ["bridge0"]
+
+
+def test_ifconfig_dev_master():
+    archive = _archive()
+    full = next(
+        r["stdout"] for r in archive["shell"] if r["argv"] == ["ifconfig", "-L", "-m", "-v"]
+    )
+    bridge0 = re.search(r"^bridge0:.*\n(?:\t.*\n)*", full, flags=re.MULTILINE).group()
+    # without its member en1
+    _record(archive, ["ifconfig", "-L", "-m", "-v", "bridge0"], bridge0)
+    links = _full(lambda: ipaddress.get_links([]).dict(details=True))
+    expected = [link for link in links if link["ifname"] == "bridge0"]
+    _replay(archive)
+    assert ipaddress.get_links(["dev", "bridge0"]).dict(details=True) == expected
+
+
+def test_netstat_family():
+    expected = _full(lambda: route.Routes().dict())
+    _replay(_without(_archive(), ["netstat", "-n", "-r"]))
+    for family, version in ((socket._AF_INET, 4), (socket._AF_INET6, 6)):
+        res = route.Routes(family=family).dict()
+        assert res == [r for r in expected if r["dst"].version in (0, version)]
+
+
+def test_rtsock_version():
+    with open(os.path.join(_FIXTURES, "rt_dump.bin"), "rb") as source:
+        dump = source.read()
+    names = {1: "lo0", 11: "en0", 21: "vlan0"}
+    entries = list(rtsock.routes(dump, names, now=0))
+    assert list(rtsock.routes(dump, names, now=0, version=6)) == [e for e in entries if ":" in e[0]]
+    assert list(rtsock.routes(dump, names, now=0, version=4)) == [
+        e for e in entries if ":" not in e[0]
+    ]
+    archive = _archive()
+    archive["route_dump"] = base64.b64encode(dump).decode()
+    _replay(archive)
+    expected = [r for r in route.Routes().dict() if r["dst"].version in (0, 6)]
+    utils.invalidate()
+    assert route.Routes(family=socket._AF_INET6).dict() == expected
+
+
+def test_route_exact(capsys):
+    _full(lambda: iproute.iproute_list(["exact", "192.168.1.0/24"]))
+    expected = capsys.readouterr().out
+    archive = _without(_archive(), ["netstat", "-n", "-r"], ["netstat", "-n", "-r", "-f", "inet"])
+    argv = ["route", "-n", "get", "-inet", "-net", "192.168.1.0/24"]
+    _record(archive, argv, _ROUTE_GET_NET)
+    _replay(archive)
+    OPTION["preferred_family"] = socket._AF_UNSPEC
+    assert iproute.iproute_list(["exact", "192.168.1.0/24"]) == 0
+    assert capsys.readouterr().out == expected
+    assert expected.startswith("192.168.1.0/24 dev en0 ")
+
+
+def test_route_exact_fallback(capsys):
+    # not in the table (not recorded): the whole table tells
+    OPTION["preferred_family"] = socket._AF_UNSPEC
+    assert iproute.iproute_list(["exact", "10.9.0.0/16"]) == 0
+    assert iproute.iproute_list(["exact", "10.0.100.0/24"]) == 0
+    out, err = capsys.readouterr()
+    assert out.startswith("10.0.100.0/24 dev vlan0 ") and out.count("\n") == 1
+
+
+def test_nud():
+    expected = _full(lambda: nud.Nud().dict())
+    archive = _without(_archive(), ["arp", "-n", "-l", "-a"], ["ndp", "-n", "-l", "-a"])
+    _replay(archive)
+    assert nud.Nud(dev="en0", family=socket._AF_INET).dict() == expected[:3]
+    host = Prefix("2001:db8::1")
+    _record(
+        archive, ["ndp", "-n", "-l", "2001:db8::1"], "2001:db8::1 (2001:db8::1) -- no entry\n", 1
+    )
+    _replay(archive)
+    assert nud.Nud(host=host, family=socket._AF_INET6).dict() == []
+
+
+def test_fdb_bridge():
+    _replay(_without(_archive(), ["ifconfig", "bridge0", "addr"]))
+    assert len(ifconfig.FDB(bridge="bridge1")) == 0
@@ -0,0 +1,66 @@
+import os
+import subprocess
+import sys
+
+
+_ARCHIVE = os.path.join(os.path.dirname(__file__), "fixtures", "macos.json")
+
+# imported only by the objects using them
+_SUBSYSTEMS = {
+    "iproute4mac.debug",
+    "iproute4mac.ifconfig",
+    "iproute4mac.ipaddress",
+    "iproute4mac.iplink",
+    "iproute4mac.iplink_bond",
+    "iproute4mac.iplink_bridge",
+    "iproute4mac.iplink_feth",
+    "iproute4mac.iplink_veth",
+    "iproute4mac.iplink_vlan",
+    "iproute4mac.ipmonitor",
+    "iproute4mac.ipneigh",
+    "iproute4mac.iproute",
+    "iproute4mac.nud",
+    "iproute4mac.route",
+    "iproute4mac.brfdb",
+    "iproute4mac.brlink",
+}
+
+
+def _imports(*args):
+    """
+    Modules imported by python `args`, as reported by -X importtime
+    """
+    res = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        capture_output=True,
+        encoding="utf-8",
+        env={**os.environ, "IPROUTE4MAC_REPLAY": _ARCHIVE},
+    )
+    assert res.returncode == 0, res.stderr
+    return {
+        line.split("|")[-1].strip()
+        for line in res.stderr.splitlines()
+        if line.startswith("import time:") and not line.endswith("| package")
+    }
+
+
+def test_import():
+    for cmd in ("ip", "bridge"):
+        modules = _imports("-c", f"import iproute4mac.cmd.{cmd}")
+        assert f"iproute4mac.cmd.{cmd}" in modules
+        assert not modules & _SUBSYSTEMS
+        # the version is resolved only for -V
+        assert "pbr.version" not in modules
+
+
+def test_version():
+    modules = _imports("-m", "iproute4mac.cmd.ip", "-V")
+    assert "pbr.version" in modules
+    assert not modules & _SUBSYSTEMS
+
+
+def test_object():
+    modules = _imports("-m", "iproute4mac.cmd.ip", "route", "show")
+    # modules loaded by importlib itself are not reported, but their imports are
+    assert "iproute4mac.route" in modules
+    assert not modules & {"iproute4mac.iplink", "iproute4mac.ipneigh", "iproute4mac.iplink_vlan"}
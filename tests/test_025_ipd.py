@@ -0,0 +1,172 @@
+import os
+import socket
+import threading
+
+import pytest
+
+import iproute4mac.backend as backend
+import iproute4mac.cmd.ip as ip
+import iproute4mac.ipd as ipd
+import iproute4mac.libc as libc
+import iproute4mac.rtsock as rtsock
+import iproute4mac.utils as utils
+
+from iproute4mac import OPTION
+
+
+# commands counted by tests/conftest.py
+pytestmark = pytest.mark.usefixtures("counting_backend")
+
+
+@pytest.fixture(autouse=True)
+def _environment(monkeypatch):
+    # forwarded whatever the backend of the calling environment
+    for env in (backend.ENV_REPLAY, backend.ENV_RECORD, backend.ENV_SIMULATE):
+        monkeypatch.delenv(env, raising=False)
+
+
+def setup_function(function):
+    """setup any state specific to the execution of the given function"""
+    utils.invalidate()
+
+
+def teardown_function(function):
+    """teardown any state that was previously setup with a setup_function method"""
+    OPTION["json"] = False
+    utils.invalidate()
+    backend.set(None)
+
+
+class _Daemon:
+    """
+    Daemon serving from a thread, its routing messages written to `events`
+    """
+
+    def __init__(self, path, events=True):
+        self.path = str(path)
+        self.server = ipd.listen(self.path)
+        self.events, source = socket.socketpair() if events else (None, None)
+        self.daemon = ipd.Daemon(self.server, events=source)
+        self.thread = threading.Thread(target=self.daemon.serve)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.daemon.stop()
+        self.thread.join()
+        self.server.close()
+        if self.events:
+            self.events.close()
+
+    def run(self, *argv, cmd="ip"):
+        return ipd.forward(cmd, list(argv), sock_path=self.path)
+
+
+def _direct(capsys, *argv):
+    """
+    Run by this process, as a new one (e.g. route show sets the preferred family)
+    """
+    utils.invalidate()
+    options = dict(OPTION)
+    res = ip.do_obj(list(argv))
+    OPTION.update(options)
+    return res, capsys.readouterr()
+
+
+def test_forward(tmp_path, capsys):
+    with _Daemon(tmp_path / "ipd.sock") as daemon:
+        assert daemon.run("route", "show") == libc.EXIT_SUCCESS
+        route_show = capsys.readouterr()
+        assert daemon.run("link", "show", "dev", "nope") == libc.EXIT_ERROR
+        link_show = capsys.readouterr()
+        OPTION["json"] = True
+        assert daemon.run("address", "show", "dev", "en0") == libc.EXIT_SUCCESS
+        address_show = capsys.readouterr()
+        assert daemon.run("bogus", cmd="bogus") == libc.EXIT_FAILURE
+        assert "unknown command" in capsys.readouterr().err
+    OPTION["json"] = False
+    assert route_show.out and _direct(capsys, "route", "show") == (libc.EXIT_SUCCESS, route_show)
+    assert link_show.err == 'Device "nope" does not exist.\n'
+    OPTION["json"] = True
+    assert address_show.out.startswith("[{")
+    assert _direct(capsys, "address", "show", "dev", "en0")[1] == address_show
+
+
+def test_events(tmp_path, capsys):
+    calls = backend.get().calls
+    with _Daemon(tmp_path / "ipd.sock") as daemon:
+        for _ in range(3):
+            assert daemon.run("route", "show") == libc.EXIT_SUCCESS
+            assert daemon.run("link", "show") == libc.EXIT_SUCCESS
+        # shared by every request
+        assert calls.count(("netstat", "-n", "-r", "-f", "inet")) == 1
+        assert calls.count(("ifconfig", "-L", "-m", "-v")) == 1
+        # a route changed: the links are still valid
+        msg = rtsock.message(rtsock.RTM_ADD, {})
+        daemon.events.sendall(msg[:10])
+        daemon.events.sendall(msg[10:] + rtsock.message(rtsock.RTM_GET, {}))
+        assert daemon.run("route", "show") == libc.EXIT_SUCCESS
+        assert daemon.run("link", "show") == libc.EXIT_SUCCESS
+        assert calls.count(("netstat", "-n", "-r", "-f", "inet")) == 2
+        assert calls.count(("ifconfig", "-L", "-m", "-v")) == 1
+        # bridge forwarding tables change silently
+        assert daemon.run("fdb", "show", cmd="bridge") == libc.EXIT_SUCCESS
+        assert daemon.run("fdb", "show", cmd="bridge") == libc.EXIT_SUCCESS
+        assert calls.count(("ifconfig", "bridge0", "addr")) == 2
+    capsys.readouterr()
+
+
+def test_no_events(tmp_path, capsys):
+    calls = backend.get().calls
+    with _Daemon(tmp_path / "ipd.sock", events=False) as daemon:
+        assert daemon.run("route", "show") == libc.EXIT_SUCCESS
+        assert daemon.run("route", "show") == libc.EXIT_SUCCESS
+    assert calls.count(("netstat", "-n", "-r", "-f", "inet")) == 2
+    capsys.readouterr()
+
+
+def test_stop(tmp_path):
+    server = ipd.listen(str(tmp_path / "ipd.sock"))
+    with server:
+        # stopped before serving
+        daemon = ipd.Daemon(server)
+        daemon.stop()
+        thread = threading.Thread(target=daemon.serve)
+        thread.start()
+        thread.join(timeout=5)
+        assert not thread.is_alive()
+
+
+def test_stale():
+    assert ipd.stale({"type": rtsock.RTM_IFINFO, "flags": rtsock.RTF_LLINFO}) == ("ifconfig",)
+    assert ipd.stale({"type": rtsock.RTM_DELETE, "flags": rtsock.RTF_LLINFO}) == (
+        "netstat",
+        "route",
+        "arp",
+        "ndp",
+    )
+    assert ipd.stale({"type": rtsock.RTM_GET, "flags": 0}) == ()
+    assert ipd.stale({"type": 0x42}) is None
+
+
+def test_fallback(tmp_path):
+    # no daemon
+    assert ipd.forward("ip", ["route", "show"], sock_path=str(tmp_path / "ipd.sock")) is None
+    # left by a daemon not running anymore
+    server = ipd.listen(str(tmp_path / "ipd.sock"))
+    server.close()
+    assert ipd.forward("ip", ["route", "show"], sock_path=str(tmp_path / "ipd.sock")) is None
+    ipd.listen(str(tmp_path / "ipd.sock")).close()
+
+
+def test_owner(tmp_path, monkeypatch, capsys):
+    with _Daemon(tmp_path / "ipd.sock") as daemon:
+        assert daemon.run("route", "show") == libc.EXIT_SUCCESS
+        capsys.readouterr()
+        # e.g. root, by sudo, and the daemon of the user
+        euid = os.geteuid()
+        monkeypatch.setattr(os, "geteuid", lambda: euid + 1)
+        assert daemon.run("route", "show") is None
+        assert capsys.readouterr().out == ""
@@ -0,0 +1,112 @@
+import json
+import os
+
+import pytest
+
+import iproute4mac
+import iproute4mac.api as api
+import iproute4mac.backend as backend
+import iproute4mac.cmd.bridge as bridge
+import iproute4mac.cmd.ip as ip
+import iproute4mac.socket as socket
+import iproute4mac.utils as utils
+
+from iproute4mac import OPTION
+
+
+_ARCHIVE = os.path.join(os.path.dirname(__file__), "fixtures", "macos.json")
+
+
+def setup_function(function):
+    """setup any state specific to the execution of the given function"""
+    utils.invalidate()
+    backend.replay(_ARCHIVE)
+
+
+def teardown_function(function):
+    """teardown any state that was previously setup with a setup_function method"""
+    utils.invalidate()
+    backend.set(None)
+
+
+def _json(capsys, do_obj, *argv, family=None):
+    """
+    JSON output of the CLI, run by this process as a new one
+    """
+    utils.invalidate()
+    options = iproute4mac.DEFAULTS.replace(json=True)
+    if family:
+        options = options.replace(preferred_family=socket.read_family(family))
+    with iproute4mac.using(options):
+        do_obj(list(argv))
+    return json.loads(capsys.readouterr().out)
+
+
+def _dicts(items, *keys):
+    """
+    Items as in the JSON output, without `keys` (e.g. fixed by a selector)
+    """
+    res = json.loads(utils.json_dumps([item.dict(details=False) for item in items]))
+    for entry in res:
+        for key in keys:
+            entry.pop(key, None)
+    return res
+
+
+def test_cli(capsys):
+    assert _dicts(api.links()) == _json(capsys, ip.do_obj, "link", "show")
+    assert _dicts(api.addresses(dev="en0", family="inet")) == _json(
+        capsys, ip.do_obj, "address", "show", "dev", "en0", family="inet"
+    )
+    assert _dicts(api.routes(family="inet6")) == _json(
+        capsys, ip.do_obj, "route", "show", family="inet6"
+    )
+    assert _dicts(api.neighbours(dev="en0"), "dev") == _json(
+        capsys, ip.do_obj, "neigh", "show", "dev", "en0"
+    )
+    assert _dicts(api.fdb(br="bridge0")) == _json(
+        capsys, bridge.do_obj, "fdb", "show", "br", "bridge0"
+    )
+    # no output
+    assert capsys.readouterr() == ("", "")
+
+
+def test_selectors():
+    inet = api.routes(family="inet")
+    inet6 = api.routes(family="inet6")
+    assert _dicts(api.routes()) == _dicts(inet) + _dicts(inet6)
+    # keys fixed by a selector are kept
+    assert all(route["dev"] == "en0" for route in api.routes(family="inet", dev="en0"))
+    assert all(link["flags"].count("UP") for link in api.links(up=True))
+    to = _dicts(api.route_get("8.8.8.8", "10.0.100.5"))
+    assert [route["dst"] for route in to] == ["8.8.8.8", "10.0.100.5"]
+
+
+def test_options():
+    with iproute4mac.using(iproute4mac.options().replace(json=True, preferred_family="sentinel")):
+        api.routes()
+        api.addresses(family="inet6")
+        assert OPTION["json"] is True
+        assert OPTION["preferred_family"] == "sentinel"
+
+
+def test_errors():
+    with pytest.raises(api.NotFound, match='Device "nope" does not exist.'):
+        api.addresses(dev="nope")
+    with pytest.raises(api.InvalidArgument):
+        api.routes(scope="nowhere")
+    with pytest.raises(api.InvalidArgument):
+        api.addresses(family="ipx")
+    with pytest.raises(api.InvalidArgument, match='prefix is expected rather than "bogus"'):
+        api.routes(to="bogus")
+    with pytest.raises(api.Unsupported):
+        api.routes(family="mpls", to="16")
+    # routing table not recorded
+    with open(_ARCHIVE, encoding="utf-8") as archive:
+        data = json.load(archive)
+    data["shell"] = [r for r in data["shell"] if r["argv"][0] != "netstat"]
+    backend.set(backend.ReplayBackend(data))
+    with pytest.raises(api.CommandError) as e:
+        api.routes(family="inet6")
+    assert e.value.command == ["netstat", "-n", "-r", "-f", "inet6"]
+    assert isinstance(e.value, api.Error)
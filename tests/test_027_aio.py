@@ -0,0 +1,118 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+import iproute4mac.aio as aio
+import iproute4mac.api as api
+import iproute4mac.backend as backend
+import iproute4mac.utils as utils
+
+
+_ARCHIVE = os.path.join(os.path.dirname(__file__), "fixtures", "macos.json")
+
+# seconds every command takes to run
+_DELAY = 0.2
+
+
+class SlowBackend(backend.ReplayBackend):
+    """
+    Replay commands taking _DELAY seconds each, recording how they are run
+    """
+
+    __slots__ = ("calls", "async_calls")
+
+    def __init__(self, archive):
+        super().__init__(archive)
+        self.calls = []
+        self.async_calls = []
+
+    def run(self, args):
+        self.calls.append(tuple(args))
+        time.sleep(_DELAY)
+        return super().run(args)
+
+    async def run_async(self, args):
+        self.async_calls.append(tuple(args))
+        await asyncio.sleep(_DELAY)
+        return super().run(args)
+
+
+def setup_function(function):
+    """setup any state specific to the execution of the given function"""
+    utils.invalidate()
+    backend.set(SlowBackend(_ARCHIVE))
+
+
+def teardown_function(function):
+    """teardown any state that was previously setup with a setup_function method"""
+    utils.invalidate()
+    backend.set(None)
+
+
+def _dicts(items):
+    return [item.dict() for item in items]
+
+
+def test_same_as_api():
+    async def gather():
+        return await asyncio.gather(
+            aio.links(),
+            aio.addresses(dev="en0", family="inet"),
+            aio.routes(family="inet6"),
+            aio.neighbours(dev="en0"),
+            aio.fdb(),
+            aio.route_get("8.8.8.8", "10.0.100.5"),
+        )
+
+    res = asyncio.run(gather())
+    # every command was run asynchronously
+    assert backend.get().calls == []
+    expected = [
+        api.links(),
+        api.addresses(dev="en0", family="inet"),
+        api.routes(family="inet6"),
+        api.neighbours(dev="en0"),
+        api.fdb(),
+        api.route_get("8.8.8.8", "10.0.100.5"),
+    ]
+    assert list(map(_dicts, res)) == list(map(_dicts, expected))
+
+
+def test_concurrent():
+    async def gather():
+        start = time.perf_counter()
+        res = await asyncio.gather(aio.links(), aio.routes(), aio.neighbours())
+        return res, time.perf_counter() - start
+
+    _, elapsed = asyncio.run(gather())
+    # ifconfig, netstat, arp and ndp
+    assert len(backend.get().async_calls) == 4
+    assert elapsed < 2 * _DELAY
+
+
+def test_loop_not_blocked():
+    async def ticker(ticks):
+        while True:
+            ticks.append(time.perf_counter())
+            await asyncio.sleep(_DELAY / 10)
+
+    async def run():
+        ticks = []
+        task = asyncio.create_task(ticker(ticks))
+        # not prefetched: run by the executor
+        await aio.routes(family="inet", to="192.168.1.0/24")
+        task.cancel()
+        return ticks
+
+    ticks = asyncio.run(run())
+    assert backend.get().calls
+    assert max(b - a for a, b in zip(ticks, ticks[1:])) < _DELAY
+
+
+def test_errors():
+    with pytest.raises(api.NotFound):
+        asyncio.run(aio.links(dev="nope"))
+    with pytest.raises(api.InvalidArgument):
+        asyncio.run(aio.neighbours(to="bogus"))
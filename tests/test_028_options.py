@@ -0,0 +1,141 @@
+import contextlib
+import io
+import os
+import threading
+
+import pytest
+
+import iproute4mac
+import iproute4mac.backend as backend
+import iproute4mac.cmd.ip as ip
+import iproute4mac.socket as socket
+import iproute4mac.utils as utils
+
+from iproute4mac import OPTION
+
+
+_ARCHIVE = os.path.join(os.path.dirname(__file__), "fixtures", "macos.json")
+
+
+def setup_function(function):
+    """setup any state specific to the execution of the given function"""
+    utils.invalidate()
+    backend.replay(_ARCHIVE)
+
+
+def teardown_function(function):
+    """teardown any state that was previously setup with a setup_function method"""
+    utils.invalidate()
+    backend.set(None)
+
+
+def test_immutable():
+    options = iproute4mac.DEFAULTS.replace(json=True)
+    assert options["json"] and not iproute4mac.DEFAULTS["json"]
+    with pytest.raises(TypeError):
+        options["json"] = False
+    with pytest.raises(TypeError):
+        del OPTION["json"]
+
+
+def test_using():
+    before = iproute4mac.options()
+    with iproute4mac.using(before.replace(pretty=True)) as options:
+        assert OPTION["pretty"] and options["pretty"]
+        # changed in place by the command: the options in use do not change
+        OPTION["preferred_family"] = socket._AF_INET6
+        assert options["preferred_family"] == before["preferred_family"]
+    assert iproute4mac.options() is before
+
+
+def test_threads():
+    seen = {}
+
+    def run():
+        OPTION["json"] = True
+        seen["thread"] = iproute4mac.options()
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+    # threads start from the default options, and change only theirs
+    assert seen["thread"] == iproute4mac.DEFAULTS.replace(json=True)
+    assert not OPTION["json"]
+
+
+class _ThreadStdout(threading.local):
+    """
+    Standard output of every thread on its own (redirect_stdout() is process-wide)
+    """
+
+    def __init__(self):
+        self.buffer = io.StringIO()
+
+    def write(self, text):
+        return self.buffer.write(text)
+
+    def flush(self):
+        pass
+
+
+def _ip(options, argv):
+    stdout = io.StringIO()
+    with contextlib.redirect_stdout(stdout), iproute4mac.using(options):
+        ip.do_obj(list(argv))
+    return stdout.getvalue()
+
+
+def test_concurrent_queries():
+    """
+    Queries of different options in parallel threads, as of ipd, do not corrupt each other
+    """
+    queries = [
+        (iproute4mac.DEFAULTS.replace(json=True), ["route", "show"]),
+        (iproute4mac.DEFAULTS.replace(preferred_family=socket._AF_INET6), ["route", "show"]),
+        (iproute4mac.DEFAULTS.replace(json=True, pretty=True), ["link", "show"]),
+        (iproute4mac.DEFAULTS, ["neigh", "show"]),
+    ]
+    expected = [_ip(options, argv) for options, argv in queries]
+    errors = []
+    stdout = _ThreadStdout()
+
+    def run(options, argv, output):
+        for _ in range(10):
+            stdout.buffer = io.StringIO()
+            with iproute4mac.using(options):
+                ip.do_obj(list(argv))
+            if (res := stdout.buffer.getvalue()) != output:
+                errors.append((argv, res))
+
+    threads = [
+        threading.Thread(target=run, args=(options, argv, output))
+        for (options, argv), output in zip(queries, expected)
+    ]
+    with contextlib.redirect_stdout(stdout):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert not errors
+
+
+def test_snapshots_workers(capsys):
+    # verbose reported by the workers running the commands
+    with utils.options_overridden(verbose=utils.LOG_INFO):
+        utils.snapshots(("arp", "-n", "-l", "-a"), ("ndp", "-n", "-l", "-a"))
+    assert capsys.readouterr().err.count("executing") == 2
+
+
+def test_main(monkeypatch, capsys):
+    """
+    Options of a command are gone with it (e.g. ip run in-process by tests)
+    """
+    monkeypatch.setenv(backend.ENV_REPLAY, _ARCHIVE)
+    options = iproute4mac.options()
+    monkeypatch.setattr("sys.argv", ["ip", "-6", "-j", "route", "show"])
+    assert ip.main() == 0
+    assert capsys.readouterr().out.startswith("[{")
+    assert iproute4mac.options() is options
+    monkeypatch.setattr("sys.argv", ["ip", "route", "show", "src", "127.0.0.1"])
+    assert ip.main() == 0
+    assert "127.0.0.0/8 via 127.0.0.1 dev lo0" in capsys.readouterr().out
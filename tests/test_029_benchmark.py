@@ -0,0 +1,89 @@
+import copy
+import json
+
+import iproute4mac.api as api
+import iproute4mac.backend as backend
+import iproute4mac.libc as libc
+import iproute4mac.utils as utils
+
+import benchmarks.run as run
+import benchmarks.synthetic as synthetic
+
+
+_STAGES = {"fork", "parse", "filter", "render_text", "render_json", "render_pretty"}
+
+
+def setup_function(function):
+    """setup any state specific to the execution of the given function"""
+    utils.invalidate()
+
+
+def teardown_function(function):
+    """teardown any state that was previously setup with a setup_function method"""
+    utils.invalidate()
+    backend.set(None)
+
+
+def test_deterministic():
+    assert synthetic.netstat(100) == synthetic.netstat(100)
+    assert synthetic.ifconfig(50, members=5) == synthetic.ifconfig(50, members=5)
+    assert synthetic.arp(10) != synthetic.arp(10, seed=1)
+
+
+def test_synthetic_parsed():
+    """
+    Every generated interface, neighbour and forwarding entry is parsed as such
+    """
+    backend.set(
+        backend.ReplayBackend(
+            synthetic.archive(links=60, routes=400, neighbours=300, members=20, entries=80)
+        )
+    )
+    assert len(api.links()) == 60
+    assert len(api.links(master="bridge0")) == 20
+    assert len(api.neighbours()) == 300
+    assert len(api.fdb()) == 80
+    # host routes to link-layer addresses are neighbours
+    assert 0 < len(api.routes(family="inet")) + len(api.routes(family="inet6")) <= 400
+
+
+def test_run(tmp_path):
+    output = tmp_path / "results.json"
+    argv = ["-links", "12", "-routes", "100", "-neighbours", "50", "-members", "4"]
+    assert run.main([*argv, "-repeat", "1", "-output", str(output)]) == libc.EXIT_SUCCESS
+    res = json.loads(output.read_text())
+    assert res["version"] == run.RESULTS_VERSION and res["max_rss_bytes"] > 0
+    results = {result["scenario"]: result for result in res["results"]}
+    assert set(results) == {"links", "routes", "neighbours", "bridge", "fdb"}
+    assert results["links"]["items"] == 12
+    assert results["bridge"]["selected"] == 4
+    assert results["fdb"]["items"] == 4 * run._ENTRIES
+    for result in res["results"]:
+        assert _STAGES <= set(result["stages"])
+        assert ("link" in result["stages"]) == (result["scenario"] in ("links", "bridge"))
+        for measure in result["stages"].values():
+            assert {"wall", "cpu", "peak_bytes", "retained_bytes"} <= set(measure)
+
+
+def test_compare(tmp_path, capsys):
+    scales = {"links": [5], "routes": [100], "neighbours": [2000], "members": [2]}
+    baseline = run.benchmark(scales, repeat=1, memory=False)
+    slower = copy.deepcopy(baseline)
+    stages = slower["results"][0]["stages"]
+    stages["parse"]["wall"] = 2 * max(stages["parse"]["wall"], 0.01)
+    assert [res[2] for res in run.compare(baseline, slower)] == ["parse"]
+    assert run.compare(slower, baseline) == []
+
+    argv = ["-links", "5", "-routes", "100", "-neighbours", "2000", "-members", "2"]
+    argv += ["-repeat", "1", "-no-memory", "-baseline", str(tmp_path / "baseline.json")]
+    for result in baseline["results"]:
+        for measure in result["stages"].values():
+            measure["wall"] *= 100
+    (tmp_path / "baseline.json").write_text(json.dumps(baseline))
+    assert run.main(argv) == libc.EXIT_SUCCESS
+    for result in baseline["results"]:
+        for measure in result["stages"].values():
+            measure["wall"] /= 10000
+    (tmp_path / "baseline.json").write_text(json.dumps(baseline))
+    assert run.main(argv) == libc.EXIT_FAILURE
+    assert "regression: neighbours neighbours=2000 parse" in capsys.readouterr().err
@@ -0,0 +1,205 @@
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+import iproute4mac
+import iproute4mac.api as api
+import iproute4mac.backend as backend
+import iproute4mac.cmd.bridge as bridge
+import iproute4mac.cmd.ip as ip
+import iproute4mac.libc as libc
+import iproute4mac.simulator as simulator
+import iproute4mac.utils as utils
+
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_function(function):
+    """setup any state specific to the execution of the given function"""
+    utils.invalidate()
+
+
+def teardown_function(function):
+    """teardown any state that was previously setup with a setup_function method"""
+    utils.invalidate()
+    backend.set(None)
+
+
+def _run(do_obj, *argv):
+    """
+    Exit code and output of the CLI, run by this process as a new one
+    """
+    utils.invalidate()
+    stdout, stderr = io.StringIO(), io.StringIO()
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        with iproute4mac.using(iproute4mac.DEFAULTS.replace(uid=0)):
+            try:
+                code = do_obj(list(argv)) or libc.EXIT_SUCCESS
+            except SystemExit as e:
+                code = e.code
+    return code, stdout.getvalue(), stderr.getvalue()
+
+
+def test_default():
+    backend.simulate(simulator.Network())
+    assert [link["ifname"] for link in api.links()] == ["lo0", "en0", "en1"]
+    assert [link["ifname"] for link in api.links(up=True)] == ["lo0", "en0"]
+    assert [addr["local"] for addr in api.addresses(dev="en0", family="inet")[0]["addr_info"]] == [
+        "192.168.1.10"
+    ]
+    assert [route["dst"] for route in api.routes(family="inet", dev="en0")][-1] == "default"
+    assert [neigh["dst"] for neigh in api.neighbours(family="inet")] == ["192.168.1.1"]
+
+
+def test_ip():
+    network = simulator.Network()
+    backend.simulate(network)
+    assert _run(ip.do_obj, "link", "add", "link", "en0", "type", "vlan", "id", "7") == (
+        libc.EXIT_SUCCESS,
+        "vlan0\n",
+        "",
+    )
+    assert network.interfaces["vlan0"]["vlan"] == {"vlanid": "7", "parent": "en0"}
+    argv = ["link", "add", "link", "en0", "name", "vlan0", "type", "vlan", "id", "8"]
+    code, _, stderr = _run(ip.do_obj, *argv)
+    assert (code, stderr) == (libc.EXIT_FAILURE, "ifconfig: SIOCIFCREATE2: File exists\n")
+
+    assert _run(ip.do_obj, "address", "add", "10.1.1.1/24", "dev", "vlan0")[0] == libc.EXIT_SUCCESS
+    assert _run(ip.do_obj, "route", "add", "172.16.0.0/12", "via", "10.1.1.254")[0] == 0
+    code, stdout, _ = _run(ip.do_obj, "route", "get", "172.16.1.1")
+    assert stdout.startswith("172.16.1.1 via 10.1.1.254 dev vlan0")
+    assert _run(ip.do_obj, "route", "add", "172.16.0.0/12", "via", "10.1.1.254")[0] != 0
+
+    # the routes of its address are gone along with the interface
+    assert _run(ip.do_obj, "link", "del", "vlan0")[0] == libc.EXIT_SUCCESS
+    assert all(route["netif"] != "vlan0" for route in network.routes)
+    assert not any(route["dst"] == "10.1.1.0/24" for route in network.routes)
+    code, _, stderr = _run(ip.do_obj, "link", "del", "vlan0")
+    assert code != libc.EXIT_SUCCESS and 'Cannot find device "vlan0"' in stderr
+
+
+def test_bridge():
+    network = simulator.Network()
+    backend.simulate(network)
+    for argv in (["create"], ["feth", "create"], ["feth", "create"]):
+        assert network.run(["ifconfig", "bridge" if argv == ["create"] else "feth", "create"])
+    assert list(network.interfaces)[-3:] == ["bridge0", "feth0", "feth1"]
+    assert _run(ip.do_obj, "link", "set", "feth0", "master", "bridge0")[0] == libc.EXIT_SUCCESS
+    assert [link["ifname"] for link in api.links(master="bridge0")] == ["feth0"]
+
+    assert (
+        network.run(["ifconfig", "bridge0", "static", "feth0", "aa:bb:cc:00:00:01"]).returncode == 0
+    )
+    assert [(entry["mac"], entry["ifname"]) for entry in api.fdb(br="bridge0")] == [
+        ("aa:bb:cc:00:00:01", "feth0")
+    ]
+    assert _run(bridge.do_obj, "fdb", "show", "br", "bridge0")[1].startswith(
+        "aa:bb:cc:00:00:01 dev feth0"
+    )
+    # members are released by their bridge
+    network.run(["ifconfig", "bridge0", "destroy"])
+    assert "PROMISC" not in network.interfaces["feth0"]["flags"]
+    assert not network.fdb
+
+
+def test_commands():
+    network = simulator.Network()
+    res = network.run(["ifconfig", "nope0", "up"])
+    assert (res.returncode, res.stderr) == (1, "ifconfig: interface nope0 does not exist\n")
+    res = network.run(["arp", "-d", "192.168.1.2"])
+    assert (res.returncode, res.stderr) == (1, "arp: delete: cannot locate 192.168.1.2\n")
+    res = network.run(["route", "-n", "delete", "10.0.0.0/8"])
+    assert "not in table" in res.stdout and res.stderr
+    assert network.run(["sysctl", "-n", "net.link.generic.system.sndq_maxlen"]).stdout == "128\n"
+    assert network.run(["ndp", "-n", "-l", "fe80::2%en0"]).returncode == 1
+    assert network.run(["ls"]).returncode == backend._NOT_RECORDED
+    res = network.run(["netstat", "-nr", "-f", "inet"])
+    assert "\n192.168.1          link#2             UCS " in res.stdout
+
+    network.run(["arp", "-s", "192.168.1.2", "aa:bb:cc:dd:ee:01"])
+    assert "192.168.1.2             aa:bb:cc:dd:ee:01 (none)" in network.run(["arp", "-an"]).stdout
+    backend.simulate(network)
+    assert _run(ip.do_obj, "neigh", "show", "192.168.1.2")[1].startswith(
+        "192.168.1.2 dev en0 lladdr aa:bb:cc:dd:ee:01 "
+    )
+
+
+def test_store(tmp_path):
+    path = tmp_path / "network.json"
+    backend.simulate(path)
+    assert [link["ifname"] for link in api.links()] == ["lo0", "en0", "en1"]
+    # changed by another process
+    res = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "iproute4mac.simulator",
+            "-state",
+            str(path),
+            "ifconfig",
+            "feth",
+            "create",
+        ],
+        capture_output=True,
+        text=True,
+        cwd=_ROOT,
+    )
+    assert (res.returncode, res.stdout) == (0, "feth0\n")
+    assert [link["ifname"] for link in api.links()][-1] == "feth0"
+    assert json.loads(path.read_text())["version"] == simulator.STATE_VERSION
+
+    with pytest.raises(ValueError):
+        simulator.Network({"version": 0})
+
+
+def test_throughput(tmp_path):
+    """
+    Thousands of changes per second, in memory, and saved (in the hundreds)
+    """
+    network = simulator.Network()
+    start = time.perf_counter()
+    for index in range(1000):
+        network.run(["arp", "-s", f"192.168.1.{index % 250 + 2}", "aa:bb:cc:dd:ee:01", "temp"])
+    assert time.perf_counter() - start < 1
+
+    store = simulator.Store(tmp_path / "network.json")
+    start = time.perf_counter()
+    for index in range(100):
+        with store.network() as network:
+            network.run(["ifconfig", "en1", "mtu", str(1400 + index)])
+    assert time.perf_counter() - start < 2
+    assert (
+        simulator.Network(json.loads((tmp_path / "network.json").read_text())).interfaces["en1"][
+            "mtu"
+        ]
+        == "1499"
+    )
+
+
+def test_exec(tmp_path):
+    """
+    The system tests of ip and bridge (see test_020, test_030...) pass on the simulated network
+    """
+    tests = [
+        os.path.join("tests", name)
+        for name in sorted(os.listdir(os.path.join(_ROOT, "tests")))
+        if name.startswith("test_")
+        and name[5:8].isdigit()
+        and int(name[5:8]) % 10 == 0
+        and int(name[5:8]) >= 20
+    ]
+    res = subprocess.run(
+        [sys.executable, "-m", "iproute4mac.simulator", "-state", str(tmp_path / "network.json")]
+        + ["exec", sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", *tests],
+        capture_output=True,
+        text=True,
+        cwd=_ROOT,
+    )
+    assert res.returncode == 0, res.stdout[-2000:]
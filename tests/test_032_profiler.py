@@ -0,0 +1,90 @@
+import os
+import pstats
+import subprocess
+import sys
+
+import pytest
+
+import iproute4mac.backend as backend
+import iproute4mac.profiler as profiler
+
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_ARCHIVE = os.path.join(os.path.dirname(__file__), "fixtures", "macos.json")
+
+
+def _run(*argv):
+    return subprocess.run(
+        [sys.executable, "-m", *argv],
+        capture_output=True,
+        text=True,
+        cwd=_ROOT,
+        env={**os.environ, backend.ENV_REPLAY: _ARCHIVE},
+    )
+
+
+def test_not_profiled():
+    items = iter(range(3))
+    assert not profiler.active()
+    assert profiler.iterate("filter", items) is items
+    with profiler.phase("shell", "netstat -n -r"):
+        pass
+
+
+class _Clock:
+    """
+    Wall, process and thread time, only going by sleep()
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+    def perf_counter(self):
+        return self.now
+
+    process_time = thread_time = perf_counter
+
+
+def test_nested(monkeypatch, capsys):
+    clock = _Clock()
+    monkeypatch.setattr(profiler, "time", clock)
+    with profiler.profiling(True):
+        res = profiler._profile
+        with profiler.phase("parse"):
+            clock.sleep(0.02)
+            # producing the items is accounted to filter, using them to parse
+            for _ in profiler.iterate("filter", range(2)):
+                clock.sleep(0.01)
+            with profiler.phase("shell", "ifconfig -l"):
+                clock.sleep(0.02)
+    assert not profiler.active()
+    parse, filter, shell = res.phases["parse"], res.phases["filter"], res.phases["shell"]
+    assert parse == [pytest.approx(0.04), pytest.approx(0.04), 1]
+    assert filter == [0.0, 0.0, 1]
+    assert shell == [pytest.approx(0.02), pytest.approx(0.02), 1]
+    assert res.commands == {"ifconfig -l": shell}
+    err = capsys.readouterr().err
+    assert err.startswith("profile: 60.00 ms wall, 60.00 ms cpu\n") and "  ifconfig -l\n" in err
+    assert "link\n" not in err and err.endswith("other\n")
+
+
+def test_cli(tmp_path):
+    expected = _run("iproute4mac.cmd.ip", "route", "show")
+    res = _run("iproute4mac.cmd.ip", "-profile", "route", "show")
+    assert res.stdout == expected.stdout
+    assert "  netstat -n -r -f inet\n" in res.stderr
+    for phase in ("shell", "parse", "filter", "render", "write"):
+        assert f"  {phase}\n" in res.stderr
+
+    dump = tmp_path / "ip.prof"
+    res = _run("iproute4mac.cmd.ip", f"-pro={dump}", "-j", "link", "show")
+    assert res.stderr.startswith("profile: ") and "  link\n" in res.stderr
+    assert pstats.Stats(str(dump)).total_calls > 0
+
+    res = _run("iproute4mac.cmd.bridge", "-profile", "fdb", "show")
+    assert "  ifconfig bridge0 addr\n" in res.stderr
+    # -p is still -pretty
+    assert "profile" not in _run("iproute4mac.cmd.ip", "-p", "-j", "link", "show").stderr